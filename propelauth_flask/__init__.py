@@ -1,4 +1,10 @@
+import asyncio
+import functools
+import os
+import threading
+import time
 import httpx
+from concurrent.futures import Executor
 from typing import Any, Dict, List, Optional, cast
 from flask import g
 from propelauth_py import (
@@ -16,6 +22,8 @@ from propelauth_py.api import (
     UserQueryOrderBy,
 )
 from werkzeug.local import LocalProxy
+from propelauth_flask.access_tokens import AccessTokenCache
+from propelauth_flask.api_key_pipeline import apply_api_key_specs
 from propelauth_flask.auth_decorator import (
     _get_user_credential_decorator,
     _get_require_org_decorator,
@@ -23,8 +31,42 @@ from propelauth_flask.auth_decorator import (
     _require_org_member_with_exact_role_decorator,
     _require_org_member_with_permission_decorator,
     _require_org_member_with_all_permissions_decorator,
+    _require_org_member_in_orgs_decorator,
+    _require_step_up_decorator,
 )
+from propelauth_flask.backend_client import _BackendClient, _SingleFlight
+from propelauth_flask.background_loop import BackgroundLoop, _default_background_loop
+from propelauth_flask.blocking_calls import BlockingCallDetector, BlockingCallError, _NonBlockingAuth
+from propelauth_flask.call_accounting import BackendCallStats, CallAccounting
+from propelauth_flask.circuit_breaker import CircuitBreaker, CircuitBreakerSettings, CircuitOpenError
+from propelauth_flask.deadlines import DeadlineExceeded, _Deadlines, _watch_deadlines, deadline, remaining_seconds
+from propelauth_flask.dispatch import DispatchQueue
+from propelauth_flask.export import ExportResult, export_tenant
+from propelauth_flask.hedging import ReadHedging
+from propelauth_flask.migration import migrate_users
+from propelauth_flask.org_id_extractors import (
+    org_id_from_header,
+    org_id_from_json_field,
+    org_id_from_query,
+    org_id_from_view_args,
+)
+from propelauth_flask.permissions import RequiredPermissions, RequiredRole, compile_permissions, compile_role
+from propelauth_flask.rate_limiting import AdaptiveConcurrencyLimiter, RetryPolicy, _watch_retry_after
+from propelauth_flask.replica import LocalReplica
+from propelauth_flask.revocation import RevocationList
+from propelauth_flask.step_up import _StepUpGrants
+from propelauth_flask.token_cache import TokenCache, LocalTokenCache, SharedTokenCache
+from propelauth_flask.token_validation import _TokenValidator
+from propelauth_flask.tracing import OpenTelemetryTracer, Span, Tracer, _Tracing
+from propelauth_flask.usage import UsageReport, UsageSample, aggregate_api_key_usage, iter_api_key_usage
 from propelauth_flask.user import LoggedInUser, LoggedOutUser
+from propelauth_flask.webhooks import (
+    WebhookVerificationError,
+    create_webhook_blueprint,
+    dispatch_webhook_event,
+    sign_webhook,
+    verify_webhook,
+)
 
 current_user = LocalProxy(lambda: g.propelauth_current_user)
 """Returns the current user. Must be used with one of require_user, optional_user, or require_org_member"""
@@ -34,6 +76,10 @@ current_org = LocalProxy(lambda: g.propelauth_current_org)
 """Returns the current org. Must be used with require_org_member"""
 
 
+current_orgs = LocalProxy(lambda: g.propelauth_current_orgs)
+"""Returns the current orgs, in the order they were requested. Must be used with require_org_member_in_orgs"""
+
+
 class FlaskAuth:
     def __init__(
         self,
@@ -41,63 +87,123 @@ class FlaskAuth:
         integration_api_key: str,
         token_verification_metadata: Optional[TokenVerificationMetadata],
         debug_mode: bool,
+        token_cache: Optional[TokenCache] = None,
+        revocation_list: Optional[RevocationList] = None,
+        step_up_grant_cache: Optional[TokenCache] = None,
+        deduplicate_reads: bool = False,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        hedging: Optional[ReadHedging] = None,
+        tracer: Optional[Tracer] = None,
     ):
         self.auth_url = auth_url
         self.integration_api_key = integration_api_key
         self.token_verification_metadata = token_verification_metadata
         self.debug_mode = debug_mode
-        self.auth = init_base_auth(
-            auth_url, integration_api_key, token_verification_metadata
+        self.auth = _BackendClient(
+            init_base_auth(auth_url, integration_api_key, token_verification_metadata),
+            _default_interceptors(deduplicate_reads, circuit_breaker, concurrency_limiter, hedging, tracer),
+        )
+        self.revocation_list = revocation_list if revocation_list is not None else RevocationList()
+        self.tracer = tracer
+        self.token_validator = _TokenValidator(
+            self.auth.token_verification_metadata, token_cache, self.revocation_list, tracer
+        )
+        self.step_up_grants = _StepUpGrants(integration_api_key, step_up_grant_cache)
+        self.access_token_cache = AccessTokenCache(self.auth.create_access_token)
+        self.background_loop = _default_background_loop
+        self._async_auth_options = dict(
+            deduplicate_reads=deduplicate_reads,
+            circuit_breaker=circuit_breaker,
+            concurrency_limiter=concurrency_limiter,
+            hedging=hedging,
+            tracer=tracer,
         )
+        self._async_auth = None
+        self._async_auth_pid = None
+        self._async_auth_lock = threading.Lock()
+        self.dispatch_queue = None
 
     @property
     def require_user(self):
         return _get_user_credential_decorator(
-            self.auth.validate_access_token_and_get_user, True, self.debug_mode
+            self.token_validator.validate_access_token_and_get_user, True, self.debug_mode, tracer=self.tracer
         )
 
     @property
     def optional_user(self):
         return _get_user_credential_decorator(
-            self.auth.validate_access_token_and_get_user, False, self.debug_mode
+            self.token_validator.validate_access_token_and_get_user, False, self.debug_mode, tracer=self.tracer
         )
 
     @property
     def require_org_member(self):
         return _get_require_org_decorator(
-            self.auth.validate_access_token_and_get_user_with_org, self.debug_mode
+            self.token_validator.validate_access_token_and_get_user_with_org, self.debug_mode, tracer=self.tracer
         )
 
     @property
     def require_org_member_with_minimum_role(self):
         return _require_org_member_with_minimum_role_decorator(
-            self.auth.validate_access_token_and_get_user_with_org_by_minimum_role,
+            self.token_validator.validate_access_token_and_get_user_with_org_by_minimum_role,
             self.debug_mode,
+            tracer=self.tracer,
         )
 
     @property
     def require_org_member_with_exact_role(self):
         return _require_org_member_with_exact_role_decorator(
-            self.auth.validate_access_token_and_get_user_with_org_by_exact_role,
+            self.token_validator.validate_access_token_and_get_user_with_org_by_exact_role,
             self.debug_mode,
+            tracer=self.tracer,
         )
 
     @property
     def require_org_member_with_permission(self):
         return _require_org_member_with_permission_decorator(
-            self.auth.validate_access_token_and_get_user_with_org_by_permission,
+            self.token_validator.validate_access_token_and_get_user_with_org_by_permission,
             self.debug_mode,
+            tracer=self.tracer,
         )
 
     @property
     def require_org_member_with_all_permissions(self):
         return _require_org_member_with_all_permissions_decorator(
-            self.auth.validate_access_token_and_get_user_with_org_by_all_permissions,
+            self.token_validator.validate_access_token_and_get_user_with_org_by_all_permissions,
             self.debug_mode,
+            tracer=self.tracer,
+        )
+
+    @property
+    def require_org_member_in_orgs(self):
+        """Like require_org_member, but req_to_org_ids returns a list of org ids and the user must be in
+        all of them (optionally with minimum_required_role and/or permissions). The orgs are in current_orgs."""
+        return _require_org_member_in_orgs_decorator(
+            self.token_validator.validate_access_token_and_get_user_with_orgs,
+            self.debug_mode,
+            tracer=self.tracer,
+        )
+
+    @property
+    def require_step_up(self):
+        """Takes an action_type and requires a user with a step up grant for it, read from the
+        X-Step-Up-Grant header (or by req_to_grant). Grants issued by verify_step_up_totp_challenge are
+        accepted without calling PropelAuth until they expire.
+
+        Other grants are verified with PropelAuth on every request, as nothing says how long they're valid for
+        or whether verifying used them up. If every grant for action_type is TIME_BASED, pass
+        remember_verified_for_seconds (at most the valid_for_seconds they're issued with) to accept a verified
+        grant for that long too, e.g. one issued by another worker."""
+        return _require_step_up_decorator(
+            self.token_validator.validate_access_token_and_get_user,
+            self.step_up_grants,
+            self.verify_step_up_grant,
+            self.debug_mode,
+            tracer=self.tracer,
         )
 
     def validate_access_token_and_get_user(self, authorization_header: str) -> User:
-        return self.auth.validate_access_token_and_get_user(
+        return self.token_validator.validate_access_token_and_get_user(
             authorization_header=authorization_header
         )
 
@@ -219,7 +325,11 @@ class FlaskAuth:
         return self.auth.resend_email_confirmation(user_id)
 
     def logout_all_user_sessions(self, user_id: str):
-        return self.auth.logout_all_user_sessions(user_id)
+        result = self.auth.logout_all_user_sessions(user_id)
+        if result:
+            self.revocation_list.revoke_user(user_id)
+            self.access_token_cache.invalidate_user(user_id)
+        return result
 
     def update_user_email(
         self, user_id: str, new_email: str, require_email_confirmation: bool
@@ -283,7 +393,13 @@ class FlaskAuth:
         user_id: str,
         duration_in_minutes: int,
         active_org_id: Optional[str] = None,
+        reuse_cached: bool = False,
     ):
+        """With reuse_cached, returns a token minted earlier for the same user, active_org_id and
+        duration_in_minutes until it nears expiry (see access_token_cache) instead of minting a new one on
+        every call."""
+        if reuse_cached:
+            return self.access_token_cache.get(user_id, duration_in_minutes, active_org_id)
         return self.auth.create_access_token(
             user_id, duration_in_minutes, active_org_id
         )
@@ -396,10 +512,18 @@ class FlaskAuth:
         )
 
     def delete_user(self, user_id: str):
-        return self.auth.delete_user(user_id)
+        result = self.auth.delete_user(user_id)
+        if result:
+            self.revocation_list.revoke_user(user_id)
+            self.access_token_cache.invalidate_user(user_id)
+        return result
 
     def disable_user(self, user_id: str):
-        return self.auth.disable_user(user_id)
+        result = self.auth.disable_user(user_id)
+        if result:
+            self.revocation_list.revoke_user(user_id)
+            self.access_token_cache.invalidate_user(user_id)
+        return result
 
     def enable_user(self, user_id: str):
         return self.auth.enable_user(user_id)
@@ -494,9 +618,13 @@ class FlaskAuth:
         grant_type: StepUpMfaGrantType,
         valid_for_seconds: int,
     ) -> StepUpMfaVerifyTotpResponse:
-        return self.auth.verify_step_up_totp_challenge(
+        expires_by = time.time() + valid_for_seconds
+        response = self.auth.verify_step_up_totp_challenge(
             action_type, user_id, code, grant_type, valid_for_seconds
         )
+        if grant_type == StepUpMfaGrantType.TIME_BASED:
+            self.step_up_grants.remember(action_type, user_id, response.step_up_grant, expires_by)
+        return response
 
     def verify_step_up_grant(self, action_type: str, user_id: str, grant: str) -> bool:
         return self.auth.verify_step_up_grant(action_type, user_id, grant)
@@ -575,6 +703,77 @@ class FlaskAuth:
     def fetch_employee_by_id(self, employee_id: str):
         return self.auth.fetch_employee_by_id(employee_id)
 
+    @property
+    def async_auth(self) -> "FlaskAuthAsync":
+        """A FlaskAuthAsync with the same settings, for calls run on background_loop (see gather). It keeps one
+        httpx connection pool for as long as the process runs, and a forked child (e.g. a preforking server's
+        worker) gets a new one rather than sharing the parent's sockets."""
+        if self._async_auth_pid != os.getpid():
+            with self._async_auth_lock:
+                if self._async_auth_pid != os.getpid():
+                    self._async_auth = FlaskAuthAsync(
+                        auth_url=self.auth_url,
+                        integration_api_key=self.integration_api_key,
+                        token_verification_metadata=self.auth.token_verification_metadata,
+                        debug_mode=self.debug_mode,
+                        httpx_client=httpx.AsyncClient(),
+                        revocation_list=self.revocation_list,
+                        **self._async_auth_options,
+                    )
+                    self._async_auth_pid = os.getpid()
+        return self._async_auth
+
+    def gather(self, *calls, return_exceptions: bool = False, timeout: Optional[float] = None) -> List[Any]:
+        """Makes several calls at once from sync code, and returns their results in order. For example:
+
+            org, users = auth.gather(
+                auth.async_auth.fetch_org(org_id),
+                auth.async_auth.fetch_users_in_org(org_id),
+            )
+
+        The calls run concurrently on background_loop, a long-lived event loop on a daemon thread."""
+        return self.background_loop.gather(*calls, return_exceptions=return_exceptions, timeout=timeout)
+
+    def start_dispatch_queue(self, path: str, concurrency: int = 4, max_attempts: int = 5) -> DispatchQueue:
+        """Starts dispatch_queue, a DispatchQueue stored at path, so that for example
+        auth.dispatch_queue.resend_email_confirmation(user_id) returns right away and the call is made in the
+        background."""
+        if self.dispatch_queue is None:
+            self.dispatch_queue = DispatchQueue(self, path, concurrency=concurrency, max_attempts=max_attempts)
+        return self.dispatch_queue.start()
+
+    def enable_call_accounting(
+        self,
+        app,
+        max_calls: Optional[int] = 10,
+        max_seconds: Optional[float] = 1.0,
+        header_name: Optional[str] = "X-PropelAuth-Backend-Calls",
+    ) -> CallAccounting:
+        """Counts and times the backend calls made while app handles each request, to catch views that make one per
+        item of a loop. The totals are in g.propelauth_backend_calls (a BackendCallStats) and in the header_name
+        response header. A warning with where the calls were made from is logged once a request makes more than
+        max_calls calls, or spends more than max_seconds in them. Meant for development."""
+        accounting = CallAccounting(max_calls=max_calls, max_seconds=max_seconds, header_name=header_name)
+        # Outermost, so it counts the calls the view made and the time it waited for them
+        self.auth.add_interceptor(accounting, outermost=True)
+        accounting.init_app(app)
+        return accounting
+
+    @property
+    def nonblocking(self):
+        """FlaskAuthAsync's backend methods, to await from async def views instead of the blocking ones here. For
+        example `org = await auth.nonblocking.fetch_org(org_id)`. They run on background_loop, so the view's event
+        loop keeps running while they wait for PropelAuth."""
+        return _NonBlockingAuth(self)
+
+    def detect_blocking_calls(self, raise_error: bool = False) -> BlockingCallDetector:
+        """Logs a warning, once per call site, when a backend method here is called while an event loop is running
+        on the same thread (e.g. from an async def view), since it blocks that loop until PropelAuth responds. With
+        raise_error, raises a BlockingCallError instead. Meant for development."""
+        detector = BlockingCallDetector(raise_error=raise_error)
+        self.auth.add_interceptor(detector, outermost=True)
+        return detector
+
 
 class FlaskAuthAsync():
     def __init__(
@@ -584,64 +783,150 @@ class FlaskAuthAsync():
         token_verification_metadata: Optional[TokenVerificationMetadata], 
         debug_mode: bool,
         httpx_client: Optional[httpx.AsyncClient] = None,
+        offload_token_verification: bool = False,
+        token_verification_executor: Optional[Executor] = None,
+        token_cache: Optional[TokenCache] = None,
+        revocation_list: Optional[RevocationList] = None,
+        step_up_grant_cache: Optional[TokenCache] = None,
+        deduplicate_reads: bool = False,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        hedging: Optional[ReadHedging] = None,
+        tracer: Optional[Tracer] = None,
     ):
         self.auth_url = auth_url
         self.integration_api_key = integration_api_key
         self.token_verification_metadata = token_verification_metadata
         self.debug_mode = debug_mode
         self.httpx_client = httpx_client
-        self.auth = init_base_async_auth(auth_url, integration_api_key, token_verification_metadata, self.httpx_client)
-        
+        self.offload_token_verification = offload_token_verification or token_verification_executor is not None
+        self.token_verification_executor = token_verification_executor
+        self.auth = _BackendClient(
+            init_base_async_auth(auth_url, integration_api_key, token_verification_metadata, self.httpx_client),
+            _default_interceptors(deduplicate_reads, circuit_breaker, concurrency_limiter, hedging, tracer),
+        )
+        self.revocation_list = revocation_list if revocation_list is not None else RevocationList()
+        self.tracer = tracer
+        self.token_validator = _TokenValidator(
+            self.auth.token_verification_metadata, token_cache, self.revocation_list, tracer
+        )
+        self.step_up_grants = _StepUpGrants(integration_api_key, step_up_grant_cache)
+        _watch_deadlines(self.auth.httpx_client)
+        if concurrency_limiter is not None:
+            _watch_retry_after(self.auth.httpx_client)
+
     @property
     def require_user(self):
         return _get_user_credential_decorator(
-            self.auth.validate_access_token_and_get_user, True, self.debug_mode
+            self.token_validator.validate_access_token_and_get_user, True, self.debug_mode,
+            self.offload_token_verification, self.token_verification_executor,
+            tracer=self.tracer,
         )
 
     @property
     def optional_user(self):
         return _get_user_credential_decorator(
-            self.auth.validate_access_token_and_get_user, False, self.debug_mode
+            self.token_validator.validate_access_token_and_get_user, False, self.debug_mode,
+            self.offload_token_verification, self.token_verification_executor,
+            tracer=self.tracer,
         )
 
     @property
     def require_org_member(self):
         return _get_require_org_decorator(
-            self.auth.validate_access_token_and_get_user_with_org, self.debug_mode
+            self.token_validator.validate_access_token_and_get_user_with_org, self.debug_mode,
+            self.offload_token_verification, self.token_verification_executor,
+            tracer=self.tracer,
         )
 
     @property
     def require_org_member_with_minimum_role(self):
         return _require_org_member_with_minimum_role_decorator(
-            self.auth.validate_access_token_and_get_user_with_org_by_minimum_role,
+            self.token_validator.validate_access_token_and_get_user_with_org_by_minimum_role,
             self.debug_mode,
+            self.offload_token_verification,
+            self.token_verification_executor,
+            tracer=self.tracer,
         )
 
     @property
     def require_org_member_with_exact_role(self):
         return _require_org_member_with_exact_role_decorator(
-            self.auth.validate_access_token_and_get_user_with_org_by_exact_role,
+            self.token_validator.validate_access_token_and_get_user_with_org_by_exact_role,
             self.debug_mode,
+            self.offload_token_verification,
+            self.token_verification_executor,
+            tracer=self.tracer,
         )
 
     @property
     def require_org_member_with_permission(self):
         return _require_org_member_with_permission_decorator(
-            self.auth.validate_access_token_and_get_user_with_org_by_permission,
+            self.token_validator.validate_access_token_and_get_user_with_org_by_permission,
             self.debug_mode,
+            self.offload_token_verification,
+            self.token_verification_executor,
+            tracer=self.tracer,
         )
 
     @property
     def require_org_member_with_all_permissions(self):
         return _require_org_member_with_all_permissions_decorator(
-            self.auth.validate_access_token_and_get_user_with_org_by_all_permissions,
+            self.token_validator.validate_access_token_and_get_user_with_org_by_all_permissions,
+            self.debug_mode,
+            self.offload_token_verification,
+            self.token_verification_executor,
+            tracer=self.tracer,
+        )
+
+    @property
+    def require_org_member_in_orgs(self):
+        """Like require_org_member, but req_to_org_ids returns a list of org ids and the user must be in
+        all of them (optionally with minimum_required_role and/or permissions). The orgs are in current_orgs."""
+        return _require_org_member_in_orgs_decorator(
+            self.token_validator.validate_access_token_and_get_user_with_orgs,
+            self.debug_mode,
+            self.offload_token_verification,
+            self.token_verification_executor,
+            tracer=self.tracer,
+        )
+
+    @property
+    def require_step_up(self):
+        """Takes an action_type and requires a user with a step up grant for it, read from the
+        X-Step-Up-Grant header (or by req_to_grant). Grants issued by verify_step_up_totp_challenge are
+        accepted without calling PropelAuth until they expire.
+
+        Other grants are verified with PropelAuth on every request, as nothing says how long they're valid for
+        or whether verifying used them up. If every grant for action_type is TIME_BASED, pass
+        remember_verified_for_seconds (at most the valid_for_seconds they're issued with) to accept a verified
+        grant for that long too, e.g. one issued by another worker."""
+        return _require_step_up_decorator(
+            self.token_validator.validate_access_token_and_get_user,
+            self.step_up_grants,
+            self.verify_step_up_grant,
             self.debug_mode,
+            self.offload_token_verification,
+            self.token_verification_executor,
+            tracer=self.tracer,
         )
         
     def validate_access_token_and_get_user(self, authorization_header: str) -> User:
-        return self.auth.validate_access_token_and_get_user(
+        return self.token_validator.validate_access_token_and_get_user(
             authorization_header=authorization_header
         )
+
+    async def validate_access_token_and_get_user_async(self, authorization_header: str) -> User:
+        """Same as validate_access_token_and_get_user, but verifies the token in token_verification_executor
+        (or the event loop's default executor) so the event loop isn't blocked"""
+        user = self.token_validator.validate_access_token_and_get_user(authorization_header, cached_only=True)
+        if user is not None:
+            return user
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.token_verification_executor,
+            functools.partial(self.token_validator.validate_access_token_and_get_user, authorization_header),
+        )
         
     async def fetch_user_metadata_by_user_id(self, user_id: str, include_orgs: bool = False):
         return await self.auth.fetch_user_metadata_by_user_id(user_id, include_orgs)
@@ -707,7 +992,10 @@ class FlaskAuthAsync():
         return await self.auth.resend_email_confirmation(user_id)
 
     async def logout_all_user_sessions(self, user_id: str):
-        return await self.auth.logout_all_user_sessions(user_id)
+        result = await self.auth.logout_all_user_sessions(user_id)
+        if result:
+            self.revocation_list.revoke_user(user_id)
+        return result
 
     async def update_user_email(self, user_id: str, new_email: str, require_email_confirmation: bool):
         return await self.auth.update_user_email(user_id, new_email, require_email_confirmation)
@@ -830,10 +1118,16 @@ class FlaskAuthAsync():
         return await self.auth.change_user_role_in_org(user_id, org_id, role, additional_roles)
 
     async def delete_user(self, user_id: str):
-        return await self.auth.delete_user(user_id)
+        result = await self.auth.delete_user(user_id)
+        if result:
+            self.revocation_list.revoke_user(user_id)
+        return result
 
     async def disable_user(self, user_id: str):
-        return await self.auth.disable_user(user_id)
+        result = await self.auth.disable_user(user_id)
+        if result:
+            self.revocation_list.revoke_user(user_id)
+        return result
 
     async def enable_user(self, user_id: str):
         return await self.auth.enable_user(user_id)
@@ -926,9 +1220,13 @@ class FlaskAuthAsync():
         grant_type: StepUpMfaGrantType,
         valid_for_seconds: int,
     ) -> StepUpMfaVerifyTotpResponse:
-        return await self.auth.verify_step_up_totp_challenge(
+        expires_by = time.time() + valid_for_seconds
+        response = await self.auth.verify_step_up_totp_challenge(
             action_type, user_id, code, grant_type, valid_for_seconds
         )
+        if grant_type == StepUpMfaGrantType.TIME_BASED:
+            self.step_up_grants.remember(action_type, user_id, response.step_up_grant, expires_by)
+        return response
 
     async def verify_step_up_grant(self, action_type: str, user_id: str, grant: str) -> bool:
         return await self.auth.verify_step_up_grant(action_type, user_id, grant)
@@ -1020,12 +1318,58 @@ class FlaskAuthAsync():
             employee_id
         )
 
+    def enable_call_accounting(
+        self,
+        app,
+        max_calls: Optional[int] = 10,
+        max_seconds: Optional[float] = 1.0,
+        header_name: Optional[str] = "X-PropelAuth-Backend-Calls",
+    ) -> CallAccounting:
+        """Counts and times the backend calls made while app handles each request, to catch views that make one per
+        item of a loop. The totals are in g.propelauth_backend_calls (a BackendCallStats) and in the header_name
+        response header. A warning with where the calls were made from is logged once a request makes more than
+        max_calls calls, or spends more than max_seconds in them. Meant for development."""
+        accounting = CallAccounting(max_calls=max_calls, max_seconds=max_seconds, header_name=header_name)
+        # Outermost, so it counts the calls the view made and the time it waited for them
+        self.auth.add_interceptor(accounting, outermost=True)
+        accounting.init_app(app)
+        return accounting
+
+def _default_interceptors(deduplicate_reads, circuit_breaker, concurrency_limiter, hedging, tracer):
+    # Outermost, so a deadline covers everything the other interceptors do too
+    interceptors = [_Deadlines()]
+    if tracer is not None:
+        # Outermost too, so a call's span covers the time it spent waiting on the other interceptors
+        interceptors.insert(0, _Tracing(tracer, "propelauth.backend_call"))
+    if deduplicate_reads:
+        # Identical reads that overlap share one request (or one fast failure)
+        interceptors.append(_SingleFlight())
+    if circuit_breaker is not None:
+        interceptors.append(circuit_breaker)
+    if hedging is not None:
+        interceptors.append(hedging)
+    if concurrency_limiter is not None:
+        # Innermost, so it only counts calls that actually reach the backend and the breaker only sees retries fail
+        interceptors.append(concurrency_limiter)
+    if tracer is not None:
+        interceptors.append(_Tracing(tracer, "propelauth.http_request"))
+    return interceptors
+
+
 def init_auth(
     auth_url: str,
     api_key: str,
     token_verification_metadata: Optional[TokenVerificationMetadata] = None,
     debug_mode=False,
     log_exceptions=False,
+    token_cache: Optional[TokenCache] = None,
+    revocation_list: Optional[RevocationList] = None,
+    step_up_grant_cache: Optional[TokenCache] = None,
+    deduplicate_reads: bool = False,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+    concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    hedging: Optional[ReadHedging] = None,
+    tracer: Optional[Tracer] = None,
 ) -> FlaskAuth:
     configure_logging(log_exceptions=log_exceptions)
 
@@ -1035,6 +1379,14 @@ def init_auth(
         integration_api_key=api_key,
         token_verification_metadata=token_verification_metadata,
         debug_mode=debug_mode,
+        token_cache=token_cache,
+        revocation_list=revocation_list,
+        step_up_grant_cache=step_up_grant_cache,
+        deduplicate_reads=deduplicate_reads,
+        circuit_breaker=circuit_breaker,
+        concurrency_limiter=concurrency_limiter,
+        hedging=hedging,
+        tracer=tracer,
     )
 
 def init_auth_async(
@@ -1044,8 +1396,34 @@ def init_auth_async(
     debug_mode=False,
     httpx_client: Optional[httpx.AsyncClient] = None,
     log_exceptions=False,
+    offload_token_verification=False,
+    token_verification_executor: Optional[Executor] = None,
+    token_cache: Optional[TokenCache] = None,
+    revocation_list: Optional[RevocationList] = None,
+    step_up_grant_cache: Optional[TokenCache] = None,
+    deduplicate_reads: bool = False,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+    concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    hedging: Optional[ReadHedging] = None,
+    tracer: Optional[Tracer] = None,
 ) -> FlaskAuthAsync:
     configure_logging(log_exceptions=log_exceptions)
 
     """Fetches metadata required to validate access tokens and returns auth decorators and utilities"""
-    return FlaskAuthAsync(auth_url=auth_url, integration_api_key=api_key, token_verification_metadata=token_verification_metadata, debug_mode=debug_mode, httpx_client=httpx_client)
+    return FlaskAuthAsync(
+        auth_url=auth_url,
+        integration_api_key=api_key,
+        token_verification_metadata=token_verification_metadata,
+        debug_mode=debug_mode,
+        httpx_client=httpx_client,
+        offload_token_verification=offload_token_verification,
+        token_verification_executor=token_verification_executor,
+        token_cache=token_cache,
+        revocation_list=revocation_list,
+        step_up_grant_cache=step_up_grant_cache,
+        deduplicate_reads=deduplicate_reads,
+        circuit_breaker=circuit_breaker,
+        concurrency_limiter=concurrency_limiter,
+        hedging=hedging,
+        tracer=tracer,
+    )
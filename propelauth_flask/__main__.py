@@ -0,0 +1,5 @@
+import sys
+
+from propelauth_flask.cli import main
+
+sys.exit(main())
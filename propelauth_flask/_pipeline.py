@@ -0,0 +1,270 @@
+"""Streams records from a file through a backend call, a bounded number at a time, so that a run that's interrupted
+can pick up where it left off. Shared by the bulk jobs (migration, API key import) and their command line."""
+import csv
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from propelauth_flask.circuit_breaker import _CALLER_ERRORS
+
+
+class PipelineResult:
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.duplicates = 0
+
+    @property
+    def processed(self) -> int:
+        return self.succeeded + self.failed
+
+    def __repr__(self):
+        return "PipelineResult(succeeded={}, failed={}, skipped={}, duplicates={})".format(
+            self.succeeded, self.failed, self.skipped, self.duplicates
+        )
+
+
+class _MalformedLine(NamedTuple):
+    """Stands in for a JSONL line that isn't JSON, so run_pipeline reports it instead of the whole run failing."""
+
+    line: str
+    error: Exception
+
+
+def read_records(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yields (record_number, record) for every record in a JSONL or CSV file (gzipped if it ends in .gz), one at
+    a time. Record numbers start at 1, and blank JSONL lines are skipped without using one up. Lines that aren't
+    JSON still get a record number, and run_pipeline reports them as failed."""
+    name = path[:-3] if path.endswith(".gz") else path
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        if name.endswith(".csv"):
+            for record_number, row in enumerate(csv.DictReader(f), start=1):
+                yield record_number, {k: v for k, v in row.items() if v != ""}
+        else:
+            record_number = 0
+            for line in f:
+                if line.strip():
+                    record_number += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        record = _MalformedLine(line.rstrip("\r\n"), e)
+                    yield record_number, record
+
+
+def parse_bool(field: str, value) -> bool:
+    """Booleans as CSV files spell them."""
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in ("true", "1", "yes"):
+        return True
+    if normalized in ("false", "0", "no"):
+        return False
+    raise ValueError("{} must be true or false, not {!r}".format(field, value))
+
+
+class Checkpoint:
+    """Which records a run has finished, saved to path every save_every_seconds.
+
+    Records finish out of order, so it's every record up to last_in_order, plus the few after it that are done.
+    """
+
+    def __init__(self, path: Optional[str], save_every_seconds: float = 1.0):
+        self.path = path
+        self.save_every_seconds = save_every_seconds
+        self.last_in_order = 0
+        self.done_after = set()
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            self.last_in_order = saved["last_in_order"]
+            self.done_after = set(saved["done_after"])
+
+    def is_done(self, record_number: int) -> bool:
+        return record_number <= self.last_in_order or record_number in self.done_after
+
+    def mark_done(self, record_number: int):
+        with self._lock:
+            self.done_after.add(record_number)
+            while self.last_in_order + 1 in self.done_after:
+                self.last_in_order += 1
+                self.done_after.remove(self.last_in_order)
+            if time.monotonic() - self._saved_at >= self.save_every_seconds:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        self._saved_at = time.monotonic()
+        if self.path is None:
+            return
+        # Written in full and then renamed, so an interrupted save never leaves half a checkpoint
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump({"last_in_order": self.last_in_order, "done_after": sorted(self.done_after)}, f)
+        os.replace(temporary_path, self.path)
+
+
+class JsonlWriter:
+    """Appends one JSON object per line to path (if it isn't None), flushing every line so a crash loses none.
+
+    Files it creates are only readable by their owner, as they can hold API keys or user records.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self._file = None
+        if path is not None:
+            self._file = os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600), "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, value: Dict[str, Any]):
+        if self._file is None:
+            return
+        line = json.dumps(value, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def run_pipeline(
+    records: Iterable[Tuple[int, Dict[str, Any]]],
+    handle: Callable[[Dict[str, Any]], Any],
+    concurrency: int = 8,
+    checkpoint_path: Optional[str] = None,
+    error_report_path: Optional[str] = None,
+    max_attempts: int = 3,
+    base_delay: float = 1.0,
+    on_progress: Optional[Callable[[PipelineResult], None]] = None,
+    dedupe_key: Optional[Callable[[Dict[str, Any]], Hashable]] = None,
+    output_path: Optional[str] = None,
+    to_output: Optional[Callable[[int, Dict[str, Any], Any], Optional[Dict[str, Any]]]] = None,
+) -> PipelineResult:
+    """Calls handle(record) for every record not already done according to the checkpoint, up to concurrency at a
+    time. Records are read only as fast as they're handled, so files of any size work.
+
+    Errors caused by the backend are retried up to max_attempts times. Records that still fail are written to the
+    JSONL error report and count as done, so resuming doesn't retry them: fix them up and run the report's records
+    again. So are lines that aren't JSON, records dedupe_key fails on, and records whose to_output fails (those
+    were handled, so check before running them again). If writing a report or a checkpoint, or on_progress, fails,
+    no more records are started and the error is raised once the ones in flight are done.
+
+    With dedupe_key, records with the same key as an earlier one are dropped. With to_output, whatever it returns
+    for (record_number, record, what handle returned) is written to the JSONL file at output_path, as soon as each
+    record is done.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    error_report = JsonlWriter(error_report_path)
+    output = JsonlWriter(output_path)
+    seen = set()
+    result = PipelineResult()
+    result_lock = threading.Lock()
+    slots = threading.BoundedSemaphore(concurrency)
+
+    crashed = []
+
+    def finish(record_number, record, error, attempts):
+        with result_lock:
+            if error is None:
+                result.succeeded += 1
+            else:
+                result.failed += 1
+        if error is not None:
+            error_report.write(
+                {
+                    "record_number": record_number,
+                    "record": record.line if isinstance(record, _MalformedLine) else record,
+                    "error_type": type(error).__name__,
+                    "error": _describe(error),
+                    "attempts": attempts,
+                }
+            )
+        checkpoint.mark_done(record_number)
+        if on_progress is not None:
+            on_progress(result)
+
+    def process(record_number, record):
+        try:
+            value, error, attempts = _call_with_retries(handle, record, max_attempts, base_delay)
+            if error is None and to_output is not None:
+                try:
+                    line = to_output(record_number, record, value)
+                except Exception as e:
+                    error = e
+                else:
+                    if line is not None:
+                        output.write(line)
+            finish(record_number, record, error, attempts)
+        except Exception as e:
+            crashed.append(e)
+        finally:
+            slots.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="propelauth-pipeline") as executor:
+            for record_number, record in records:
+                if crashed:
+                    break
+                error = record.error if isinstance(record, _MalformedLine) else None
+                if error is None and dedupe_key is not None:
+                    try:
+                        # Keys are only kept as digests, so remembering millions of them stays cheap
+                        key = blake2b(repr(dedupe_key(record)).encode("utf-8"), digest_size=16).digest()
+                    except Exception as e:
+                        error = e
+                    else:
+                        if key in seen:
+                            result.duplicates += 1
+                            continue
+                        seen.add(key)
+                if checkpoint.is_done(record_number):
+                    result.skipped += 1
+                    continue
+                if error is not None:
+                    finish(record_number, record, error, 0)
+                    continue
+                slots.acquire()
+                executor.submit(process, record_number, record)
+    finally:
+        checkpoint.save()
+        error_report.close()
+        output.close()
+    if crashed:
+        raise crashed[0]
+    return result
+
+
+def _call_with_retries(handle, record, max_attempts, base_delay):
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            return handle(record), None, attempts
+        except Exception as e:
+            if isinstance(e, _CALLER_ERRORS) or attempts >= max_attempts:
+                return None, e, attempts
+            time.sleep(base_delay * 2 ** (attempts - 1))
+
+
+def _describe(error):
+    # propelauth_py errors keep the backend's explanation in a field rather than in their message
+    for field in ("field_to_errors", "error_message"):
+        value = getattr(error, field, None)
+        if value:
+            return value
+    return str(error) or repr(error)
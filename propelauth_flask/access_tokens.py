@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Optional
+
+
+class AccessTokenCache:
+    """Hands out access tokens minted with create_access_token, reusing one per (user_id, active_org_id,
+    duration_in_minutes), so a caller never gets a token that lives longer than it asked for.
+
+    A token is reused until refresh_ahead_ratio of its lifetime is left. From then on it's still handed
+    out, while a new one is minted in the background. Only once it's within min_remaining_seconds of
+    expiring do callers wait for a new token. Concurrent callers that need a token for the same key wait
+    for the same mint instead of each making their own.
+
+    Tokens for a user are dropped when their sessions are revoked (it's a webhook listener too, see
+    propelauth_flask.webhooks), since PropelAuth will no longer accept them.
+    """
+
+    def __init__(
+        self,
+        create_access_token,
+        refresh_ahead_ratio: float = 0.25,
+        min_remaining_seconds: float = 30,
+        max_size: int = 10000,
+        executor: Optional[Executor] = None,
+    ):
+        self.create_access_token = create_access_token
+        self.refresh_ahead_ratio = refresh_ahead_ratio
+        self.min_remaining_seconds = min_remaining_seconds
+        self.max_size = max_size
+        self._executor = executor
+        self._entries = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, duration_in_minutes: int, active_org_id: Optional[str] = None):
+        """Returns a CreateAccessTokenResponse, minting a new token (with duration_in_minutes) only if needed."""
+        key = (user_id, active_org_id, duration_in_minutes)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at - now > self.min_remaining_seconds:
+                if now >= entry.refresh_at and key not in self._in_flight:
+                    future = self._in_flight[key] = Future()
+                    self._get_executor().submit(
+                        self._mint, key, duration_in_minutes, future
+                    )
+                return entry.response
+
+            future = self._in_flight.get(key)
+            is_minting = future is None
+            if is_minting:
+                future = self._in_flight[key] = Future()
+
+        if is_minting:
+            self._mint(key, duration_in_minutes, future)
+        return future.result()
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+            # Tokens being minted right now won't be kept either
+            for key in [key for key in self._in_flight if key[0] == user_id]:
+                del self._in_flight[key]
+
+    # Webhook listener hooks, see propelauth_flask.webhooks
+    def revoke_user_sessions(self, user_id: str, revoked_at: Optional[float] = None):
+        self.invalidate_user(user_id)
+
+    remove_user = invalidate_user
+
+    def _mint(self, key, duration_in_minutes, future):
+        user_id, active_org_id, _ = key
+        started_at = time.time()
+        try:
+            response = self.create_access_token(user_id, duration_in_minutes, active_org_id)
+        except BaseException as e:
+            with self._lock:
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+            future.set_exception(e)
+            return
+
+        # The token's lifetime started after started_at, so these are slightly early, never late
+        lifetime = duration_in_minutes * 60
+        entry = _Entry(
+            response,
+            expires_at=started_at + lifetime,
+            refresh_at=started_at + lifetime * (1 - self.refresh_ahead_ratio),
+        )
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+                self._entries[key] = entry
+                if len(self._entries) > self.max_size:
+                    self._evict(started_at)
+        future.set_result(response)
+
+    def _evict(self, now):
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_size:
+            del self._entries[next(iter(self._entries))]
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="propelauth-access-token-refresh"
+            )
+        return self._executor
+
+
+class _Entry:
+    __slots__ = ("response", "expires_at", "refresh_at")
+
+    def __init__(self, response, expires_at, refresh_at):
+        self.response = response
+        self.expires_at = expires_at
+        self.refresh_at = refresh_at
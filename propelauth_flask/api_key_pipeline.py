@@ -0,0 +1,227 @@
+import itertools
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from propelauth_py.errors import EndUserApiKeyNotFoundException
+from propelauth_py.types.end_user_api_keys import ApiKeyNew
+
+from propelauth_flask._pipeline import JsonlWriter, PipelineResult, parse_bool, read_records, run_pipeline
+
+
+def apply_api_key_specs(
+    auth,
+    path: str,
+    mapping_path: Optional[str] = None,
+    concurrency: int = 8,
+    checkpoint_path: Optional[str] = None,
+    error_report_path: Optional[str] = None,
+    max_attempts: int = 3,
+    on_progress: Optional[Callable[[PipelineResult], None]] = None,
+) -> PipelineResult:
+    """Imports, creates, updates, deletes or rotates every API key described in a JSONL or CSV file, with auth
+    (usually your FlaskAuth). Each record has an action, plus the arguments of the FlaskAuth method it stands for:
+
+    - import: api_key_token, and optionally org_id, user_id, expires_at_seconds and metadata
+    - create: org_id and/or user_id, expires_at_seconds, metadata, and optionally idempotency_key
+    - update: api_key_id, expires_at_seconds, metadata, set_to_never_expire
+    - delete: api_key_id
+    - rotate: api_key_id of the key to replace. A new key is created for the same org and user (with the same
+      metadata, unless given), and the old one is deleted - or, with old_key_grace_seconds, expires that much later.
+
+    Records for a key that an earlier record already acted on the same way are skipped, and so are those a previous
+    run with the same checkpoint_path finished. Creates are only skipped when they repeat an earlier record's
+    idempotency_key, since two identical creates without one are taken to mean two keys. As each key is imported,
+    created or rotated, a line mapping the old key to the new one is appended to the JSONL file at mapping_path,
+    which holds new API key tokens and is created readable only by its owner.
+
+    A rotation also appends a rotate_started line with the new key to mapping_path before it retires the old key.
+    A rotation that's retried, or resumed by a later run with the same mapping_path, reuses that new key instead of
+    creating another, so a rotate_started line without a matching rotate line is a new key whose old key may still
+    be working. Without mapping_path, a rotation interrupted by the process stopping is done again in full.
+    """
+    # New keys from rotations that haven't retired the old key yet, so retrying them doesn't create another one
+    rotated_keys = _pending_rotations(mapping_path)
+    rotation_journal = JsonlWriter(mapping_path)
+    try:
+        return run_pipeline(
+            read_records(path),
+            lambda spec: apply_api_key_spec(auth, spec, rotated_keys, rotation_journal),
+            concurrency=concurrency,
+            checkpoint_path=checkpoint_path,
+            error_report_path=error_report_path,
+            max_attempts=max_attempts,
+            on_progress=on_progress,
+            dedupe_key=_spec_key,
+            output_path=mapping_path,
+            to_output=_mapping,
+        )
+    finally:
+        rotation_journal.close()
+
+
+def apply_api_key_spec(
+    auth,
+    spec: Dict[str, Any],
+    rotated_keys: Optional[Dict[str, Any]] = None,
+    rotation_journal: Optional[JsonlWriter] = None,
+):
+    spec = _parse_csv_values(spec)
+    action = spec.get("action")
+    if action == "import":
+        return auth.import_api_key(
+            _required(spec, "api_key_token"),
+            spec.get("org_id"),
+            spec.get("user_id"),
+            spec.get("expires_at_seconds"),
+            spec.get("metadata"),
+        )
+    if action == "create":
+        return auth.create_api_key(
+            spec.get("org_id"), spec.get("user_id"), spec.get("expires_at_seconds"), spec.get("metadata")
+        )
+    if action == "update":
+        return auth.update_api_key(
+            _required(spec, "api_key_id"),
+            spec.get("expires_at_seconds"),
+            spec.get("metadata"),
+            spec.get("set_to_never_expire"),
+        )
+    if action == "delete":
+        return auth.delete_api_key(_required(spec, "api_key_id"))
+    if action == "rotate":
+        return _rotate(
+            auth,
+            spec,
+            {} if rotated_keys is None else rotated_keys,
+            JsonlWriter(None) if rotation_journal is None else rotation_journal,
+        )
+    raise ValueError("Unknown action {!r}, expected import, create, update, delete or rotate".format(action))
+
+
+def _rotate(auth, spec, rotated_keys, rotation_journal):
+    old_api_key_id = _required(spec, "api_key_id")
+    new_key = rotated_keys.get(old_api_key_id)
+    created_earlier = new_key is not None
+    if new_key is None:
+        new_key = rotated_keys[old_api_key_id] = _create_replacement(auth, old_api_key_id, spec)
+        # Saved before the old key is touched, so a run that stops in between can pick the new key back up
+        rotation_journal.write(
+            {
+                "action": "rotate_started",
+                "old_api_key_id": old_api_key_id,
+                "new_api_key_id": new_key.api_key_id,
+                "new_api_key_token": new_key.api_key_token,
+            }
+        )
+
+    grace_seconds = spec.get("old_key_grace_seconds")
+    try:
+        if grace_seconds:
+            auth.update_api_key(old_api_key_id, expires_at_seconds=int(time.time() + float(grace_seconds)))
+        else:
+            auth.delete_api_key(old_api_key_id)
+    except EndUserApiKeyNotFoundException:
+        # An earlier attempt may have retired the old key without getting to record it
+        if not created_earlier:
+            raise
+    del rotated_keys[old_api_key_id]
+    return new_key
+
+
+def _pending_rotations(mapping_path):
+    """The new keys that rotations recorded in mapping_path created but never finished with, by old key id."""
+    pending = {}
+    if mapping_path is None or not os.path.exists(mapping_path):
+        return pending
+    with open(mapping_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                mapping = json.loads(line)
+            except ValueError:
+                # The last line of a run that was killed mid-write
+                continue
+            if mapping.get("action") == "rotate_started":
+                pending[mapping["old_api_key_id"]] = ApiKeyNew(mapping["new_api_key_id"], mapping["new_api_key_token"])
+            elif mapping.get("action") == "rotate":
+                pending.pop(mapping["old_api_key_id"], None)
+    return pending
+
+
+def _create_replacement(auth, old_api_key_id, spec):
+    org_id, user_id, metadata = spec.get("org_id"), spec.get("user_id"), spec.get("metadata")
+    if org_id is None and user_id is None:
+        old_key = auth.fetch_api_key(old_api_key_id)
+        org_id, user_id = old_key.org_id, old_key.user_id
+        if metadata is None:
+            metadata = old_key.metadata
+
+    return auth.create_api_key(org_id, user_id, spec.get("expires_at_seconds"), metadata)
+
+
+# Keys for records that say nothing about which key they're for, so each of them is acted on separately
+_unidentified_specs = itertools.count()
+
+
+def _spec_key(spec):
+    """Records with the same key do the same thing, so only the first of them is acted on."""
+    action = spec.get("action")
+    id_field = {"import": "api_key_token", "delete": "api_key_id", "rotate": "api_key_id"}.get(action)
+    if id_field is not None:
+        if not spec.get(id_field):
+            return "unidentified", next(_unidentified_specs)
+        return action, spec[id_field]
+    if action == "create":
+        # Identical creates still make a key each, unless they say they're the same with an idempotency_key
+        if not spec.get("idempotency_key"):
+            return "unidentified", next(_unidentified_specs)
+        return action, spec["idempotency_key"]
+    # Updates with different arguments are different operations
+    return action, repr(sorted(spec.items()))
+
+
+def _mapping(record_number, spec, result):
+    action = spec.get("action")
+    if action == "import":
+        return {
+            "record_number": record_number,
+            "action": action,
+            "old_api_key_token": spec["api_key_token"],
+            "new_api_key_id": result.api_key_id,
+        }
+    if action == "create":
+        return {
+            "record_number": record_number,
+            "action": action,
+            "new_api_key_id": result.api_key_id,
+            "new_api_key_token": result.api_key_token,
+        }
+    if action == "rotate":
+        return {
+            "record_number": record_number,
+            "action": action,
+            "old_api_key_id": spec["api_key_id"],
+            "new_api_key_id": result.api_key_id,
+            "new_api_key_token": result.api_key_token,
+        }
+    return None
+
+
+def _parse_csv_values(spec):
+    """CSV files give every value as a string."""
+    spec = dict(spec)
+    if isinstance(spec.get("metadata"), str):
+        spec["metadata"] = json.loads(spec["metadata"])
+    if isinstance(spec.get("expires_at_seconds"), str):
+        spec["expires_at_seconds"] = int(spec["expires_at_seconds"])
+    if "set_to_never_expire" in spec:
+        spec["set_to_never_expire"] = parse_bool("set_to_never_expire", spec["set_to_never_expire"])
+    return spec
+
+
+def _required(spec, field):
+    value = spec.get(field)
+    if value is None:
+        raise ValueError("{} is required for {}".format(field, spec.get("action")))
+    return value
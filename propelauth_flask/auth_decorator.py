@@ -1,202 +1,397 @@
+import asyncio
+import contextvars
 import functools
-from flask import g, request, abort, Response
+import inspect
+import time
+from flask import current_app, g, request, abort, Response
 from propelauth_py import UnauthorizedException
 from propelauth_py.errors import ForbiddenException
+from propelauth_flask.permissions import compile_permissions, compile_role
+from propelauth_flask.tracing import _NOOP_TRACER
 from propelauth_flask.user import LoggedOutUser, LoggedInUser
 
 def _get_user_credential_decorator(
-    validate_access_token_and_get_user, require_user, debug_mode
+    validate_access_token_and_get_user,
+    require_user,
+    debug_mode,
+    offload_verification=False,
+    verification_executor=None,
+    tracer=None,
 ):
     def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            try:
-                authorization_header = request.headers.get("Authorization")
-                user = validate_access_token_and_get_user(authorization_header)
-
-                g.propelauth_current_user = LoggedInUser(user=user, user_id=user.user_id, org_id_to_org_member_info=user.org_id_to_org_member_info, legacy_user_id=user.legacy_user_id)
-
-            except UnauthorizedException as e:
-                g.propelauth_current_user = LoggedOutUser()
-                _return_401_if_user_required(e, require_user, debug_mode)
-
-            return func(*args, **kwargs)
-
-        return wrapper
+        def get_validation_args():
+            return (request.headers.get("Authorization"),)
+
+        def on_success(user):
+            g.propelauth_current_user = _to_logged_in_user(user)
+
+        def on_unauthorized(e):
+            g.propelauth_current_user = LoggedOutUser()
+            _return_401_if_user_required(e, require_user, debug_mode)
+
+        return _wrap_view(
+            func,
+            validate_access_token_and_get_user,
+            get_validation_args,
+            on_success,
+            on_unauthorized,
+            debug_mode,
+            offload_verification,
+            verification_executor,
+            tracer,
+        )
 
     return decorator
 
 
-def _get_require_org_decorator(validate_access_token_and_get_user_with_org, debug_mode):
+def _get_require_org_decorator(
+    validate_access_token_and_get_user_with_org,
+    debug_mode,
+    offload_verification=False,
+    verification_executor=None,
+    tracer=None,
+):
     def decorator_that_takes_arguments(req_to_org_id=_default_req_to_org_id):
-        def decorator(func):
-            @functools.wraps(func)
-            def wrapper(*args, **kwargs):
-                try:
-                    authorization_header = request.headers.get("Authorization")
-                    required_org_id = req_to_org_id(request)
-                    user_and_org = validate_access_token_and_get_user_with_org(
-                        authorization_header, required_org_id
-                    )
+        return _get_org_member_decorator(
+            validate_access_token_and_get_user_with_org,
+            (),
+            req_to_org_id,
+            debug_mode,
+            offload_verification,
+            verification_executor,
+            tracer,
+        )
 
-                    g.propelauth_current_user = LoggedInUser(user=user_and_org.user, user_id=user_and_org.user.user_id, org_id_to_org_member_info=user_and_org.user.org_id_to_org_member_info, legacy_user_id=user_and_org.user.legacy_user_id)
-                    g.propelauth_current_org = user_and_org.org_member_info
+    return decorator_that_takes_arguments
 
-                except UnauthorizedException as e:
-                    _return_401_if_user_required(e, True, debug_mode)
 
-                except ForbiddenException as e:
-                    _return_exception(e, 403, debug_mode)
+def _require_org_member_with_minimum_role_decorator(
+    validate_access_token_and_get_user_with_org_by_minimum_role,
+    debug_mode,
+    offload_verification=False,
+    verification_executor=None,
+    tracer=None,
+):
+    def decorator_that_takes_arguments(
+        minimum_required_role, req_to_org_id=_default_req_to_org_id
+    ):
+        return _get_org_member_decorator(
+            validate_access_token_and_get_user_with_org_by_minimum_role,
+            (compile_role(minimum_required_role),),
+            req_to_org_id,
+            debug_mode,
+            offload_verification,
+            verification_executor,
+            tracer,
+        )
 
-                return func(*args, **kwargs)
+    return decorator_that_takes_arguments
 
-            return wrapper
 
-        return decorator
+def _require_org_member_with_exact_role_decorator(
+    validate_access_token_and_get_user_with_org_by_exact_role,
+    debug_mode,
+    offload_verification=False,
+    verification_executor=None,
+    tracer=None,
+):
+    def decorator_that_takes_arguments(role, req_to_org_id=_default_req_to_org_id):
+        return _get_org_member_decorator(
+            validate_access_token_and_get_user_with_org_by_exact_role,
+            (role,),
+            req_to_org_id,
+            debug_mode,
+            offload_verification,
+            verification_executor,
+            tracer,
+        )
 
     return decorator_that_takes_arguments
 
 
-def _require_org_member_with_minimum_role_decorator(
-    validate_access_token_and_get_user_with_org_by_minimum_role, debug_mode
+def _require_org_member_with_permission_decorator(
+    validate_access_token_and_get_user_with_org_by_permission,
+    debug_mode,
+    offload_verification=False,
+    verification_executor=None,
+    tracer=None,
 ):
     def decorator_that_takes_arguments(
-        minimum_required_role, req_to_org_id=_default_req_to_org_id
+        permission, req_to_org_id=_default_req_to_org_id
     ):
-        def decorator(func):
-            @functools.wraps(func)
-            def wrapper(*args, **kwargs):
-                try:
-                    authorization_header = request.headers.get("Authorization")
-                    required_org_id = req_to_org_id(request)
-                    user_and_org = (
-                        validate_access_token_and_get_user_with_org_by_minimum_role(
-                            authorization_header, required_org_id, minimum_required_role
-                        )
-                    )
+        return _get_org_member_decorator(
+            validate_access_token_and_get_user_with_org_by_permission,
+            (compile_permissions(permission),),
+            req_to_org_id,
+            debug_mode,
+            offload_verification,
+            verification_executor,
+            tracer,
+        )
 
-                    g.propelauth_current_user = LoggedInUser(user=user_and_org.user, user_id=user_and_org.user.user_id, org_id_to_org_member_info=user_and_org.user.org_id_to_org_member_info, legacy_user_id=user_and_org.user.legacy_user_id)
-                    g.propelauth_current_org = user_and_org.org_member_info
+    return decorator_that_takes_arguments
 
-                except UnauthorizedException as e:
-                    _return_401_if_user_required(e, True, debug_mode)
 
-                except ForbiddenException as e:
-                    _return_exception(e, 403, debug_mode)
+def _require_org_member_with_all_permissions_decorator(
+    validate_access_token_and_get_user_with_org_by_all_permissions,
+    debug_mode,
+    offload_verification=False,
+    verification_executor=None,
+    tracer=None,
+):
+    def decorator_that_takes_arguments(
+        permissions, req_to_org_id=_default_req_to_org_id
+    ):
+        return _get_org_member_decorator(
+            validate_access_token_and_get_user_with_org_by_all_permissions,
+            (compile_permissions(permissions),),
+            req_to_org_id,
+            debug_mode,
+            offload_verification,
+            verification_executor,
+            tracer,
+        )
+
+    return decorator_that_takes_arguments
 
-                return func(*args, **kwargs)
 
-            return wrapper
+def _require_org_member_in_orgs_decorator(
+    validate_access_token_and_get_user_with_orgs,
+    debug_mode,
+    offload_verification=False,
+    verification_executor=None,
+    tracer=None,
+):
+    def decorator_that_takes_arguments(
+        req_to_org_ids, minimum_required_role=None, permissions=None
+    ):
+        minimum_required_role = compile_role(minimum_required_role)
+        permissions = compile_permissions(permissions)
+
+        def decorator(func):
+            def get_validation_args():
+                authorization_header = request.headers.get("Authorization")
+                required_org_ids = req_to_org_ids(request)
+                return (
+                    authorization_header,
+                    list(required_org_ids) if required_org_ids is not None else None,
+                    minimum_required_role,
+                    permissions,
+                )
+
+            def on_success(user_and_orgs):
+                g.propelauth_current_user, g.propelauth_current_orgs = user_and_orgs
+
+            def on_unauthorized(e):
+                _return_401_if_user_required(e, True, debug_mode)
+
+            return _wrap_view(
+                func,
+                validate_access_token_and_get_user_with_orgs,
+                get_validation_args,
+                on_success,
+                on_unauthorized,
+                debug_mode,
+                offload_verification,
+                verification_executor,
+                tracer,
+            )
 
         return decorator
 
     return decorator_that_takes_arguments
 
 
-def _require_org_member_with_exact_role_decorator(
-    validate_access_token_and_get_user_with_org_by_exact_role, debug_mode
+def _require_step_up_decorator(
+    validate_access_token_and_get_user,
+    step_up_grants,
+    verify_step_up_grant,
+    debug_mode,
+    offload_verification=False,
+    verification_executor=None,
+    tracer=None,
 ):
-    def decorator_that_takes_arguments(role, req_to_org_id=_default_req_to_org_id):
+    require_user = _get_user_credential_decorator(
+        validate_access_token_and_get_user,
+        True,
+        debug_mode,
+        offload_verification,
+        verification_executor,
+        tracer,
+    )
+
+    def decorator_that_takes_arguments(
+        action_type, req_to_grant=_default_req_to_grant, remember_verified_for_seconds=None
+    ):
         def decorator(func):
-            @functools.wraps(func)
-            def wrapper(*args, **kwargs):
-                try:
-                    authorization_header = request.headers.get("Authorization")
-                    required_org_id = req_to_org_id(request)
-                    user_and_org = (
-                        validate_access_token_and_get_user_with_org_by_exact_role(
-                            authorization_header, required_org_id, role
-                        )
+            def get_grant():
+                grant = req_to_grant(request)
+                if not grant:
+                    _return_exception(ForbiddenException("Step up grant is required"), 403, debug_mode)
+                return grant
+
+            def on_verified(verified, user_id, grant):
+                if not verified:
+                    _return_exception(ForbiddenException("Step up grant is invalid"), 403, debug_mode)
+                if remember_verified_for_seconds:
+                    step_up_grants.remember(
+                        action_type, user_id, grant, time.time() + remember_verified_for_seconds
                     )
 
-                    g.propelauth_current_user = LoggedInUser(user=user_and_org.user, user_id=user_and_org.user.user_id, org_id_to_org_member_info=user_and_org.user.org_id_to_org_member_info, legacy_user_id=user_and_org.user.legacy_user_id)
-                    g.propelauth_current_org = user_and_org.org_member_info
-
-                except UnauthorizedException as e:
-                    _return_401_if_user_required(e, True, debug_mode)
-
-                except ForbiddenException as e:
-                    _return_exception(e, 403, debug_mode)
+            if inspect.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    grant = get_grant()
+                    user_id = g.propelauth_current_user.user_id
+                    if not step_up_grants.is_remembered(action_type, user_id, grant):
+                        if inspect.iscoroutinefunction(verify_step_up_grant):
+                            verified = await verify_step_up_grant(action_type, user_id, grant)
+                        elif offload_verification:
+                            verified = await _run_in_executor(
+                                verification_executor,
+                                verify_step_up_grant,
+                                (action_type, user_id, grant),
+                            )
+                        else:
+                            verified = verify_step_up_grant(action_type, user_id, grant)
+                        on_verified(verified, user_id, grant)
+                    return await func(*args, **kwargs)
+
+                return require_user(async_wrapper)
 
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                grant = get_grant()
+                user_id = g.propelauth_current_user.user_id
+                if not step_up_grants.is_remembered(action_type, user_id, grant):
+                    on_verified(
+                        current_app.ensure_sync(verify_step_up_grant)(action_type, user_id, grant),
+                        user_id,
+                        grant,
+                    )
                 return func(*args, **kwargs)
 
-            return wrapper
+            return require_user(wrapper)
 
         return decorator
 
     return decorator_that_takes_arguments
 
 
-def _require_org_member_with_permission_decorator(
-    validate_access_token_and_get_user_with_org_by_permission, debug_mode
+def _get_org_member_decorator(
+    validate_access_token_and_get_user_with_org,
+    extra_validation_args,
+    req_to_org_id,
+    debug_mode,
+    offload_verification,
+    verification_executor,
+    tracer,
 ):
-    def decorator_that_takes_arguments(
-        permission, req_to_org_id=_default_req_to_org_id
-    ):
-        def decorator(func):
-            @functools.wraps(func)
-            def wrapper(*args, **kwargs):
-                try:
-                    authorization_header = request.headers.get("Authorization")
-                    required_org_id = req_to_org_id(request)
-                    user_and_org = (
-                        validate_access_token_and_get_user_with_org_by_permission(
-                            authorization_header, required_org_id, permission
-                        )
-                    )
+    def decorator(func):
+        def get_validation_args():
+            authorization_header = request.headers.get("Authorization")
+            required_org_id = req_to_org_id(request)
+            return (authorization_header, required_org_id) + extra_validation_args
+
+        def on_success(user_and_org):
+            g.propelauth_current_user = _to_logged_in_user(user_and_org.user)
+            g.propelauth_current_org = user_and_org.org_member_info
+
+        def on_unauthorized(e):
+            _return_401_if_user_required(e, True, debug_mode)
+
+        return _wrap_view(
+            func,
+            validate_access_token_and_get_user_with_org,
+            get_validation_args,
+            on_success,
+            on_unauthorized,
+            debug_mode,
+            offload_verification,
+            verification_executor,
+            tracer,
+        )
 
-                    g.propelauth_current_user = LoggedInUser(user=user_and_org.user, user_id=user_and_org.user.user_id, org_id_to_org_member_info=user_and_org.user.org_id_to_org_member_info, legacy_user_id=user_and_org.user.legacy_user_id)
-                    g.propelauth_current_org = user_and_org.org_member_info
+    return decorator
 
-                except UnauthorizedException as e:
-                    _return_401_if_user_required(e, True, debug_mode)
 
-                except ForbiddenException as e:
-                    _return_exception(e, 403, debug_mode)
+def _wrap_view(
+    func,
+    validate,
+    get_validation_args,
+    on_success,
+    on_unauthorized,
+    debug_mode,
+    offload_verification,
+    verification_executor,
+    tracer,
+):
+    """Wraps a view so validation runs before it.
 
-                return func(*args, **kwargs)
+    Coroutine views get a coroutine wrapper, so Flask keeps treating them as async views. If
+    offload_verification is set, token verification for those views runs in
+    verification_executor (or the event loop's default executor) instead of on the loop, unless
+    the token is already in the token cache.
+    """
+    tracer = tracer if tracer is not None else _NOOP_TRACER
+    span_attributes = {"propelauth.view": func.__name__}
 
-            return wrapper
+    if inspect.iscoroutinefunction(func):
 
-        return decorator
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                with tracer.start_span("propelauth.authenticate", span_attributes):
+                    validation_args = get_validation_args()
+                    if offload_verification:
+                        # Tokens that are already cached are cheap to check, so only misses leave the loop
+                        result = validate(*validation_args, cached_only=True)
+                        if result is None:
+                            result = await _run_in_executor(
+                                verification_executor, validate, validation_args
+                            )
+                    else:
+                        result = validate(*validation_args)
+                    on_success(result)
 
-    return decorator_that_takes_arguments
+            except UnauthorizedException as e:
+                on_unauthorized(e)
 
+            except ForbiddenException as e:
+                _return_exception(e, 403, debug_mode)
 
-def _require_org_member_with_all_permissions_decorator(
-    validate_access_token_and_get_user_with_org_by_all_permissions, debug_mode
-):
-    def decorator_that_takes_arguments(
-        permissions, req_to_org_id=_default_req_to_org_id
-    ):
-        def decorator(func):
-            @functools.wraps(func)
-            def wrapper(*args, **kwargs):
-                try:
-                    authorization_header = request.headers.get("Authorization")
-                    required_org_id = req_to_org_id(request)
-                    user_and_org = (
-                        validate_access_token_and_get_user_with_org_by_all_permissions(
-                            authorization_header, required_org_id, permissions
-                        )
-                    )
+            return await func(*args, **kwargs)
 
-                    g.propelauth_current_user = LoggedInUser(user=user_and_org.user, user_id=user_and_org.user.user_id, org_id_to_org_member_info=user_and_org.user.org_id_to_org_member_info, legacy_user_id=user_and_org.user.legacy_user_id)
-                    g.propelauth_current_org = user_and_org.org_member_info
+        return async_wrapper
 
-                except UnauthorizedException as e:
-                    _return_401_if_user_required(e, True, debug_mode)
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            with tracer.start_span("propelauth.authenticate", span_attributes):
+                result = validate(*get_validation_args())
+                on_success(result)
 
-                except ForbiddenException as e:
-                    _return_exception(e, 403, debug_mode)
+        except UnauthorizedException as e:
+            on_unauthorized(e)
 
-                return func(*args, **kwargs)
+        except ForbiddenException as e:
+            _return_exception(e, 403, debug_mode)
 
-            return wrapper
+        return func(*args, **kwargs)
 
-        return decorator
+    return wrapper
 
-    return decorator_that_takes_arguments
+
+async def _run_in_executor(executor, func, args):
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context, so spans started there have the view's span as their parent
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(context.run, func, *args))
+
+
+def _to_logged_in_user(user):
+    return LoggedInUser(user=user)
 
 
 def _return_401_if_user_required(e, require_user, debug_mode):
@@ -214,4 +409,8 @@ def _return_exception(e, status, debug_mode):
 
 
 def _default_req_to_org_id(req):
-    return req.view_args.get("org_id")
\ No newline at end of file
+    return req.view_args.get("org_id")
+
+
+def _default_req_to_grant(req):
+    return req.headers.get("X-Step-Up-Grant")
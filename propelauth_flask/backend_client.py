@@ -0,0 +1,230 @@
+"""Runs every call FlaskAuth and FlaskAuthAsync make to the PropelAuth backend through a chain of interceptors.
+
+_BackendClient wraps the propelauth_py client and exposes the same methods, so the passthrough methods on
+FlaskAuth don't need to know about it. Each call is described by a _BackendCall and handed to every
+interceptor in turn, outermost first. An interceptor does its work around proceed(), which runs the rest of
+the chain and the real call.
+"""
+import asyncio
+import copy
+import inspect
+import threading
+from concurrent.futures import Future
+
+READ_METHODS = frozenset(
+    {
+        "fetch_user_metadata_by_user_id",
+        "fetch_user_metadata_by_email",
+        "fetch_user_metadata_by_username",
+        "fetch_batch_user_metadata_by_user_ids",
+        "fetch_batch_user_metadata_by_emails",
+        "fetch_batch_user_metadata_by_usernames",
+        "fetch_org",
+        "fetch_org_by_query",
+        "fetch_custom_role_mappings",
+        "fetch_pending_invites",
+        "fetch_users_by_query",
+        "fetch_users_in_org",
+        "fetch_user_signup_query_params_by_user_id",
+        "fetch_user_mfa_methods",
+        "fetch_api_key",
+        "fetch_current_api_keys",
+        "fetch_archived_api_keys",
+        "fetch_api_key_usage",
+        "fetch_saml_sp_metadata",
+        "fetch_employee_by_id",
+        "validate_api_key",
+        "validate_personal_api_key",
+        "validate_org_api_key",
+        "validate_imported_api_key",
+    }
+)
+"""Backend methods that only read, so calling them more than once (or not at all) changes nothing."""
+
+VALIDATION_METHODS = frozenset(
+    {"validate_api_key", "validate_personal_api_key", "validate_org_api_key", "validate_imported_api_key"}
+)
+"""Read methods that decide whether a credential is still good, so an old answer must never stand in for them."""
+
+
+class _BackendCall:
+    __slots__ = ("method_name", "args", "kwargs", "is_read")
+
+    def __init__(self, method_name, args, kwargs):
+        self.method_name = method_name
+        self.args = args
+        self.kwargs = kwargs
+        self.is_read = method_name in READ_METHODS
+
+    def key(self):
+        """A hashable key for calls with the same method and arguments, or None if they can't be compared."""
+        try:
+            key = (self.method_name, _freeze(self.args), _freeze(self.kwargs))
+            hash(key)
+            return key
+        except TypeError:
+            return None
+
+    def __repr__(self):
+        return "_BackendCall({})".format(self.method_name)
+
+
+class _Interceptor:
+    def intercept(self, call: _BackendCall, proceed):
+        return proceed()
+
+    async def intercept_async(self, call: _BackendCall, proceed):
+        return await proceed()
+
+
+class _BackendClient:
+    """Exposes the methods of a propelauth_py Auth or AsyncAuth, running each call through interceptors."""
+
+    def __init__(self, auth, interceptors=()):
+        self._auth = auth
+        self._interceptors = list(interceptors)
+        self._wrapped_methods = {}
+
+    @property
+    def interceptors(self):
+        return tuple(self._interceptors)
+
+    def add_interceptor(self, interceptor, outermost=False):
+        if outermost:
+            self._interceptors.insert(0, interceptor)
+        else:
+            self._interceptors.append(interceptor)
+        self._wrapped_methods = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._auth, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        wrapped = self._wrapped_methods.get(name)
+        if wrapped is None:
+            wrapped = self._wrap(name, attr)
+            self._wrapped_methods[name] = wrapped
+        return wrapped
+
+    def _wrap(self, name, method):
+        interceptors = tuple(self._interceptors)
+
+        if inspect.iscoroutinefunction(method):
+
+            async def call_async(*args, **kwargs):
+                call = _BackendCall(name, args, kwargs)
+
+                def proceed_from(index):
+                    if index == len(interceptors):
+                        return lambda: method(*call.args, **call.kwargs)
+                    return lambda: interceptors[index].intercept_async(call, proceed_from(index + 1))
+
+                return await proceed_from(0)()
+
+            return call_async
+
+        def call_sync(*args, **kwargs):
+            call = _BackendCall(name, args, kwargs)
+
+            def proceed_from(index):
+                if index == len(interceptors):
+                    return lambda: method(*call.args, **call.kwargs)
+                return lambda: interceptors[index].intercept(call, proceed_from(index + 1))
+
+            return proceed_from(0)()
+
+        return call_sync
+
+
+class _LeaderGaveUp(Exception):
+    """Shared with the callers that joined a call whose caller was cancelled (or interrupted) before it finished."""
+
+
+class _SingleFlight(_Interceptor):
+    """Makes identical read calls that overlap share one backend request and its result.
+
+    The caller that makes the request gets its result, and the ones that joined it get a copy each, so none of
+    them sees what another does to theirs. It's off unless deduplicate_reads=True is passed to init_auth, as it
+    also shares API key validations that overlap. If that caller is cancelled before the request finishes, the others
+    don't inherit the cancellation: one of them makes the request instead. Async calls share a
+    concurrent.futures.Future rather than an asyncio one, because Flask runs each async view in its own event loop
+    and callers on different loops should still share a request.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def intercept(self, call, proceed):
+        key = call.key() if call.is_read else None
+        if key is None:
+            return proceed()
+
+        while True:
+            future, is_leader = self._join(key)
+            if is_leader:
+                return self._lead(key, future, proceed)
+            try:
+                return copy.deepcopy(future.result())
+            except _LeaderGaveUp:
+                continue
+
+    async def intercept_async(self, call, proceed):
+        key = call.key() if call.is_read else None
+        if key is None:
+            return await proceed()
+
+        while True:
+            future, is_leader = self._join(key)
+            if is_leader:
+                break
+            try:
+                # Shielded, so this caller being cancelled doesn't cancel the future the others are waiting on
+                return copy.deepcopy(await asyncio.shield(asyncio.wrap_future(future)))
+            except _LeaderGaveUp:
+                continue
+
+        try:
+            result = await proceed()
+        except BaseException as e:
+            self._finish(key, future, exception=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def _join(self, key):
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future, False
+            future = self._in_flight[key] = Future()
+            return future, True
+
+    def _lead(self, key, future, proceed):
+        try:
+            result = proceed()
+        except BaseException as e:
+            self._finish(key, future, exception=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def _finish(self, key, future, result=None, exception=None):
+        with self._lock:
+            del self._in_flight[key]
+        if exception is not None:
+            # Errors from the backend are shared, but a cancellation is the leader's alone
+            future.set_exception(exception if isinstance(exception, Exception) else _LeaderGaveUp())
+        else:
+            # Followers copy from a copy of their own, as the leader may be changing its result while they do
+            future.set_result(copy.deepcopy(result))
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        frozen = tuple(_freeze(v) for v in value)
+        return ("set", frozenset(frozen)) if isinstance(value, (set, frozenset)) else frozen
+    return value
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from propelauth_flask.deadlines import DeadlineExceeded, deadline, remaining_seconds
+
+
+class BackgroundLoop:
+    """An event loop that runs forever on a daemon thread, so sync code can run coroutines on it.
+
+    Unlike asyncio.run, which builds (and tears down) a new loop for every call, anything bound to this loop - like
+    an httpx connection pool - is reused from call to call. The thread is started on first use, and again in a
+    forked child, where it no longer exists.
+    """
+
+    def __init__(self, name: str = "propelauth-event-loop"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+        return self._loop
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Runs coro on the loop and returns its result, waiting at most timeout seconds (or until the deadline)."""
+        return self.gather(coro, timeout=timeout)[0]
+
+    def gather(self, *coros, return_exceptions: bool = False, timeout: Optional[float] = None):
+        """Runs coros on the loop concurrently and returns their results, in order.
+
+        The current deadline (see propelauth_flask.deadline) applies to them too, and is also the longest this
+        waits for them.
+        """
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            for coro in coros:
+                coro.close()
+            raise RuntimeError("Can't wait for the background loop from its own thread, await the calls instead")
+
+        remaining = remaining_seconds()
+        if remaining is not None:
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        future = asyncio.run_coroutine_threadsafe(
+            _gather(coros, return_exceptions, remaining), loop
+        )
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            if timeout == remaining:
+                raise DeadlineExceeded("gather") from None
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def run_async(self, coro):
+        """Runs coro on the loop and awaits its result from another event loop, which keeps running meanwhile."""
+        future = asyncio.run_coroutine_threadsafe(_gather((coro,), False, remaining_seconds()), self.loop)
+        return (await asyncio.wrap_future(future))[0]
+
+    def close(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            asyncio.run_coroutine_threadsafe(_cancel_tasks(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._pid = None
+
+    def _start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+        self._thread.start()
+        self._pid = os.getpid()
+
+
+async def _gather(coros, return_exceptions, remaining):
+    if remaining is None:
+        return await asyncio.gather(*coros, return_exceptions=return_exceptions)
+    with deadline(remaining):
+        return await asyncio.gather(*coros, return_exceptions=return_exceptions)
+
+
+async def _cancel_tasks():
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_default_background_loop = BackgroundLoop()
@@ -0,0 +1,73 @@
+import asyncio
+import inspect
+import threading
+import traceback
+
+from propelauth_py.logging_config import get_logger
+
+from propelauth_flask.backend_client import _Interceptor
+from propelauth_flask.call_accounting import _caller_frames
+
+
+class BlockingCallError(RuntimeError):
+    pass
+
+
+class BlockingCallDetector(_Interceptor):
+    """Notices FlaskAuth's blocking backend methods being called while an event loop is running on the same
+    thread, e.g. from an async def view, which stops that loop until PropelAuth responds. See
+    FlaskAuth.detect_blocking_calls."""
+
+    def __init__(self, raise_error: bool = False):
+        self.raise_error = raise_error
+        self._reported_call_sites = set()
+        self._lock = threading.Lock()
+
+    def intercept(self, call, proceed):
+        if _has_running_loop():
+            self._report(call.method_name)
+        return proceed()
+
+    def _report(self, method_name):
+        frames = _caller_frames()
+        call_site = "{}:{}".format(frames[-1].filename, frames[-1].lineno) if frames else "an unknown call site"
+        message = (
+            "FlaskAuth.{0} was called at {1} while an event loop is running, which blocks the loop until PropelAuth "
+            "responds. Use `await auth.nonblocking.{0}(...)` instead.".format(method_name, call_site)
+        )
+        if self.raise_error:
+            raise BlockingCallError(message)
+
+        with self._lock:
+            # Once per call site, as the same view runs over and over
+            if call_site in self._reported_call_sites:
+                return
+            self._reported_call_sites.add(call_site)
+        get_logger().warning("%s Called from:\n%s", message, "".join(traceback.format_list(frames[-8:])))
+
+
+class _NonBlockingAuth:
+    """FlaskAuthAsync's backend methods for a FlaskAuth, run on its background_loop so that awaiting them from any
+    event loop (like the one of an async def view) leaves that loop free to do other work."""
+
+    def __init__(self, flask_auth):
+        self._flask_auth = flask_auth
+
+    def __getattr__(self, name):
+        method = getattr(self._flask_auth.async_auth, name)
+        if name.startswith("_") or not inspect.iscoroutinefunction(method):
+            raise AttributeError("{} has no async method {}".format(type(self._flask_auth.async_auth).__name__, name))
+
+        async def nonblocking(*args, **kwargs):
+            return await self._flask_auth.background_loop.run_async(method(*args, **kwargs))
+
+        return nonblocking
+
+
+def _has_running_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from flask import g, has_request_context, request
+from propelauth_py.logging_config import get_logger
+
+from propelauth_flask.backend_client import _Interceptor
+
+_PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class BackendCallStats:
+    """The backend calls made while handling one request. by_method maps each method to [count, seconds]."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.by_method: Dict[str, List[float]] = {}
+        self.warned = False
+        self._lock = threading.Lock()
+
+    def record(self, method_name: str, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            totals = self.by_method.setdefault(method_name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def summary(self) -> str:
+        with self._lock:
+            by_method = sorted(self.by_method.items(), key=lambda item: -item[1][0])
+        return ", ".join("{} x{}".format(method_name, int(count)) for method_name, (count, _) in by_method)
+
+    def __repr__(self):
+        return "BackendCallStats(count={}, seconds={:.3f})".format(self.count, self.seconds)
+
+
+class CallAccounting(_Interceptor):
+    """Counts and times the backend calls made while handling each Flask request. See
+    FlaskAuth.enable_call_accounting."""
+
+    def __init__(
+        self,
+        max_calls: Optional[int] = 10,
+        max_seconds: Optional[float] = 1.0,
+        header_name: Optional[str] = "X-PropelAuth-Backend-Calls",
+    ):
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.header_name = header_name
+
+    def init_app(self, app):
+        app.before_request(_start_accounting)
+        if self.header_name is not None:
+            app.after_request(self._add_header)
+
+    def intercept(self, call, proceed):
+        stats = _current_stats()
+        if stats is None:
+            return proceed()
+        started_at = time.perf_counter()
+        try:
+            return proceed()
+        finally:
+            self._record(stats, call.method_name, time.perf_counter() - started_at)
+
+    async def intercept_async(self, call, proceed):
+        stats = _current_stats()
+        if stats is None:
+            return await proceed()
+        started_at = time.perf_counter()
+        try:
+            return await proceed()
+        finally:
+            self._record(stats, call.method_name, time.perf_counter() - started_at)
+
+    def _record(self, stats, method_name, seconds):
+        stats.record(method_name, seconds)
+        with stats._lock:
+            too_many = self.max_calls is not None and stats.count > self.max_calls
+            too_slow = self.max_seconds is not None and stats.seconds > self.max_seconds
+            # Once per request is enough to find the loop
+            warn = (too_many or too_slow) and not stats.warned
+            stats.warned = stats.warned or warn
+        if warn:
+            get_logger().warning(
+                "%s %s made %d PropelAuth backend calls taking %.3fs (limits are %s calls and %ss): %s. "
+                "The last one was made from:\n%s",
+                request.method,
+                request.path,
+                stats.count,
+                stats.seconds,
+                self.max_calls,
+                self.max_seconds,
+                stats.summary(),
+                _caller_stack(),
+            )
+
+    def _add_header(self, response):
+        stats = _current_stats()
+        if stats is not None:
+            response.headers[self.header_name] = "count={}, duration_ms={:.1f}".format(
+                stats.count, stats.seconds * 1000
+            )
+        return response
+
+
+def _start_accounting():
+    g.propelauth_backend_calls = BackendCallStats()
+
+
+def _current_stats() -> Optional[BackendCallStats]:
+    if not has_request_context():
+        return None
+    return g.get("propelauth_backend_calls")
+
+
+def _caller_stack(limit=8):
+    """The innermost frames of the current stack that aren't in this package."""
+    return "".join(traceback.format_list(_caller_frames()[-limit:]))
+
+
+def _caller_frames():
+    return [
+        frame for frame in traceback.extract_stack()
+        if not os.path.abspath(frame.filename).startswith(_PACKAGE_DIRECTORY)
+    ]
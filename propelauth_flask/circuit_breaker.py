@@ -0,0 +1,278 @@
+import copy
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from propelauth_py.errors import (
+    BadRequestException,
+    CreateUserException,
+    EndUserApiKeyException,
+    EndUserApiKeyNotFoundException,
+    EndUserApiKeyRateLimitedException,
+    FeatureGatedException,
+    ForbiddenException,
+    IncorrectMfaCodeException,
+    InviteUserToOrgException,
+    MfaNotEnabledException,
+    StepUpMfaGrantNotFoundException,
+    UnauthorizedException,
+    UpdateUserEmailException,
+    UpdateUserMetadataException,
+    UpdateUserPasswordException,
+    UserNotFoundException,
+)
+
+from propelauth_flask.backend_client import VALIDATION_METHODS, _Interceptor
+
+# Errors that say something about the request, not about the health of the backend
+_CALLER_ERRORS = (
+    ValueError,
+    BadRequestException,
+    CreateUserException,
+    EndUserApiKeyException,
+    EndUserApiKeyNotFoundException,
+    EndUserApiKeyRateLimitedException,
+    FeatureGatedException,
+    ForbiddenException,
+    IncorrectMfaCodeException,
+    InviteUserToOrgException,
+    MfaNotEnabledException,
+    StepUpMfaGrantNotFoundException,
+    UnauthorizedException,
+    UpdateUserEmailException,
+    UpdateUserMetadataException,
+    UpdateUserPasswordException,
+    UserNotFoundException,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# How a call went, as far as the backend's health goes
+_SUCCEEDED = "succeeded"
+_FAILED = "failed"
+_ANSWERED = "answered"  # with an error that's the caller's fault
+_ABANDONED = "abandoned"  # the caller gave up, e.g. it was cancelled
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend endpoint whose circuit is open."""
+
+    def __init__(self, method_name):
+        super().__init__("Circuit for {} is open".format(method_name))
+        self.method_name = method_name
+
+
+class CircuitBreakerSettings:
+    """When a circuit opens: once at least minimum_calls of the last window_size calls were made and
+    failure_rate_threshold of them failed. A call fails if it raises an error that isn't the caller's fault,
+    or takes longer than slow_call_seconds. An open circuit lets a probe call through after open_seconds,
+    and closes again once half_open_probes probes in a row succeed. A probe that the caller gave up on, or that
+    failed with an error that's the caller's fault, doesn't count either way and another call takes its place."""
+
+    def __init__(
+        self,
+        window_size: int = 20,
+        minimum_calls: int = 5,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+    ):
+        self.window_size = window_size
+        self.minimum_calls = minimum_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+
+class CircuitBreaker(_Interceptor):
+    """Fails backend calls fast while their endpoint is unhealthy, instead of tying up a worker each.
+
+    Every backend method has its own circuit, using default_settings unless it has an entry in
+    endpoint_settings. With serve_stale, read methods whose circuit is open return a copy of the last result they
+    successfully returned for the same arguments (up to stale_cache_size of them, none older than
+    max_stale_seconds), and only raise CircuitOpenError if there isn't one. API key validation is never served
+    stale, so a key revoked during an outage doesn't keep working.
+
+    Pass it to init_auth / init_auth_async as circuit_breaker.
+    """
+
+    def __init__(
+        self,
+        default_settings: Optional[CircuitBreakerSettings] = None,
+        endpoint_settings: Optional[Dict[str, CircuitBreakerSettings]] = None,
+        serve_stale: bool = False,
+        stale_cache_size: int = 1000,
+        max_stale_seconds: float = 300.0,
+    ):
+        self.default_settings = default_settings or CircuitBreakerSettings()
+        self.endpoint_settings = dict(endpoint_settings or {})
+        self.serve_stale = serve_stale
+        self.stale_cache_size = stale_cache_size
+        self.max_stale_seconds = max_stale_seconds
+        self._circuits = {}
+        self._stale = OrderedDict()
+        self._lock = threading.Lock()
+
+    def state(self, method_name: str) -> str:
+        circuit = self._circuits.get(method_name)
+        if circuit is None:
+            return CLOSED
+        with self._lock:
+            return circuit.current_state(time.monotonic())
+
+    def intercept(self, call, proceed):
+        circuit = self._circuit(call.method_name)
+        allowed, probe = self._try_acquire(circuit)
+        if not allowed:
+            return self._fail_fast(call)
+
+        started_at = time.monotonic()
+        try:
+            result = proceed()
+        except BaseException as e:
+            self._record(circuit, probe, started_at, e)
+            raise
+        self._record(circuit, probe, started_at, None)
+        self._remember(call, result)
+        return result
+
+    async def intercept_async(self, call, proceed):
+        circuit = self._circuit(call.method_name)
+        allowed, probe = self._try_acquire(circuit)
+        if not allowed:
+            return self._fail_fast(call)
+
+        started_at = time.monotonic()
+        try:
+            result = await proceed()
+        except BaseException as e:
+            self._record(circuit, probe, started_at, e)
+            raise
+        self._record(circuit, probe, started_at, None)
+        self._remember(call, result)
+        return result
+
+    def _circuit(self, method_name):
+        circuit = self._circuits.get(method_name)
+        if circuit is None:
+            with self._lock:
+                circuit = self._circuits.setdefault(
+                    method_name,
+                    _Circuit(self.endpoint_settings.get(method_name, self.default_settings)),
+                )
+        return circuit
+
+    def _try_acquire(self, circuit):
+        with self._lock:
+            return circuit.try_acquire(time.monotonic())
+
+    def _record(self, circuit, probe, started_at, error):
+        now = time.monotonic()
+        if error is None:
+            outcome = _FAILED if now - started_at > circuit.settings.slow_call_seconds else _SUCCEEDED
+        elif not isinstance(error, Exception):
+            outcome = _ABANDONED
+        elif isinstance(error, _CALLER_ERRORS):
+            outcome = _ANSWERED
+        else:
+            outcome = _FAILED
+        with self._lock:
+            circuit.record(outcome, probe, now)
+
+    def _fail_fast(self, call):
+        if self._serves_stale(call):
+            key = call.key()
+            with self._lock:
+                entry = self._stale.get(key)
+                if entry is not None and time.monotonic() - entry[0] > self.max_stale_seconds:
+                    del self._stale[key]
+                    entry = None
+            if entry is not None:
+                return copy.deepcopy(entry[1])
+        raise CircuitOpenError(call.method_name)
+
+    def _serves_stale(self, call):
+        return self.serve_stale and call.is_read and call.method_name not in VALIDATION_METHODS
+
+    def _remember(self, call, result):
+        if not self._serves_stale(call):
+            return
+        key = call.key()
+        if key is None:
+            return
+        # A copy, so what the caller does to its result doesn't change what's served later
+        entry = (time.monotonic(), copy.deepcopy(result))
+        with self._lock:
+            self._stale[key] = entry
+            self._stale.move_to_end(key)
+            while len(self._stale) > self.stale_cache_size:
+                self._stale.popitem(last=False)
+
+
+class _Circuit:
+    """The state of one endpoint's circuit. Callers hold the breaker's lock."""
+
+    def __init__(self, settings: CircuitBreakerSettings):
+        self.settings = settings
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=settings.window_size)
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        # Which round of probing is going on, so probes from an earlier one don't count in it
+        self.probe_round = 0
+
+    def current_state(self, now):
+        if self.state == OPEN and now - self.opened_at >= self.settings.open_seconds:
+            return HALF_OPEN
+        return self.state
+
+    def try_acquire(self, now):
+        """Returns whether a call may go ahead, and the round of probing it's a probe in (None if it isn't one)."""
+        state = self.current_state(now)
+        if state != HALF_OPEN:
+            return state == CLOSED, None
+        if self.state == OPEN:
+            # The open period is over, start probing
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+            self.probe_successes = 0
+            self.probe_round += 1
+        if self.probes_in_flight + self.probe_successes < self.settings.half_open_probes:
+            self.probes_in_flight += 1
+            return True, self.probe_round
+        return False, None
+
+    def record(self, outcome, probe, now):
+        if probe is not None:
+            if self.state != HALF_OPEN or probe != self.probe_round:
+                # A probe from a round of probing that's over
+                return
+            self.probes_in_flight -= 1
+            if outcome == _FAILED:
+                self._open(now)
+            elif outcome == _SUCCEEDED:
+                self.probe_successes += 1
+                if self.probe_successes >= self.settings.half_open_probes:
+                    self.state = CLOSED
+                    self.outcomes.clear()
+            return
+        if self.state != CLOSED or outcome == _ABANDONED:
+            # A call that started before the circuit opened, or one that says nothing about the backend
+            return
+
+        self.outcomes.append(outcome == _FAILED)
+        if len(self.outcomes) >= self.settings.minimum_calls:
+            failure_rate = sum(self.outcomes) / len(self.outcomes)
+            if failure_rate >= self.settings.failure_rate_threshold:
+                self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.outcomes.clear()
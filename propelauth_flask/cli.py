@@ -0,0 +1,139 @@
+"""The python -m propelauth_flask command line, for bulk jobs that are too big to write a script around each call.
+
+Every command reads the auth URL and API key from --auth-url and --api-key, or from the PROPELAUTH_AUTH_URL and
+PROPELAUTH_API_KEY environment variables.
+"""
+import argparse
+import os
+import sys
+import time
+
+from propelauth_flask import init_auth
+from propelauth_flask.api_key_pipeline import apply_api_key_specs
+from propelauth_flask.export import export_tenant
+from propelauth_flask.migration import migrate_users
+
+
+def main(argv=None) -> int:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if not args.auth_url or not args.api_key:
+        parser.error("the auth URL and API key are required, as flags or environment variables")
+
+    auth = init_auth(args.auth_url, args.api_key)
+    return args.run(auth, args)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="python -m propelauth_flask")
+    parser.add_argument("--auth-url", default=os.environ.get("PROPELAUTH_AUTH_URL"))
+    parser.add_argument("--api-key", default=os.environ.get("PROPELAUTH_API_KEY"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser(
+        "migrate-users", help="Migrate users (or their password hashes) from a JSONL or CSV file"
+    )
+    migrate.add_argument("path", help="A .jsonl or .csv file, optionally gzipped")
+    _add_pipeline_arguments(migrate)
+    migrate.set_defaults(run=_migrate_users)
+
+    api_keys = commands.add_parser(
+        "api-keys", help="Import, create, update, delete or rotate the API keys described in a JSONL or CSV file"
+    )
+    api_keys.add_argument("path", help="A .jsonl or .csv file, optionally gzipped")
+    api_keys.add_argument("--mapping", help="A JSONL file to append the old key to new key mapping to")
+    _add_pipeline_arguments(api_keys)
+    api_keys.set_defaults(run=_apply_api_key_specs)
+
+    export = commands.add_parser("export", help="Export every user, org and membership to JSONL or CSV files")
+    export.add_argument("directory", help="Where to write the users, orgs and memberships files")
+    export.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    export.add_argument("--gzip", action="store_true", help="Gzip the files")
+    export.add_argument("--concurrency", type=int, default=4)
+    export.add_argument("--page-size", type=int, default=100)
+    export.add_argument(
+        "--state",
+        help="Where to keep fingerprints of what was exported, so the next export also writes a diff of the "
+        "memberships that changed (it still scans everything)",
+    )
+    export.set_defaults(run=_export_tenant)
+    return parser
+
+
+def _add_pipeline_arguments(parser):
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--checkpoint", help="Where to save progress, so the run can be resumed by running it again")
+    parser.add_argument("--errors", help="A JSONL file to append the records that failed to")
+    parser.add_argument("--max-attempts", type=int, default=3)
+
+
+def _migrate_users(auth, args):
+    result = migrate_users(
+        auth,
+        args.path,
+        concurrency=args.concurrency,
+        checkpoint_path=args.checkpoint,
+        error_report_path=args.errors,
+        max_attempts=args.max_attempts,
+        on_progress=_ProgressPrinter(),
+    )
+    return _report(result)
+
+
+def _apply_api_key_specs(auth, args):
+    result = apply_api_key_specs(
+        auth,
+        args.path,
+        mapping_path=args.mapping,
+        concurrency=args.concurrency,
+        checkpoint_path=args.checkpoint,
+        error_report_path=args.errors,
+        max_attempts=args.max_attempts,
+        on_progress=_ProgressPrinter(),
+    )
+    return _report(result)
+
+
+def _export_tenant(auth, args):
+    result = export_tenant(
+        auth,
+        args.directory,
+        format=args.format,
+        compress=args.gzip,
+        concurrency=args.concurrency,
+        page_size=args.page_size,
+        state_path=args.state,
+    )
+    print(
+        "{} users, {} orgs, {} memberships ({} changed, {} orgs unchanged, {} removed)".format(
+            result.users,
+            result.orgs,
+            result.memberships,
+            result.changed_memberships,
+            result.unchanged_orgs,
+            len(result.removed_org_ids),
+        )
+    )
+    return 0
+
+
+class _ProgressPrinter:
+    def __init__(self, every_seconds=5.0):
+        self.every_seconds = every_seconds
+        self._printed_at = time.monotonic()
+
+    def __call__(self, result):
+        now = time.monotonic()
+        if now - self._printed_at >= self.every_seconds:
+            self._printed_at = now
+            print("{} done, {} failed".format(result.processed, result.failed), file=sys.stderr)
+
+
+def _report(result):
+    summary = "{} succeeded, {} failed, {} skipped (already done)".format(
+        result.succeeded, result.failed, result.skipped
+    )
+    if result.duplicates:
+        summary += ", {} duplicates".format(result.duplicates)
+    print(summary)
+    return 1 if result.failed else 0
@@ -0,0 +1,153 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from propelauth_flask.backend_client import _Interceptor
+
+_deadline = contextvars.ContextVar("propelauth_deadline", default=None)
+# The tokens to reset _deadline with, innermost last, kept per context so one deadline object can be entered by
+# several threads or tasks at once
+_deadline_tokens = contextvars.ContextVar("propelauth_deadline_tokens", default=())
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised by a backend call that couldn't finish within the deadline it was made under."""
+
+    def __init__(self, method_name):
+        super().__init__("Deadline exceeded calling {}".format(method_name))
+        self.method_name = method_name
+
+
+class deadline:
+    """Gives every backend call made inside it, together, at most seconds to finish.
+
+    Use it around calls (with deadline(0.2): ...) or on a view, sync or async, to give the whole request one
+    budget. Nested deadlines can only shorten the one they are in.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def __enter__(self):
+        expires_at = time.monotonic() + self.seconds
+        outer = _deadline.get()
+        if outer is not None and outer < expires_at:
+            expires_at = outer
+        _deadline_tokens.set(_deadline_tokens.get() + (_deadline.set(expires_at),))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        tokens = _deadline_tokens.get()
+        _deadline_tokens.set(tokens[:-1])
+        _deadline.reset(tokens[-1])
+        return False
+
+    def __call__(self, f):
+        if inspect.iscoroutinefunction(f):
+
+            @functools.wraps(f)
+            async def async_wrapper(*args, **kwargs):
+                with deadline(self.seconds):
+                    return await f(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with deadline(self.seconds):
+                return f(*args, **kwargs)
+
+        return wrapper
+
+
+def remaining_seconds() -> Optional[float]:
+    """Seconds left until the current deadline, or None if there isn't one."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+class _Deadlines(_Interceptor):
+    """Enforces the current deadline on backend calls, as the outermost interceptor.
+
+    Async calls also pass what's left of it to httpx as the request timeout (see _apply_deadline_timeout). The
+    requests calls propelauth_py makes for FlaskAuth can't be given a timeout, so those run on a worker thread that
+    is waited on for at most what's left, and are abandoned (not cancelled) once it runs out. An abandoned call keeps
+    its worker until it finishes, so while all max_workers are busy, calls fail right away rather than queue behind
+    them.
+    """
+
+    def __init__(self, max_workers: int = 32):
+        self.max_workers = max_workers
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+
+    def intercept(self, call, proceed):
+        remaining = remaining_seconds()
+        if remaining is None:
+            return proceed()
+        if remaining <= 0:
+            raise DeadlineExceeded(call.method_name)
+
+        if not self._slots.acquire(blocking=False):
+            raise DeadlineExceeded(call.method_name)
+        context = contextvars.copy_context()
+
+        def run():
+            try:
+                return context.run(proceed)
+            finally:
+                self._slots.release()
+
+        future = self._get_executor().submit(run)
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            raise DeadlineExceeded(call.method_name) from None
+
+    async def intercept_async(self, call, proceed):
+        remaining = remaining_seconds()
+        if remaining is None:
+            return await proceed()
+        if remaining <= 0:
+            raise DeadlineExceeded(call.method_name)
+
+        try:
+            return await asyncio.wait_for(proceed(), remaining)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(call.method_name) from None
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="propelauth-deadline"
+                    )
+        return self._executor
+
+
+def _watch_deadlines(httpx_client):
+    hooks = httpx_client.event_hooks
+    if _apply_deadline_timeout not in hooks["request"]:
+        hooks["request"] = [*hooks["request"], _apply_deadline_timeout]
+        httpx_client.event_hooks = hooks
+
+
+async def _apply_deadline_timeout(request):
+    remaining = remaining_seconds()
+    if remaining is None:
+        return
+    timeout = max(remaining, 0.001)
+    current = request.extensions.get("timeout", {})
+    request.extensions["timeout"] = {
+        key: timeout if current.get(key) is None else min(current[key], timeout)
+        for key in ("connect", "read", "write", "pool")
+    }
@@ -0,0 +1,282 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from propelauth_py.logging_config import get_logger
+
+from propelauth_flask.circuit_breaker import _CALLER_ERRORS
+from propelauth_flask.replica import _Transaction
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mutations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    method TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+DROP INDEX IF EXISTS mutations_by_entity;
+CREATE INDEX IF NOT EXISTS mutations_pending_by_entity ON mutations (entity, failed, id);
+CREATE INDEX IF NOT EXISTS mutations_pending ON mutations (failed, id);
+CREATE INDEX IF NOT EXISTS mutations_due ON mutations (failed, next_attempt_at);
+"""
+
+# Fields of update_user_metadata that replace what was there, so of two updates the later one wins. The dict
+# fields (metadata, properties) aren't, so updates that both set one of them are never merged.
+_REPLACED_FIELDS = frozenset(
+    {"username", "first_name", "last_name", "picture_url", "update_password_required", "legacy_user_id"}
+)
+
+
+class DispatchQueue:
+    """Makes fire-and-forget mutations on backend (usually your FlaskAuth) in the background.
+
+    resend_email_confirmation, invite_user_to_org, update_user_metadata and logout_all_user_sessions take the same
+    arguments as FlaskAuth's, but only write the call to a SQLite queue at path and return right away. Once started,
+    up to concurrency calls are made at a time on worker threads. Calls about the same user (or the same invite) are
+    made one at a time and in order, and one that's queued behind another is merged into it where that gives the
+    same result: repeated calls with the same arguments are made once, and update_user_metadata calls for the same
+    user become one call.
+
+    A call that fails because of the backend is retried up to max_attempts times, base_delay * 2 ** attempt apart.
+    One that fails because of its arguments (e.g. a ValueError or BadRequestException) isn't. Calls that gave up are
+    kept, see failed(). Calls still queued when the process stops are made once a queue is started on the same path.
+
+    Several processes (e.g. the workers of one server) can share a path. Each call is claimed by one queue at a time,
+    and the per-user ordering holds across all of them. A claim lasts lease_seconds, after which a call whose queue
+    stopped without finishing it is made again by another, so keep lease_seconds well above how long a call takes.
+    """
+
+    def __init__(
+        self,
+        backend,
+        path: str = ":memory:",
+        concurrency: int = 4,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+        lease_seconds: float = 300.0,
+    ):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease_seconds = lease_seconds
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.executescript(_SCHEMA)
+        # Identifies this queue's claims, as other processes can use the same file
+        self._owner = "{}-{}".format(os.getpid(), uuid.uuid4().hex)
+        self._lock = threading.RLock()
+        self._wake_up = threading.Condition(self._lock)
+        self._in_flight_entities = set()
+        self._executor = None
+        self._thread = None
+        self._stopping = False
+
+    def resend_email_confirmation(self, user_id: str) -> int:
+        return self._enqueue("resend_email_confirmation", "user:" + user_id, {"user_id": user_id})
+
+    def invite_user_to_org(self, email: str, org_id: str, role: str, additional_roles: List[str] = []) -> int:
+        return self._enqueue(
+            "invite_user_to_org",
+            "invite:{}:{}".format(org_id, email),
+            {"email": email, "org_id": org_id, "role": role, "additional_roles": list(additional_roles)},
+        )
+
+    def logout_all_user_sessions(self, user_id: str) -> int:
+        return self._enqueue("logout_all_user_sessions", "user:" + user_id, {"user_id": user_id})
+
+    def update_user_metadata(
+        self,
+        user_id: str,
+        username: Optional[str] = None,
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        properties: Optional[Dict[str, Any]] = None,
+        picture_url: Optional[str] = None,
+        update_password_required: Optional[bool] = None,
+        legacy_user_id: Optional[str] = None,
+    ) -> int:
+        kwargs = {
+            "user_id": user_id,
+            "username": username,
+            "first_name": first_name,
+            "last_name": last_name,
+            "metadata": metadata,
+            "properties": properties,
+            "picture_url": picture_url,
+            "update_password_required": update_password_required,
+            "legacy_user_id": legacy_user_id,
+        }
+        return self._enqueue(
+            "update_user_metadata", "user:" + user_id, {k: v for k, v in kwargs.items() if v is not None}
+        )
+
+    def start(self) -> "DispatchQueue":
+        """Starts making queued calls on a daemon thread, until stop()."""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._stopping = False
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="propelauth-dispatch"
+            )
+            self._thread = threading.Thread(target=self._dispatch, name="propelauth-dispatch-queue", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops taking calls off the queue, and waits for the ones being made to finish."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._wake_up.notify_all()
+            thread, executor = self._thread, self._executor
+            self._thread = self._executor = None
+        thread.join()
+        executor.shutdown(wait=True)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every queued call was made (or gave up). Returns False if that took longer than timeout."""
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while len(self) > 0:
+                remaining = None if give_up_at is None else give_up_at - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._wake_up.wait(0.05 if remaining is None else min(remaining, 0.05))
+        return True
+
+    def failed(self) -> List[Dict[str, Any]]:
+        """Calls that gave up, oldest first."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, method, kwargs, attempts, last_error FROM mutations WHERE failed = 1 ORDER BY id"
+            ).fetchall()
+        return [
+            {"id": id, "method": method, "kwargs": json.loads(kwargs), "attempts": attempts, "error": last_error}
+            for id, method, kwargs, attempts, last_error in rows
+        ]
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM mutations WHERE failed = 0").fetchone()[0]
+
+    def close(self):
+        self.stop()
+        self._connection.close()
+
+    def _enqueue(self, method, entity, kwargs):
+        with _Transaction(self._lock, self._connection, "BEGIN IMMEDIATE") as cursor:
+            # Only the last call queued for an entity can be merged into, so calls stay in order
+            last = cursor.execute(
+                "SELECT id, method, kwargs, claimed_until FROM mutations WHERE entity = ? AND failed = 0 "
+                "ORDER BY id DESC LIMIT 1",
+                (entity,),
+            ).fetchone()
+            if last is not None and last[1] == method and last[3] <= time.time():
+                merged = _merge(method, json.loads(last[2]), kwargs)
+                if merged is not None:
+                    cursor.execute("UPDATE mutations SET kwargs = ? WHERE id = ?", (json.dumps(merged), last[0]))
+                    return last[0]
+
+            cursor.execute(
+                "INSERT INTO mutations (method, entity, kwargs, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (method, entity, json.dumps(kwargs), time.time()),
+            )
+            job_id = cursor.lastrowid
+        with self._lock:
+            self._wake_up.notify_all()
+        return job_id
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                with _Transaction(self._lock, self._connection, "BEGIN IMMEDIATE") as cursor:
+                    jobs, next_attempt_at = self._claim(cursor)
+                for job in jobs:
+                    self._executor.submit(self._run, *job)
+                wait = 1.0 if next_attempt_at is None else min(1.0, max(0.0, next_attempt_at - time.time()))
+                self._wake_up.wait(wait)
+
+    def _claim(self, cursor):
+        """Claims calls that are due and whose entity is free, in a transaction that holds SQLite's write lock so no
+        other process claims them too. Callers hold the lock."""
+        free_slots = self.concurrency - len(self._in_flight_entities)
+        if free_slots <= 0:
+            return [], None
+
+        now = time.time()
+        # Only the first call still queued for an entity can be made, so later ones wait for it even if it isn't
+        # due yet or is being made elsewhere. Calls that aren't due are never read, thanks to mutations_due.
+        jobs = [
+            (id, method, entity, json.loads(kwargs), attempts)
+            for id, method, entity, kwargs, attempts in cursor.execute(
+                "SELECT id, method, entity, kwargs, attempts FROM mutations AS m "
+                "WHERE failed = 0 AND next_attempt_at <= ? AND claimed_until <= ? AND NOT EXISTS ("
+                "SELECT 1 FROM mutations WHERE entity = m.entity AND id < m.id AND failed = 0) "
+                "ORDER BY next_attempt_at, id LIMIT ?",
+                (now, now, free_slots),
+            ).fetchall()
+        ]
+        (next_attempt_at,) = cursor.execute(
+            "SELECT MIN(next_attempt_at) FROM mutations WHERE failed = 0 AND next_attempt_at > ?", (now,)
+        ).fetchone()
+
+        for id, _, entity, _, _ in jobs:
+            self._in_flight_entities.add(entity)
+            cursor.execute(
+                "UPDATE mutations SET claimed_by = ?, claimed_until = ? WHERE id = ?",
+                (self._owner, now + self.lease_seconds, id),
+            )
+        return jobs, next_attempt_at
+
+    def _run(self, id, method, entity, kwargs, attempts):
+        try:
+            getattr(self.backend, method)(**kwargs)
+        except Exception as e:
+            attempts += 1
+            give_up = isinstance(e, _CALLER_ERRORS) or attempts >= self.max_attempts
+            if give_up:
+                get_logger().exception("Giving up on %s after %d attempt(s)", method, attempts)
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            with self._lock:
+                # Only if the claim is still ours, i.e. it didn't run out and get taken by another queue
+                self._connection.execute(
+                    "UPDATE mutations SET claimed_by = NULL, claimed_until = 0, attempts = ?, failed = ?, "
+                    "next_attempt_at = ?, last_error = ? WHERE id = ? AND claimed_by = ?",
+                    (attempts, int(give_up), time.time() + delay, repr(e), id, self._owner),
+                )
+        else:
+            with self._lock:
+                self._connection.execute("DELETE FROM mutations WHERE id = ? AND claimed_by = ?", (id, self._owner))
+        finally:
+            with self._lock:
+                self._in_flight_entities.discard(entity)
+                self._wake_up.notify_all()
+
+
+def _merge(method, queued, new):
+    """The arguments of one call that does what queued and then new would, or None if there isn't one."""
+    if method != "update_user_metadata":
+        return queued if queued == new else None
+
+    for field in new.keys() & queued.keys():
+        if field not in _REPLACED_FIELDS and field != "user_id" and queued[field] != new[field]:
+            return None
+    return {**queued, **new}
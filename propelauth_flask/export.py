@@ -0,0 +1,270 @@
+import csv
+import dataclasses
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from typing import Dict, Optional
+
+from propelauth_py.api import OrgQueryOrderBy, UserQueryOrderBy
+from propelauth_py.types.user import Org, UserMetadata
+
+_USER_FIELDS = tuple(field.name for field in dataclasses.fields(UserMetadata) if field.name != "org_id_to_org_info")
+_ORG_FIELDS = tuple(field.name for field in dataclasses.fields(Org))
+_MEMBERSHIP_FIELDS = ("org_id", "user_id", "email", "role", "additional_roles")
+
+
+class ExportResult:
+    def __init__(self):
+        self.users = 0
+        self.orgs = 0
+        self.memberships = 0
+        self.changed_memberships = 0
+        self.unchanged_orgs = 0
+        self.removed_org_ids = []
+
+    def __repr__(self):
+        return "ExportResult(users={}, orgs={}, memberships={}, unchanged_orgs={})".format(
+            self.users, self.orgs, self.memberships, self.unchanged_orgs
+        )
+
+
+def export_tenant(
+    auth,
+    directory: str,
+    format: str = "jsonl",
+    compress: bool = False,
+    concurrency: int = 4,
+    page_size: int = 100,
+    state_path: Optional[str] = None,
+) -> ExportResult:
+    """Writes every user, org and membership to users, orgs and memberships files in directory, with auth (usually
+    your FlaskAuth).
+
+    Files are JSONL or CSV (format), gzipped with compress, and are written a row at a time while up to concurrency
+    pages are fetched ahead, so memory use doesn't grow with the size of the tenant. Memberships come from the users
+    scan, so no org is fetched twice. Each file is written under a temporary name and renamed once it's complete. A
+    manifest.json describes what was written.
+
+    With state_path, the export also produces a diff: it remembers a fingerprint of every org and its members, and
+    writes the memberships of just the orgs whose fingerprint changed to a membership_changes file. The manifest
+    lists those orgs (membership_org_ids) and the ones that no longer exist (removed_org_ids), so a copy of the
+    memberships can be brought up to date from the changes alone. It makes the same backend calls as a full export,
+    since a full scan of users and orgs is the only way to tell what changed, and the memberships file is still
+    complete.
+    """
+    if format not in ("jsonl", "csv"):
+        raise ValueError("format must be jsonl or csv")
+    os.makedirs(directory, exist_ok=True)
+    previous_fingerprints = _load_state(state_path)
+    result = ExportResult()
+    started_at = int(time.time())
+
+    # The changed orgs are only known once every membership has been seen, so with state_path the rows are also
+    # kept aside to pick theirs out afterwards
+    spool = _Spool(os.path.join(directory, "membership_changes.spool.tmp") if state_path is not None else None)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="propelauth-export") as executor, spool:
+        membership_digests = {}
+        with _RowWriter(directory, "users", format, compress, _USER_FIELDS) as users, _RowWriter(
+            directory, "memberships", format, compress, _MEMBERSHIP_FIELDS
+        ) as memberships:
+            pages = _prefetched_pages(
+                executor,
+                lambda page_number: auth.fetch_users_by_query(
+                    page_size=page_size,
+                    page_number=page_number,
+                    order_by=UserQueryOrderBy.CREATED_AT_ASC,
+                    include_orgs=True,
+                ),
+                "total_users",
+                page_size,
+                concurrency,
+            )
+            for page in pages:
+                for user in page.users:
+                    for org_id, org_member_info in (user.org_id_to_org_info or {}).items():
+                        _add_membership(membership_digests, org_id, user.user_id, org_member_info)
+                        row = _membership_row(org_id, user, org_member_info)
+                        memberships.write(row)
+                        spool.write(row)
+                        result.memberships += 1
+                    users.write(_user_row(user))
+                    result.users += 1
+
+        fingerprints = {}
+        with _RowWriter(directory, "orgs", format, compress, _ORG_FIELDS) as orgs:
+            pages = _prefetched_pages(
+                executor,
+                lambda page_number: auth.fetch_org_by_query(
+                    page_size=page_size, page_number=page_number, order_by=OrgQueryOrderBy.CREATED_AT_ASC
+                ),
+                "total_orgs",
+                page_size,
+                concurrency,
+            )
+            for page in pages:
+                for org in page.orgs:
+                    row = dataclasses.asdict(org)
+                    fingerprints[org.org_id] = _fingerprint(row, membership_digests.get(org.org_id))
+                    orgs.write(row)
+                    result.orgs += 1
+
+        changed_org_ids = [
+            org_id for org_id, fingerprint in fingerprints.items() if previous_fingerprints.get(org_id) != fingerprint
+        ]
+        result.unchanged_orgs = len(fingerprints) - len(changed_org_ids)
+        result.removed_org_ids = sorted(set(previous_fingerprints) - set(fingerprints))
+        if state_path is not None:
+            with _RowWriter(directory, "membership_changes", format, compress, _MEMBERSHIP_FIELDS) as changes:
+                changed = set(changed_org_ids)
+                for row in spool.rows():
+                    if row["org_id"] in changed:
+                        changes.write(row)
+                        result.changed_memberships += 1
+
+    _write_json(
+        os.path.join(directory, "manifest.json"),
+        {
+            "started_at": started_at,
+            "finished_at": int(time.time()),
+            "format": format,
+            "compressed": compress,
+            "incremental": state_path is not None,
+            "users": result.users,
+            "orgs": result.orgs,
+            "memberships": result.memberships,
+            "changed_memberships": result.changed_memberships,
+            "membership_org_ids": changed_org_ids,
+            "removed_org_ids": result.removed_org_ids,
+        },
+    )
+    if state_path is not None:
+        _write_json(state_path, {"fingerprints": fingerprints})
+    return result
+
+
+def _prefetched_pages(executor, fetch_page, total_field, page_size, window):
+    """Yields every page in order, fetching up to window pages ahead of the one being used."""
+    first = fetch_page(0)
+    yield first
+    page_count = -(-getattr(first, total_field) // page_size)
+    next_page_number = 1
+    in_flight = []
+    while in_flight or next_page_number < page_count:
+        while next_page_number < page_count and len(in_flight) < window:
+            in_flight.append(executor.submit(fetch_page, next_page_number))
+            next_page_number += 1
+        yield in_flight.pop(0).result()
+
+
+def _user_row(user):
+    return {field: getattr(user, field) for field in _USER_FIELDS}
+
+
+def _membership_row(org_id, user, org_member_info):
+    return {
+        "org_id": org_id,
+        "user_id": user.user_id,
+        "email": user.email,
+        "role": org_member_info.user_assigned_role,
+        "additional_roles": list(org_member_info.assigned_additional_roles),
+    }
+
+
+def _add_membership(membership_digests, org_id, user_id, org_member_info):
+    # Summed, so the digest doesn't depend on the order members were seen in
+    digest = blake2b(
+        json.dumps([user_id, org_member_info.user_assigned_role, org_member_info.assigned_additional_roles]).encode(),
+        digest_size=8,
+    ).digest()
+    count, total = membership_digests.get(org_id, (0, 0))
+    membership_digests[org_id] = (count + 1, (total + int.from_bytes(digest, "big")) % 2 ** 64)
+
+
+def _fingerprint(org_row, membership_digest):
+    members = membership_digest or (0, 0)
+    return blake2b(
+        json.dumps([org_row, members], sort_keys=True, default=str).encode(), digest_size=16
+    ).hexdigest()
+
+
+def _load_state(state_path) -> Dict[str, str]:
+    if state_path is None or not os.path.exists(state_path):
+        return {}
+    with open(state_path) as f:
+        return json.load(f)["fingerprints"]
+
+
+def _write_json(path, value):
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(value, f)
+    os.replace(temporary_path, path)
+
+
+class _Spool:
+    """Rows kept in an uncompressed JSONL file to be read back once, or not at all if path is None. The file is
+    removed on exit."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w+", encoding="utf-8") if path is not None else None
+
+    def write(self, row):
+        if self._file is not None:
+            self._file.write(json.dumps(row, default=str) + "\n")
+
+    def rows(self):
+        if self._file is None:
+            return
+        self._file.seek(0)
+        for line in self._file:
+            yield json.loads(line)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._file is not None:
+            self._file.close()
+            os.remove(self.path)
+        return False
+
+
+class _RowWriter:
+    def __init__(self, directory, name, format, compress, fields):
+        self.path = os.path.join(directory, name + "." + format + (".gz" if compress else ""))
+        self.format = format
+        self.fields = fields
+        self._temporary_path = self.path + ".tmp"
+        opener = gzip.open if compress else open
+        self._file = opener(self._temporary_path, "wt", encoding="utf-8", newline="")
+        self._csv = None
+        if format == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=fields)
+            self._csv.writeheader()
+        self._lock = threading.Lock()
+
+    def write(self, row):
+        if self._csv is None:
+            line = json.dumps(row, default=str) + "\n"
+            with self._lock:
+                self._file.write(line)
+            return
+        row = {k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in row.items()}
+        with self._lock:
+            self._csv.writerow(row)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._file.close()
+        if exc_type is None:
+            os.replace(self._temporary_path, self.path)
+        else:
+            os.remove(self._temporary_path)
+        return False
@@ -0,0 +1,176 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from propelauth_flask.backend_client import READ_METHODS, _Interceptor
+
+
+class ReadHedging(_Interceptor):
+    """Sends a second, identical read when the first one is slower than usual, and uses whichever answers first.
+
+    "Slower than usual" is the percentile (p95 by default) of the last window latencies of that method, clamped to
+    [min_delay, max_delay]. Nothing is hedged until a method has min_samples latencies. Only read methods are ever
+    hedged, all of them unless methods narrows that down.
+
+    The counters say whether it pays off: calls is how many calls could be hedged, hedged how many were, and
+    hedge_wins how many of those the second request answered first.
+
+    Pass it to init_auth / init_auth_async as hedging. A sync call's first request runs on the calling thread,
+    which can't be taken back from it, so its hedge (sent from executor, and only while one of its max_workers is
+    free) can only stand in for a first request that fails. Async calls use whichever request answers first.
+    """
+
+    def __init__(
+        self,
+        methods: Optional[Iterable[str]] = None,
+        percentile: float = 0.95,
+        min_delay: float = 0.01,
+        max_delay: float = 1.0,
+        min_samples: int = 20,
+        window: int = 200,
+        executor: Optional[Executor] = None,
+        max_workers: int = 32,
+    ):
+        self.methods = READ_METHODS if methods is None else frozenset(methods) & READ_METHODS
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._executor = executor
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, method_name: str) -> Optional[float]:
+        """Seconds to wait for a call to method_name before hedging it, or None while there's too little to go on."""
+        with self._lock:
+            latencies = self._latencies.get(method_name)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            ordered = sorted(latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile))
+        return min(self.max_delay, max(self.min_delay, ordered[index]))
+
+    def intercept(self, call, proceed):
+        if call.method_name not in self.methods:
+            return proceed()
+
+        delay = self.hedge_delay(call.method_name)
+        self._increment("calls")
+        if delay is None:
+            return self._timed(call.method_name, proceed)
+
+        primary_done = threading.Event()
+        hedge = None
+        # Hedges never queue, as a hedge that waits for a worker is no faster than the first request
+        if self._slots.acquire(blocking=False):
+            hedge = self._get_executor().submit(
+                self._hedge_after, delay, primary_done, contextvars.copy_context(), call.method_name, proceed
+            )
+        try:
+            return self._timed(call.method_name, proceed)
+        except Exception:
+            primary_done.set()
+            if hedge is None:
+                raise
+            try:
+                result = hedge.result()
+            except Exception:
+                result = _NOT_SENT
+            if result is _NOT_SENT:
+                raise
+            self._increment("hedge_wins")
+            return result
+        finally:
+            primary_done.set()
+
+    async def intercept_async(self, call, proceed):
+        if call.method_name not in self.methods:
+            return await proceed()
+
+        delay = self.hedge_delay(call.method_name)
+        self._increment("calls")
+        if delay is None:
+            return await self._timed_async(call.method_name, proceed)
+
+        primary = asyncio.ensure_future(self._timed_async(call.method_name, proceed))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            self._increment("hedged")
+            hedge = asyncio.ensure_future(self._timed_async(call.method_name, proceed))
+            pending.add(hedge)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = _first_success(done)
+                if winner is not None or not pending:
+                    break
+        finally:
+            for future in pending:
+                future.cancel()
+        if winner is hedge:
+            self._increment("hedge_wins")
+        return (winner or done.pop()).result()
+
+    def _hedge_after(self, delay, primary_done, context, method_name, proceed):
+        try:
+            if primary_done.wait(delay):
+                return _NOT_SENT
+            self._increment("hedged")
+            return context.run(self._timed, method_name, proceed)
+        finally:
+            self._slots.release()
+
+    def _timed(self, method_name, proceed):
+        started_at = time.monotonic()
+        result = proceed()
+        self._observe(method_name, time.monotonic() - started_at)
+        return result
+
+    async def _timed_async(self, method_name, proceed):
+        started_at = time.monotonic()
+        result = await proceed()
+        self._observe(method_name, time.monotonic() - started_at)
+        return result
+
+    def _observe(self, method_name, latency):
+        with self._lock:
+            latencies = self._latencies.get(method_name)
+            if latencies is None:
+                latencies = self._latencies[method_name] = deque(maxlen=self.window)
+            latencies.append(latency)
+
+    def _increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="propelauth-hedging"
+                    )
+        return self._executor
+
+
+_NOT_SENT = object()
+
+
+def _first_success(futures):
+    for future in futures:
+        if not future.cancelled() and future.exception() is None:
+            return future
+    return None
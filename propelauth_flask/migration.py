@@ -0,0 +1,67 @@
+import json
+from typing import Any, Callable, Dict, Optional
+
+from propelauth_flask._pipeline import PipelineResult, parse_bool, read_records, run_pipeline
+
+_USER_FIELDS = (
+    "email",
+    "email_confirmed",
+    "existing_user_id",
+    "existing_password_hash",
+    "existing_mfa_base32_encoded_secret",
+    "ask_user_to_update_password_on_login",
+    "enabled",
+    "first_name",
+    "last_name",
+    "username",
+    "picture_url",
+    "properties",
+)
+_BOOLEAN_FIELDS = frozenset({"email_confirmed", "ask_user_to_update_password_on_login", "enabled"})
+
+
+def migrate_users(
+    auth,
+    path: str,
+    concurrency: int = 8,
+    checkpoint_path: Optional[str] = None,
+    error_report_path: Optional[str] = None,
+    max_attempts: int = 3,
+    on_progress: Optional[Callable[[PipelineResult], None]] = None,
+) -> PipelineResult:
+    """Migrates every user in a JSONL or CSV file (see read_records) with auth, usually your FlaskAuth.
+
+    A record with an email is passed to migrate_user_from_external_source, using the fields of the same names
+    (CSV files spell booleans true/false and give properties as JSON). A record with just a user_id and a
+    password_hash is passed to migrate_user_password instead, for users migrated earlier.
+
+    The file is streamed, up to concurrency calls are made at a time, and with checkpoint_path a run that was
+    interrupted skips the records it already did when it's started again. Records that fail are written to the JSONL
+    file at error_report_path, with the reason.
+    """
+    return run_pipeline(
+        read_records(path),
+        lambda record: migrate_record(auth, record),
+        concurrency=concurrency,
+        checkpoint_path=checkpoint_path,
+        error_report_path=error_report_path,
+        max_attempts=max_attempts,
+        on_progress=on_progress,
+    )
+
+
+def migrate_record(auth, record: Dict[str, Any]):
+    if "email" not in record:
+        if "user_id" not in record or "password_hash" not in record:
+            raise ValueError("A record needs either an email, or a user_id and a password_hash")
+        return auth.migrate_user_password(record["user_id"], record["password_hash"])
+
+    if "email_confirmed" not in record:
+        raise ValueError("email_confirmed is required")
+    kwargs = {field: record[field] for field in _USER_FIELDS if record.get(field) is not None}
+    for field in _BOOLEAN_FIELDS & kwargs.keys():
+        kwargs[field] = parse_bool(field, kwargs[field])
+    if isinstance(kwargs.get("properties"), str):
+        kwargs["properties"] = json.loads(kwargs["properties"])
+    return auth.migrate_user_from_external_source(**kwargs)
+
@@ -0,0 +1,281 @@
+"""Ready-made req_to_org_id functions for the require_org_member decorators.
+
+Each extractor remembers what it found on the request, so stacked decorators (or the view) can call it
+again for free. Values that can't be a PropelAuth org id are rejected with a 403 before the access token
+is verified.
+"""
+import io
+import json
+import re
+from typing import Optional
+
+from propelauth_py.errors import ForbiddenException
+
+_ORG_ID_PATTERN = re.compile(
+    r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
+)
+_MEMO_ENVIRON_KEY = "propelauth.org_ids"
+
+
+def org_id_from_view_args(name: str = "org_id", validate: bool = True):
+    """Reads the org id from a URL path parameter, e.g. /org/<org_id>"""
+
+    def req_to_org_id(req):
+        return (req.view_args or {}).get(name)
+
+    return _memoized(("view_args", name), req_to_org_id, validate)
+
+
+def org_id_from_header(name: str = "X-Org-Id", validate: bool = True):
+    """Reads the org id from a request header"""
+
+    def req_to_org_id(req):
+        return req.headers.get(name)
+
+    return _memoized(("header", name), req_to_org_id, validate)
+
+
+def org_id_from_query(name: str = "org_id", validate: bool = True):
+    """Reads the org id from a query string parameter"""
+
+    def req_to_org_id(req):
+        return req.args.get(name)
+
+    return _memoized(("query", name), req_to_org_id, validate)
+
+
+def org_id_from_json_field(
+    field: str = "org_id",
+    validate: bool = True,
+    max_bytes: int = 64 * 1024,
+    chunk_size: int = 4096,
+    strict: bool = False,
+):
+    """Reads the org id from a top-level string field of a JSON body.
+
+    The body is read a chunk at a time and scanned for the field without being parsed, stopping as soon as the
+    field has been read, so large bodies aren't parsed before the request is authorized. Whatever was read is put
+    back, so the view can still use request.get_json() as usual. If the field isn't within the first max_bytes, the
+    whole body is parsed instead.
+
+    get_json keeps the last of duplicate keys while this finds the first, so a view that takes the org id from the
+    body rather than from current_org should pass strict, which reads the whole object and returns None (so the
+    request is rejected) if the field appears more than once.
+    """
+
+    def req_to_org_id(req):
+        if not req.is_json:
+            return None
+        scanner = _JsonFieldScanner(req.stream, max_bytes, chunk_size)
+        try:
+            org_id = scanner.find(field, strict)
+            if scanner.hit_max_bytes:
+                # Too far into the body to scan for cheaply, but that's no reason to reject it
+                scanner.data += req.stream.read()
+                org_id = _parse_field(bytes(scanner.data), field, strict)
+            return org_id
+        finally:
+            req.stream = io.BufferedReader(_ReplayStream(bytes(scanner.data), req.stream))
+
+    return _memoized(("json", field, strict), req_to_org_id, validate)
+
+
+def _memoized(memo_key, req_to_org_id, validate):
+    def memoized_req_to_org_id(req):
+        memo = req.environ.setdefault(_MEMO_ENVIRON_KEY, {})
+        if memo_key in memo:
+            org_id = memo[memo_key]
+        else:
+            org_id = req_to_org_id(req)
+            memo[memo_key] = org_id
+
+        if validate and org_id is not None and not _is_valid_org_id(org_id):
+            raise ForbiddenException("Required org id is malformed")
+        return org_id
+
+    return memoized_req_to_org_id
+
+
+def _is_valid_org_id(org_id) -> bool:
+    return isinstance(org_id, str) and _ORG_ID_PATTERN.match(org_id) is not None
+
+
+class _ReplayStream(io.RawIOBase):
+    """Replays bytes that were already read from a stream before reading the rest of it."""
+
+    def __init__(self, prefix: bytes, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+_WHITESPACE = b" \t\r\n"
+_QUOTE = ord('"')
+_OPEN = b"{["
+_CLOSE = b"}]"
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_STRUCTURAL = re.compile(rb'["{}\[\]]')
+_SCALAR_END = re.compile(rb"[,}\]\s]")
+
+
+class _JsonFieldScanner:
+    """Finds a top-level string field in a JSON object, skipping over the other values without parsing them.
+
+    Returns the field's value as soon as it has been read, or with strict, only once the rest of the object has
+    been checked to not have the field again. Returns None if it can't, and sets hit_max_bytes if that's because
+    it would have had to read more than max_bytes.
+    """
+
+    def __init__(self, stream, max_bytes, chunk_size):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.data = bytearray()
+        self.pos = 0
+        self.hit_max_bytes = False
+
+    def find(self, field: str, strict: bool = False) -> Optional[str]:
+        if self._peek() != ord("{"):
+            return None
+        self.pos += 1
+
+        value = None
+        while True:
+            if self._peek() != _QUOTE:
+                return None
+            key = _decode_string(self._read_string())
+            if key is None or self._peek() != ord(":"):
+                return None
+            self.pos += 1
+
+            if key == field:
+                # json.loads keeps the last of duplicate keys, so a body that has the field twice could be
+                # authorized for one org and acted on for another
+                if value is not None or self._peek() != _QUOTE:
+                    return None
+                value = _decode_string(self._read_string())
+                if value is None or not strict:
+                    return value
+            elif not self._skip_value():
+                return None
+
+            separator = self._peek()
+            if separator == ord("}"):
+                return value
+            if separator != ord(","):
+                return None
+            self.pos += 1
+
+    def _fill(self) -> bool:
+        remaining = self.max_bytes - len(self.data)
+        if remaining <= 0:
+            self.hit_max_bytes = True
+            return False
+        chunk = self.stream.read(min(self.chunk_size, remaining))
+        if not chunk:
+            return False
+        self.data += chunk
+        return True
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.data) and self.data[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.data):
+                return self.data[self.pos]
+            if not self._fill():
+                return None
+
+    def _read_string(self) -> Optional[bytes]:
+        start = self.pos
+        search_from = self.pos + 1
+        while True:
+            match = _STRING_SPECIAL.search(self.data, search_from)
+            if match is None or (self.data[match.start()] != _QUOTE and match.start() + 1 >= len(self.data)):
+                # Ran out of data mid string (or right after a backslash)
+                search_from = len(self.data) if match is None else match.start()
+                if not self._fill():
+                    return None
+                continue
+            if self.data[match.start()] == _QUOTE:
+                self.pos = match.start() + 1
+                return bytes(self.data[start:self.pos])
+            search_from = match.start() + 2
+
+    def _skip_value(self) -> bool:
+        first = self._peek()
+        if first is None:
+            return False
+        if first == _QUOTE:
+            return self._read_string() is not None
+        if first not in _OPEN:
+            return self._skip_scalar()
+
+        depth = 0
+        while True:
+            match = _STRUCTURAL.search(self.data, self.pos)
+            if match is None:
+                self.pos = len(self.data)
+                if not self._fill():
+                    return False
+                continue
+            self.pos = match.start()
+            if self.data[self.pos] == _QUOTE:
+                if self._read_string() is None:
+                    return False
+                continue
+            depth += 1 if self.data[self.pos] in _OPEN else -1
+            self.pos += 1
+            if depth == 0:
+                return True
+
+    def _skip_scalar(self) -> bool:
+        while True:
+            match = _SCALAR_END.search(self.data, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return True
+            self.pos = len(self.data)
+            if not self._fill():
+                return True
+
+
+def _parse_field(body: bytes, field: str, strict: bool) -> Optional[str]:
+    top_level_pairs = []
+
+    def keep_pairs(pairs):
+        # Objects are finished inside out, so the top-level one is the last
+        top_level_pairs[:] = pairs
+        return dict(pairs)
+
+    try:
+        if not isinstance(json.loads(body, object_pairs_hook=keep_pairs), dict):
+            return None
+    except ValueError:
+        return None
+    values = [value for key, value in top_level_pairs if key == field]
+    if not values or (strict and len(values) > 1) or not isinstance(values[-1], str):
+        return None
+    return values[-1]
+
+
+def _decode_string(raw: Optional[bytes]) -> Optional[str]:
+    if raw is None:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        # e.g. an invalid escape, which get_json would reject too
+        return None
@@ -0,0 +1,108 @@
+import threading
+from typing import Iterable, List, Optional, Union
+
+from propelauth_py.user import MULTI_ROLE, OrgMemberInfo
+
+# Lists of names seen in tokens repeat a lot (everyone with the same role has the same permissions),
+# so masks for whole lists are memoized. This bounds that memo, not the number of names.
+_MAX_MEMOIZED_MASKS = 10000
+
+
+class _BitRegistry:
+    """Interns names as single bits, so sets of names become integer masks."""
+
+    def __init__(self):
+        self._name_to_bit = {}
+        self._names_to_mask = {}
+        self._lock = threading.Lock()
+
+    def mask(self, names: Iterable[str]) -> int:
+        key = tuple(names)
+        mask = self._names_to_mask.get(key)
+        if mask is None:
+            mask = 0
+            for name in key:
+                mask |= self.bit(name)
+            if len(self._names_to_mask) < _MAX_MEMOIZED_MASKS:
+                self._names_to_mask[key] = mask
+        return mask
+
+    def bit(self, name: str) -> int:
+        bit = self._name_to_bit.get(name)
+        if bit is None:
+            with self._lock:
+                bit = self._name_to_bit.get(name)
+                if bit is None:
+                    bit = 1 << len(self._name_to_bit)
+                    self._name_to_bit[name] = bit
+        return bit
+
+
+_permissions = _BitRegistry()
+_roles = _BitRegistry()
+
+
+class RequiredPermissions:
+    """A set of permissions compiled to a mask once, e.g. when a route is decorated."""
+
+    __slots__ = ("permissions", "mask")
+
+    def __init__(self, permissions: List[str]):
+        self.permissions = list(permissions)
+        self.mask = _permissions.mask(self.permissions)
+
+    def __repr__(self):
+        return "RequiredPermissions({!r})".format(self.permissions)
+
+
+class RequiredRole:
+    """A role compiled to a bit once, e.g. when a route is decorated."""
+
+    __slots__ = ("role", "bit")
+
+    def __init__(self, role: str):
+        self.role = role
+        self.bit = _roles.bit(role)
+
+    def __repr__(self):
+        return "RequiredRole({!r})".format(self.role)
+
+
+def compile_permissions(
+    permissions: Union[None, str, List[str], RequiredPermissions]
+) -> Optional[RequiredPermissions]:
+    """Compiles a permission, or list of permissions, that a user must have all of."""
+    if permissions is None or isinstance(permissions, RequiredPermissions):
+        return permissions
+    if isinstance(permissions, str):
+        return RequiredPermissions([permissions])
+    return RequiredPermissions(permissions)
+
+
+def compile_role(role: Union[None, str, RequiredRole]) -> Optional[RequiredRole]:
+    """Compiles a role that a user must be, or inherit from."""
+    if role is None or isinstance(role, RequiredRole):
+        return role
+    return RequiredRole(role)
+
+
+def org_permission_mask(org_member_info: OrgMemberInfo) -> int:
+    """Returns the mask of every permission the user has in the org."""
+    return _permissions.mask(org_member_info.user_permissions)
+
+
+def org_role_mask(org_member_info: OrgMemberInfo) -> int:
+    """Returns the mask of every role the user can act as in the org."""
+    if org_member_info.org_role_structure == MULTI_ROLE:
+        return _roles.bit(org_member_info.user_assigned_role) | _roles.mask(
+            org_member_info.assigned_additional_roles
+        )
+    return _roles.mask(org_member_info.user_inherited_roles_plus_current_role)
+
+
+def has_permissions(org_member_info: OrgMemberInfo, required: RequiredPermissions) -> bool:
+    return org_permission_mask(org_member_info) & required.mask == required.mask
+
+
+def is_at_least_role(org_member_info: OrgMemberInfo, required: RequiredRole) -> bool:
+    return org_role_mask(org_member_info) & required.bit != 0
@@ -0,0 +1,200 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from propelauth_py.errors import RateLimitedException
+
+from propelauth_flask.backend_client import _Interceptor
+from propelauth_flask.deadlines import remaining_seconds
+
+# Seconds the backend asked us to wait in its last 429 response, recorded by an httpx response hook. propelauth_py
+# only raises RateLimitedException(response.text), so this is the only way to see the header.
+_retry_after = contextvars.ContextVar("propelauth_retry_after", default=None)
+
+
+class RetryPolicy:
+    """How rate limited calls are retried: up to max_attempts attempts in total, waiting as long as the backend's
+    Retry-After header asks, or base_delay * 2 ** retry (with full jitter) when it doesn't say. Waits are capped at
+    max_delay, and a Retry-After longer than that is given up on instead of waited out."""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.25, max_delay: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, retry: int, retry_after: Optional[float]) -> Optional[float]:
+        """Seconds to wait before retry number retry (starting at 0), or None to stop retrying."""
+        if retry + 1 >= self.max_attempts:
+            return None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+class AdaptiveConcurrencyLimiter(_Interceptor):
+    """Limits how many backend calls are in flight at once, and finds that limit on its own (AIMD).
+
+    Every call that isn't rate limited raises the limit by 1 / limit, so it grows by about one per limit's worth of
+    calls. A 429 cuts it by decrease_ratio, once per round: calls that were sent before the last cut don't cut it
+    again. Calls over the limit wait their turn, in order. Rate limited calls are retried according to retry_policy,
+    giving up their slot while they wait.
+
+    Pass the same instance to init_auth and init_auth_async as concurrency_limiter to share one limit between them.
+    Retry-After is only known for FlaskAuthAsync calls, which go through httpx. FlaskAuth calls back off
+    exponentially instead.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        decrease_ratio: float = 0.5,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_ratio = decrease_ratio
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiters = deque()
+        self._last_decrease_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def intercept(self, call, proceed):
+        retry = 0
+        while True:
+            self._acquire().result()
+            started_at = time.monotonic()
+            _retry_after.set(None)
+            try:
+                result = proceed()
+            except RateLimitedException:
+                self._release(started_at, throttled=True)
+                delay = self._retry_delay(retry)
+                if delay is None:
+                    raise
+                retry += 1
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self._release(started_at, throttled=None)
+                raise
+            self._release(started_at, throttled=False)
+            return result
+
+    async def intercept_async(self, call, proceed):
+        retry = 0
+        while True:
+            waiter = self._acquire()
+            try:
+                await asyncio.wrap_future(waiter)
+            except asyncio.CancelledError:
+                if not waiter.cancel():
+                    # We were given the slot just as we were cancelled
+                    self._release(time.monotonic(), throttled=None)
+                raise
+
+            started_at = time.monotonic()
+            _retry_after.set(None)
+            try:
+                result = await proceed()
+            except RateLimitedException:
+                self._release(started_at, throttled=True)
+                delay = self._retry_delay(retry)
+                if delay is None:
+                    raise
+                retry += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._release(started_at, throttled=None)
+                raise
+            self._release(started_at, throttled=False)
+            return result
+
+    def _retry_delay(self, retry):
+        delay = self.retry_policy.delay(retry, _retry_after.get())
+        remaining = remaining_seconds()
+        if delay is not None and remaining is not None and delay >= remaining:
+            # Waiting would use up the deadline, so there would be no time left to retry
+            return None
+        return delay
+
+    def _acquire(self):
+        waiter = Future()
+        with self._lock:
+            if not self._waiters and self._in_flight < self.limit:
+                self._in_flight += 1
+                waiter.set_running_or_notify_cancel()
+                waiter.set_result(None)
+            else:
+                self._waiters.append(waiter)
+        return waiter
+
+    def _release(self, started_at, throttled):
+        """throttled is None for calls that failed for other reasons, which say nothing about the limit."""
+        granted = []
+        with self._lock:
+            if throttled:
+                if started_at >= self._last_decrease_at:
+                    self._limit = max(self.min_limit, self._limit * self.decrease_ratio)
+                    self._last_decrease_at = time.monotonic()
+            elif throttled is not None and self._in_flight * 2 >= self._limit:
+                # Only grow while the limit is actually in the way
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+            self._in_flight -= 1
+            while self._waiters and self._in_flight < self.limit:
+                waiter = self._waiters.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    self._in_flight += 1
+                    granted.append(waiter)
+
+        for waiter in granted:
+            waiter.set_result(None)
+
+
+def _watch_retry_after(httpx_client):
+    hooks = httpx_client.event_hooks
+    if _record_retry_after not in hooks["response"]:
+        hooks["response"] = [*hooks["response"], _record_retry_after]
+        httpx_client.event_hooks = hooks
+
+
+async def _record_retry_after(response):
+    if response.status_code == 429:
+        _retry_after.set(_parse_retry_after(response.headers.get("Retry-After")))
+
+
+def _parse_retry_after(value):
+    """Retry-After is either a number of seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,350 @@
+import dataclasses
+import json
+import sqlite3
+import threading
+from typing import Optional
+
+from propelauth_py.api import OrgQueryOrderBy, UserQueryOrderBy
+from propelauth_py.types.user import Organization, UserMetadata, UsersPagedResponse
+from propelauth_py.user import OrgMemberInfo
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    created_at INTEGER,
+    generation INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orgs (
+    org_id TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    is_full INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS memberships (
+    org_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    role TEXT,
+    created_at INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (org_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS memberships_by_org_and_role ON memberships (org_id, role, created_at, user_id);
+CREATE INDEX IF NOT EXISTS memberships_by_user ON memberships (user_id);
+CREATE TABLE IF NOT EXISTS replica_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    generation INTEGER NOT NULL
+);
+"""
+
+
+class LocalReplica:
+    """A local copy of your users and orgs that can answer some FlaskAuth reads without calling PropelAuth.
+
+    bulk_load() pages through fetch_users_by_query and fetch_org_by_query on backend (usually your
+    FlaskAuth) and stores the results in SQLite. After that, fetch_user_metadata_by_user_id,
+    fetch_users_in_org and fetch_org take the same arguments and return the same types as FlaskAuth's, but
+    are answered from indexed local tables. Until the first load finishes, they're passed to the backend.
+
+    Keep it fresh with a periodic re-scan (refresh() or start_periodic_refresh()), and/or by calling
+    upsert_user / upsert_org / remove_user / remove_org when you receive a webhook. Users and orgs that
+    aren't in the replica yet are fetched from the backend and stored, so new ones don't have to wait for
+    the next re-scan.
+
+    Orgs returned by fetch_org_by_query are missing some of the fields fetch_org returns, so each org is
+    fetched in full the first time it is read and only its query fields are updated by later re-scans.
+    """
+
+    def __init__(self, backend, path: str = ":memory:", page_size: int = 100):
+        self.backend = backend
+        self.page_size = page_size
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._loaded = False
+        with self._transaction() as cursor:
+            # Files written before replica_state existed start from the newest generation they hold
+            cursor.execute(
+                "INSERT OR IGNORE INTO replica_state (id, generation) SELECT 0, COALESCE(MAX(g), 0) FROM ("
+                "SELECT MAX(generation) AS g FROM users UNION ALL SELECT MAX(generation) FROM orgs)"
+            )
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+        self._stop_refreshing = threading.Event()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def bulk_load(self):
+        """Loads every user and org from the backend, dropping any that no longer exist."""
+        with self._refresh_lock:
+            with self._transaction() as cursor:
+                cursor.execute("UPDATE replica_state SET generation = generation + 1 WHERE id = 0")
+                generation = _generation(cursor)
+
+            users_pages = self._pages(
+                self.backend.fetch_users_by_query,
+                "users",
+                order_by=UserQueryOrderBy.CREATED_AT_ASC,
+                include_orgs=True,
+            )
+            for users in users_pages:
+                with self._transaction() as cursor:
+                    for user in users:
+                        self._store_user(cursor, user, generation)
+
+            orgs_pages = self._pages(
+                self.backend.fetch_org_by_query, "orgs", order_by=OrgQueryOrderBy.CREATED_AT_ASC
+            )
+            for orgs in orgs_pages:
+                with self._transaction() as cursor:
+                    for org in orgs:
+                        self._store_org_from_query(cursor, org, generation)
+
+            with self._transaction() as cursor:
+                cursor.execute(
+                    "DELETE FROM memberships WHERE user_id IN (SELECT user_id FROM users WHERE generation < ?)",
+                    (generation,),
+                )
+                cursor.execute("DELETE FROM users WHERE generation < ?", (generation,))
+                cursor.execute(
+                    "DELETE FROM memberships WHERE org_id IN (SELECT org_id FROM orgs WHERE generation < ?)",
+                    (generation,),
+                )
+                cursor.execute("DELETE FROM orgs WHERE generation < ?", (generation,))
+            self._loaded = True
+
+    refresh = bulk_load
+
+    def start_periodic_refresh(self, interval_seconds: float):
+        """Re-scans the backend every interval_seconds on a daemon thread, until stop_periodic_refresh()."""
+        if self._refresh_thread is not None:
+            return
+        self._stop_refreshing.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_periodically,
+            args=(interval_seconds,),
+            name="propelauth-replica-refresh",
+            daemon=True,
+        )
+        self._refresh_thread.start()
+
+    def stop_periodic_refresh(self):
+        if self._refresh_thread is None:
+            return
+        self._stop_refreshing.set()
+        self._refresh_thread.join()
+        self._refresh_thread = None
+
+    def upsert_user(self, user_id: str):
+        """Re-fetches a user (and their memberships) from the backend, removing them if they're gone."""
+        user = self.backend.fetch_user_metadata_by_user_id(user_id, include_orgs=True)
+        if user is None:
+            self.remove_user(user_id)
+            return None
+        with self._transaction() as cursor:
+            self._store_user(cursor, user, _generation(cursor))
+        return user
+
+    def remove_user(self, user_id: str):
+        with self._transaction() as cursor:
+            cursor.execute("DELETE FROM memberships WHERE user_id = ?", (user_id,))
+            cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+
+    # Webhook listener hooks, see propelauth_flask.webhooks
+    invalidate_user = upsert_user
+
+    def upsert_org(self, org_id: str):
+        """Re-fetches an org from the backend, removing it if it's gone."""
+        org = self.backend.fetch_org(org_id)
+        if org is None:
+            self.remove_org(org_id)
+            return None
+        with self._transaction() as cursor:
+            self._store_full_org(cursor, org, _generation(cursor))
+        return org
+
+    invalidate_org = upsert_org
+
+    def remove_org(self, org_id: str):
+        with self._transaction() as cursor:
+            cursor.execute("DELETE FROM memberships WHERE org_id = ?", (org_id,))
+            cursor.execute("DELETE FROM orgs WHERE org_id = ?", (org_id,))
+
+    def fetch_user_metadata_by_user_id(self, user_id: str, include_orgs: bool = False):
+        if not self._loaded:
+            return self.backend.fetch_user_metadata_by_user_id(user_id, include_orgs)
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            user = self.upsert_user(user_id)
+            if user is None:
+                return None
+            return user if include_orgs else dataclasses.replace(user, org_id_to_org_info=None)
+
+        org_id_to_org_info = self._fetch_memberships([user_id])[user_id] if include_orgs else None
+        return _to_user_metadata(row[0], org_id_to_org_info)
+
+    def fetch_users_in_org(
+        self,
+        org_id: str,
+        page_size: int = 10,
+        page_number: int = 0,
+        include_orgs: bool = False,
+        role: Optional[str] = None,
+    ):
+        if not self._loaded:
+            return self.backend.fetch_users_in_org(org_id, page_size, page_number, include_orgs, role)
+
+        role_filter = "" if role is None else " AND m.role = ?"
+        params = (org_id,) if role is None else (org_id, role)
+        with self._lock:
+            (total_users,) = self._connection.execute(
+                "SELECT COUNT(*) FROM memberships m WHERE m.org_id = ?" + role_filter, params
+            ).fetchone()
+            rows = self._connection.execute(
+                "SELECT u.user_id, u.data FROM memberships m JOIN users u ON u.user_id = m.user_id "
+                "WHERE m.org_id = ?" + role_filter + " ORDER BY m.created_at, m.user_id LIMIT ? OFFSET ?",
+                params + (page_size, page_size * page_number),
+            ).fetchall()
+
+        memberships = self._fetch_memberships([user_id for user_id, _ in rows]) if include_orgs else {}
+        return UsersPagedResponse(
+            users=[_to_user_metadata(data, memberships.get(user_id)) for user_id, data in rows],
+            total_users=total_users,
+            current_page=page_number,
+            page_size=page_size,
+            has_more_results=(page_number + 1) * page_size < total_users,
+        )
+
+    def fetch_org(self, org_id: str):
+        if not self._loaded:
+            return self.backend.fetch_org(org_id)
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM orgs WHERE org_id = ? AND is_full = 1", (org_id,)
+            ).fetchone()
+        if row is None:
+            return self.upsert_org(org_id)
+        return Organization(**json.loads(row[0]))
+
+    def close(self):
+        self.stop_periodic_refresh()
+        with self._lock:
+            self._connection.close()
+
+    def _refresh_periodically(self, interval_seconds):
+        while not self._stop_refreshing.wait(interval_seconds):
+            try:
+                self.bulk_load()
+            except Exception:
+                # Serve what we have and try again on the next tick
+                pass
+
+    def _pages(self, fetch_page, results_field, **kwargs):
+        page_number = 0
+        while True:
+            response = fetch_page(page_size=self.page_size, page_number=page_number, **kwargs)
+            yield getattr(response, results_field)
+            if not response.has_more_results:
+                return
+            page_number += 1
+
+    def _fetch_memberships(self, user_ids):
+        memberships = {user_id: {} for user_id in user_ids}
+        if not user_ids:
+            return memberships
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT user_id, org_id, data FROM memberships WHERE user_id IN ({})".format(
+                    ",".join("?" * len(user_ids))
+                ),
+                user_ids,
+            ).fetchall()
+        for user_id, org_id, data in rows:
+            memberships[user_id][org_id] = OrgMemberInfo(**json.loads(data))
+        return memberships
+
+    def _store_user(self, cursor, user, generation):
+        data = dataclasses.asdict(user)
+        data["org_id_to_org_info"] = None
+        cursor.execute(
+            "INSERT OR REPLACE INTO users (user_id, created_at, generation, data) VALUES (?, ?, ?, ?)",
+            (user.user_id, user.created_at, generation, json.dumps(data)),
+        )
+        cursor.execute("DELETE FROM memberships WHERE user_id = ?", (user.user_id,))
+        cursor.executemany(
+            "INSERT INTO memberships (org_id, user_id, role, created_at, data) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    org_id,
+                    user.user_id,
+                    org_member_info.user_assigned_role,
+                    user.created_at,
+                    json.dumps(dataclasses.asdict(org_member_info)),
+                )
+                for org_id, org_member_info in (user.org_id_to_org_info or {}).items()
+            ],
+        )
+
+    def _store_org_from_query(self, cursor, org, generation):
+        fields = dataclasses.asdict(org)
+        row = cursor.execute("SELECT data, is_full FROM orgs WHERE org_id = ?", (org.org_id,)).fetchone()
+        if row is not None and row[1]:
+            # Keep the fields only fetch_org returns, and update the ones the query returned
+            data = json.loads(row[0])
+            data.update(fields)
+            is_full = 1
+        else:
+            data = fields
+            is_full = 0
+        cursor.execute(
+            "INSERT OR REPLACE INTO orgs (org_id, generation, is_full, data) VALUES (?, ?, ?, ?)",
+            (org.org_id, generation, is_full, json.dumps(data)),
+        )
+
+    def _store_full_org(self, cursor, org, generation):
+        cursor.execute(
+            "INSERT OR REPLACE INTO orgs (org_id, generation, is_full, data) VALUES (?, ?, 1, ?)",
+            (org.org_id, generation, json.dumps(dataclasses.asdict(org))),
+        )
+
+    def _transaction(self):
+        # Immediate, so the generation a write reads can't change before it commits, even from another process
+        return _Transaction(self._lock, self._connection, "BEGIN IMMEDIATE")
+
+
+class _Transaction:
+    def __init__(self, lock, connection, begin="BEGIN"):
+        self.lock = lock
+        self.connection = connection
+        self.begin = begin
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.cursor = self.connection.cursor()
+        self.cursor.execute(self.begin)
+        return self.cursor
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            self.cursor.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+        finally:
+            self.cursor.close()
+            self.lock.release()
+
+
+def _generation(cursor):
+    (generation,) = cursor.execute("SELECT generation FROM replica_state WHERE id = 0").fetchone()
+    return generation
+
+
+def _to_user_metadata(data, org_id_to_org_info):
+    user = json.loads(data)
+    user["org_id_to_org_info"] = org_id_to_org_info
+    return UserMetadata(**user)
@@ -0,0 +1,60 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class RevocationList:
+    """Remembers users whose sessions were ended, so their older access tokens are rejected locally.
+
+    Each revoked user maps to the time of the revocation, and tokens issued (iat) before then fail
+    validation. iat is in whole seconds, so a token issued in the same second as the revocation can't be told
+    apart from an older one and is rejected, while one from any later second is accepted. Access tokens expire on their own, so an entry is dropped once retention_seconds have passed,
+    which should be at least your access token lifetime. Checking a token is a single dict lookup, and
+    nothing at all while no user is revoked.
+
+    The list lives in this process. FlaskAuth adds to it when you call logout_all_user_sessions,
+    disable_user or delete_user, and it's also a webhook listener (see propelauth_flask.webhooks), but a
+    webhook only reaches one of your processes, so pass the same events to every process (or use a short
+    access token lifetime) if that matters to you.
+    """
+
+    def __init__(self, retention_seconds: float = 24 * 60 * 60):
+        self.retention_seconds = retention_seconds
+        self._revoked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_prune_at = 0.0
+
+    def revoke_user(self, user_id: str, revoked_at: Optional[float] = None) -> None:
+        """Rejects every token issued to user_id before revoked_at (default: now)."""
+        revoked_at = time.time() if revoked_at is None else revoked_at
+        with self._lock:
+            self._prune(time.time())
+            self._revoked_at[user_id] = max(revoked_at, self._revoked_at.get(user_id, 0))
+
+    def is_revoked(self, user_id: str, issued_at) -> bool:
+        if not self._revoked_at:
+            return False
+        revoked_at = self._revoked_at.get(user_id)
+        if revoked_at is None:
+            return False
+        # Tokens without an iat can't be shown to be newer than the revocation
+        return issued_at is None or int(issued_at) <= int(revoked_at)
+
+    def __len__(self):
+        return len(self._revoked_at)
+
+    # Webhook listener hook, see propelauth_flask.webhooks
+    def revoke_user_sessions(self, user_id: str, revoked_at: Optional[float] = None) -> None:
+        self.revoke_user(user_id, revoked_at)
+
+    def _prune(self, now):
+        if now < self._next_prune_at:
+            return
+        self._next_prune_at = now + 60
+        expired = [
+            user_id
+            for user_id, revoked_at in self._revoked_at.items()
+            if revoked_at + self.retention_seconds <= now
+        ]
+        for user_id in expired:
+            del self._revoked_at[user_id]
@@ -0,0 +1,35 @@
+import hashlib
+from typing import Optional
+
+from propelauth_flask.token_cache import LocalTokenCache, TokenCache
+
+
+class _StepUpGrants:
+    """Remembers step up grants this app issued, until they expire.
+
+    Only grants whose lifetime is known are remembered, i.e. TIME_BASED grants returned by
+    verify_step_up_totp_challenge. Grants are stored in a TokenCache, so with a SharedTokenCache every
+    worker process can accept a grant that any of them issued. Anything else (including every ONE_TIME_USE
+    grant, which verifying uses up) is checked with PropelAuth each time.
+    """
+
+    def __init__(self, integration_api_key: str, grant_cache: Optional[TokenCache] = None):
+        self.grant_cache = grant_cache if grant_cache is not None else LocalTokenCache()
+        # Keys depend on the API key, so a cache shared between apps can't mix up their grants
+        self._key_secret = hashlib.blake2b(
+            integration_api_key.encode("utf-8"), digest_size=32, person=b"step_up_grants"
+        ).digest()
+
+    def remember(self, action_type: str, user_id: str, grant: str, expires_at: float):
+        self.grant_cache.set(self._key(action_type, user_id, grant), {"user_id": user_id}, expires_at)
+
+    def is_remembered(self, action_type: str, user_id: str, grant: str) -> bool:
+        entry = self.grant_cache.get(self._key(action_type, user_id, grant))
+        return entry is not None and entry.get("user_id") == user_id
+
+    def _key(self, action_type, user_id, grant):
+        return hashlib.blake2b(
+            "{}\0{}\0{}".format(action_type, user_id, grant).encode("utf-8"),
+            digest_size=16,
+            key=self._key_secret,
+        ).digest()
@@ -0,0 +1,189 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+class TokenCache(ABC):
+    """Stores the claims of access tokens that have already been verified.
+
+    Keys are fixed size digests computed by the library, so implementations never see raw tokens.
+    """
+
+    @abstractmethod
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """Returns the claims stored for key, or None if they are missing or expired."""
+
+    @abstractmethod
+    def set(self, key: bytes, claims: Dict[str, Any], expires_at: float) -> None:
+        """Stores claims for key until expires_at (seconds since the epoch)."""
+
+
+class LocalTokenCache(TokenCache):
+    """An in-process LRU cache of verified token claims."""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def set(self, key: bytes, claims: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+_MAGIC = b"PAUTHTC1"
+_FILE_HEADER = struct.Struct("<8sII")
+_FILE_HEADER_SIZE = 64
+# seq, key, expires_at, payload length
+_SLOT_HEADER = struct.Struct("<I16sdI")
+_SEQ = struct.Struct("<I")
+_KEY_SIZE = 16
+_WAYS = 4
+_MAX_READ_ATTEMPTS = 4
+
+
+class SharedTokenCache(TokenCache):
+    """A token cache in a memory mapped file that every worker process on a host can share.
+
+    The file is a fixed size, set associative table, so memory use is bounded by
+    capacity * max_entry_size. When a set is full, the entry closest to expiring is evicted.
+    Reads take no locks: every slot carries a sequence number that writers make odd while they
+    update it, and readers retry when it changed under them. Writers serialize on a lock of the file.
+
+    Anyone who can write to the file can inject users, so it is created readable and writable only by
+    the current user. Keep it somewhere other users can't replace it.
+    """
+
+    def __init__(self, path: str, capacity: int = 8192, max_entry_size: int = 4096):
+        self.path = path
+        self.num_sets = max(1, -(-capacity // _WAYS))
+        self.capacity = self.num_sets * _WAYS
+        self.max_entry_size = max_entry_size
+        self._slot_size = _SLOT_HEADER.size + max_entry_size
+        self._file_size = _FILE_HEADER_SIZE + self.capacity * self._slot_size
+        self._lock = threading.Lock()
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._write_lock():
+            if not self._has_expected_layout():
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._file_size)
+                os.pwrite(
+                    self._fd,
+                    _FILE_HEADER.pack(_MAGIC, self.capacity, self._slot_size),
+                    0,
+                )
+        self._mm = mmap.mmap(self._fd, self._file_size)
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        mm = self._mm
+        for offset in self._slot_offsets(key):
+            for _ in range(_MAX_READ_ATTEMPTS):
+                seq, slot_key, expires_at, length = _SLOT_HEADER.unpack_from(mm, offset)
+                if seq & 1:
+                    continue
+                if slot_key != key or expires_at <= now or length > self.max_entry_size:
+                    break
+
+                payload_start = offset + _SLOT_HEADER.size
+                payload = mm[payload_start:payload_start + length]
+                if _SEQ.unpack_from(mm, offset)[0] != seq:
+                    continue
+
+                try:
+                    return json.loads(payload)
+                except ValueError:
+                    return None
+        return None
+
+    def set(self, key: bytes, claims: Dict[str, Any], expires_at: float) -> None:
+        payload = json.dumps(claims, separators=(",", ":")).encode("utf-8")
+        if len(payload) > self.max_entry_size:
+            return
+
+        mm = self._mm
+        with self._write_lock():
+            offset = self._choose_slot(key, time.time())
+            (seq,) = _SEQ.unpack_from(mm, offset)
+            _SEQ.pack_into(mm, offset, (seq + 1) & 0xFFFFFFFF)
+            _SLOT_HEADER.pack_into(mm, offset, (seq + 1) & 0xFFFFFFFF, key, expires_at, len(payload))
+            payload_start = offset + _SLOT_HEADER.size
+            mm[payload_start:payload_start + len(payload)] = payload
+            _SEQ.pack_into(mm, offset, (seq + 2) & 0xFFFFFFFF)
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+    def _slot_offsets(self, key: bytes):
+        set_index = int.from_bytes(key[:8], "little") % self.num_sets
+        first = _FILE_HEADER_SIZE + set_index * _WAYS * self._slot_size
+        return range(first, first + _WAYS * self._slot_size, self._slot_size)
+
+    def _choose_slot(self, key: bytes, now: float) -> int:
+        victim = None
+        victim_expires_at = None
+        for offset in self._slot_offsets(key):
+            _, slot_key, expires_at, _ = _SLOT_HEADER.unpack_from(self._mm, offset)
+            if slot_key == key:
+                return offset
+            if expires_at <= now:
+                expires_at = 0
+            if victim is None or expires_at < victim_expires_at:
+                victim, victim_expires_at = offset, expires_at
+        return victim
+
+    def _has_expected_layout(self) -> bool:
+        if os.fstat(self._fd).st_size != self._file_size:
+            return False
+        header = os.pread(self._fd, _FILE_HEADER.size, 0)
+        return header == _FILE_HEADER.pack(_MAGIC, self.capacity, self._slot_size)
+
+    def _write_lock(self):
+        return _FileLock(self._lock, self._fd)
+
+
+class _FileLock:
+    """Excludes threads in this process with a lock, and other processes with a lock on the file."""
+
+    def __init__(self, thread_lock, fd):
+        self.thread_lock = thread_lock
+        self.fd = fd
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if fcntl is not None:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
@@ -0,0 +1,216 @@
+import datetime
+import hashlib
+
+import jwt
+from propelauth_py.auth_fns import (
+    _extract_token_from_authorization_header,
+    validate_exact_org_role_and_get_org,
+    validate_org_access_and_get_org_member_info,
+)
+from propelauth_py.errors import ForbiddenException, UnauthorizedException
+from propelauth_py.jwt import OPTIONS
+from propelauth_py.logging_config import get_logger, should_log_exceptions
+from propelauth_py.user import UserAndOrgMemberInfo
+from propelauth_flask.permissions import (
+    compile_permissions,
+    compile_role,
+    has_permissions,
+    is_at_least_role,
+)
+from propelauth_flask.tracing import _NOOP_TRACER
+from propelauth_flask.user import LoggedInUser, _to_lazy_user
+
+
+class _TokenValidator:
+    """Verifies access tokens, optionally remembering verified claims in a TokenCache.
+
+    Roles and permissions can be passed as names, or already compiled with
+    propelauth_flask.permissions so checking them is a single mask operation.
+
+    Every validate method takes cached_only. When it's set, the method returns None instead of
+    verifying a token that isn't already cached, which lets callers decide where to do the expensive work.
+    """
+
+    def __init__(self, token_verification_metadata, token_cache=None, revocation_list=None, tracer=None):
+        self.token_verification_metadata = token_verification_metadata
+        self.token_cache = token_cache
+        self.revocation_list = revocation_list
+        self.tracer = tracer if tracer is not None else _NOOP_TRACER
+        # Cache keys depend on the verifier key and issuer, so a cache shared between apps
+        # can never hand one app a token that was only verified by another.
+        self._cache_key_secret = hashlib.blake2b(
+            "{}\0{}".format(
+                token_verification_metadata.issuer,
+                token_verification_metadata.verifier_key,
+            ).encode("utf-8"),
+            digest_size=32,
+        ).digest()
+
+    def validate_access_token_and_get_user(self, authorization_header, cached_only=False):
+        with self.tracer.start_span("propelauth.parse_header"):
+            access_token = _extract_token_from_authorization_header(authorization_header)
+        claims = self._get_verified_claims(access_token, cached_only)
+        if claims is None:
+            return None
+        if self.revocation_list is not None and self.revocation_list.is_revoked(
+            claims.get("user_id"), claims.get("iat")
+        ):
+            raise UnauthorizedException.invalid_access_token()
+        return _to_lazy_user(claims)
+
+    def validate_access_token_and_get_user_with_org(
+        self, authorization_header, required_org_id, cached_only=False
+    ):
+        return self._validate_with_org(
+            authorization_header,
+            cached_only,
+            validate_org_access_and_get_org_member_info,
+            required_org_id,
+        )
+
+    def validate_access_token_and_get_user_with_org_by_minimum_role(
+        self, authorization_header, required_org_id, minimum_required_role, cached_only=False
+    ):
+        return self._validate_with_org(
+            authorization_header,
+            cached_only,
+            _validate_minimum_org_role_and_get_org,
+            required_org_id,
+            compile_role(minimum_required_role),
+        )
+
+    def validate_access_token_and_get_user_with_org_by_exact_role(
+        self, authorization_header, required_org_id, required_role, cached_only=False
+    ):
+        return self._validate_with_org(
+            authorization_header,
+            cached_only,
+            validate_exact_org_role_and_get_org,
+            required_org_id,
+            required_role,
+        )
+
+    def validate_access_token_and_get_user_with_org_by_permission(
+        self, authorization_header, required_org_id, permission, cached_only=False
+    ):
+        return self._validate_with_org(
+            authorization_header,
+            cached_only,
+            _validate_permissions_and_get_org,
+            required_org_id,
+            compile_permissions(permission),
+        )
+
+    def validate_access_token_and_get_user_with_org_by_all_permissions(
+        self, authorization_header, required_org_id, permissions, cached_only=False
+    ):
+        return self._validate_with_org(
+            authorization_header,
+            cached_only,
+            _validate_permissions_and_get_org,
+            required_org_id,
+            compile_permissions(permissions),
+        )
+
+    def validate_access_token_and_get_user_with_orgs(
+        self,
+        authorization_header,
+        required_org_ids,
+        minimum_required_role=None,
+        permissions=None,
+        cached_only=False,
+    ):
+        """Validates the token once and checks the user against every org in required_org_ids.
+
+        Returns the LoggedInUser (whose org index is already built) and the OrgMemberInfo for each org.
+        """
+        user = self.validate_access_token_and_get_user(authorization_header, cached_only)
+        if user is None:
+            return None
+        if not required_org_ids:
+            raise ForbiddenException.unknown_required_org()
+
+        with self.tracer.start_span("propelauth.resolve_org", {"propelauth.org_count": len(required_org_ids)}):
+            logged_in_user = LoggedInUser(user=user)
+            org_index = logged_in_user._get_org_index()
+            for org_id in required_org_ids:
+                if org_id not in org_index.org_ids:
+                    raise ForbiddenException.user_not_member_of_org(org_id)
+
+            minimum_required_role = compile_role(minimum_required_role)
+            if minimum_required_role is not None and not org_index.org_ids_with_role(
+                minimum_required_role
+            ).issuperset(required_org_ids):
+                raise ForbiddenException.user_doesnt_have_required_role()
+
+            permissions = compile_permissions(permissions)
+            if permissions is not None and not org_index.org_ids_with_permissions(
+                permissions
+            ).issuperset(required_org_ids):
+                raise ForbiddenException.user_doesnt_have_required_permission()
+
+        return logged_in_user, [user.get_org(org_id) for org_id in required_org_ids]
+
+    def _validate_with_org(self, authorization_header, cached_only, validate_org, *args):
+        user = self.validate_access_token_and_get_user(authorization_header, cached_only)
+        if user is None:
+            return None
+        with self.tracer.start_span("propelauth.resolve_org", {"propelauth.org_id": args[0] or ""}):
+            org_member_info = validate_org(user, *args)
+        return UserAndOrgMemberInfo(user, org_member_info)
+
+    def _get_verified_claims(self, access_token, cached_only):
+        if self.token_cache is None:
+            if cached_only:
+                return None
+            return self._verify(access_token)
+
+        with self.tracer.start_span("propelauth.token_cache") as span:
+            cache_key = hashlib.blake2b(
+                access_token.encode("utf-8"), digest_size=16, key=self._cache_key_secret
+            ).digest()
+            claims = self.token_cache.get(cache_key)
+            span.set_attribute("propelauth.cache_hit", claims is not None)
+        if claims is not None or cached_only:
+            return claims
+
+        claims = self._verify(access_token)
+        if claims.get("user_id") is None:
+            raise UnauthorizedException.invalid_payload_in_access_token()
+        self.token_cache.set(cache_key, claims, claims["exp"])
+        return claims
+
+    def _verify(self, access_token):
+        with self.tracer.start_span("propelauth.verify_token"):
+            try:
+                return jwt.decode(
+                    access_token,
+                    self.token_verification_metadata.verifier_key,
+                    options=OPTIONS,
+                    issuer=self.token_verification_metadata.issuer,
+                    algorithms=["RS256"],
+                    leeway=datetime.timedelta(seconds=60),
+                )
+            except Exception:
+                if should_log_exceptions():
+                    get_logger().exception(
+                        "An error occurred while validating the access token"
+                    )
+                raise UnauthorizedException.invalid_access_token()
+
+def _validate_minimum_org_role_and_get_org(user, required_org_id, required_role):
+    org_member_info = validate_org_access_and_get_org_member_info(user, required_org_id)
+
+    if required_role is not None and not is_at_least_role(org_member_info, required_role):
+        raise ForbiddenException.user_doesnt_have_required_role()
+
+    return org_member_info
+
+
+def _validate_permissions_and_get_org(user, required_org_id, required_permissions):
+    org_member_info = validate_org_access_and_get_org_member_info(user, required_org_id)
+
+    if required_permissions is not None and not has_permissions(org_member_info, required_permissions):
+        raise ForbiddenException.user_doesnt_have_required_permission()
+
+    return org_member_info
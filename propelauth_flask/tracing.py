@@ -0,0 +1,67 @@
+"""Spans around the work the auth layer does for a request, for whatever tracing system you use.
+
+Pass a Tracer as tracer= to init_auth or init_auth_async. Each decorated view gets a propelauth.authenticate span,
+with propelauth.parse_header, propelauth.token_cache, propelauth.verify_token and propelauth.resolve_org spans for
+the steps inside it. Every backend method gets a propelauth.backend_call span, with a propelauth.http_request span
+for each request it actually makes (none if it was deduplicated or failed fast, more than one if it was retried or
+hedged).
+"""
+from typing import Any, ContextManager, Dict, Optional
+
+from propelauth_flask.backend_client import _Interceptor
+
+
+class Span:
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+class Tracer:
+    """Starts spans. This one does nothing, subclass it to send them somewhere.
+
+    start_span returns a context manager that yields a Span and ends it on exit. Exceptions raised inside it
+    propagate through it, so it can record them.
+    """
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> ContextManager[Span]:
+        return _NOOP_SPAN
+
+
+class OpenTelemetryTracer(Tracer):
+    """Starts spans with an OpenTelemetry tracer, e.g. OpenTelemetryTracer(trace.get_tracer("propelauth"))."""
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def start_span(self, name, attributes=None):
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+
+class _NoopSpan(Span):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_NOOP_TRACER = Tracer()
+
+
+class _Tracing(_Interceptor):
+    def __init__(self, tracer: Tracer, span_name: str):
+        self.tracer = tracer
+        self.span_name = span_name
+
+    def intercept(self, call, proceed):
+        with self.tracer.start_span(self.span_name, self._attributes(call)):
+            return proceed()
+
+    async def intercept_async(self, call, proceed):
+        with self.tracer.start_span(self.span_name, self._attributes(call)):
+            return await proceed()
+
+    @staticmethod
+    def _attributes(call):
+        return {"propelauth.method": call.method_name, "propelauth.read": call.is_read}
@@ -0,0 +1,138 @@
+import datetime
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from propelauth_flask._pipeline import _call_with_retries
+
+DateLike = Union[str, datetime.date]
+
+
+class UsageSample(NamedTuple):
+    """The usage of one org, user or API key (scope_id) on one day. count is None if fetching it failed."""
+
+    scope_id: str
+    date: str
+    count: Optional[int]
+    error: Optional[Exception] = None
+
+
+class UsageReport:
+    """API key usage per day, for every scope (org, user or API key) asked about.
+
+    counts[scope_id] is an array of one count per day, in the order of dates. Days whose usage couldn't be fetched
+    count as 0 there, and are listed in failed.
+    """
+
+    def __init__(self, dates: List[str], scope_ids: Iterable[str]):
+        self.dates = dates
+        self.counts: Dict[str, array] = {scope_id: array("q", bytes(8 * len(dates))) for scope_id in scope_ids}
+        self.failed: List[UsageSample] = []
+        self._day_index = {date: i for i, date in enumerate(dates)}
+
+    def add(self, sample: UsageSample):
+        if sample.error is not None:
+            self.failed.append(sample)
+        else:
+            self.counts[sample.scope_id][self._day_index[sample.date]] += sample.count or 0
+
+    def total(self, scope_id: str) -> int:
+        return sum(self.counts[scope_id])
+
+    def totals_by_day(self) -> array:
+        totals = array("q", bytes(8 * len(self.dates)))
+        for counts in self.counts.values():
+            for i, count in enumerate(counts):
+                totals[i] += count
+        return totals
+
+    def __repr__(self):
+        return "UsageReport(scopes={}, days={}, failed={})".format(len(self.counts), len(self.dates), len(self.failed))
+
+
+def iter_api_key_usage(
+    auth,
+    start_date: DateLike,
+    end_date: DateLike,
+    org_ids: Optional[Iterable[str]] = None,
+    user_ids: Optional[Iterable[str]] = None,
+    api_key_ids: Optional[Iterable[str]] = None,
+    concurrency: int = 8,
+    max_attempts: int = 3,
+) -> Iterator[UsageSample]:
+    """Fetches the usage of each of the org_ids, user_ids or api_key_ids (only one of them) on every day from
+    start_date to end_date (inclusive), with auth (usually your FlaskAuth), and yields each as soon as it's fetched.
+
+    Up to concurrency days are fetched at a time. Errors caused by the backend are retried up to max_attempts times,
+    and days that still fail are yielded with their error rather than stopping the rest.
+    """
+    field, scope_ids = _scope(org_ids, user_ids, api_key_ids)
+    dates = _dates(start_date, end_date)
+    queries = ((scope_id, date) for scope_id in scope_ids for date in dates)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="propelauth-usage") as executor:
+        in_flight = {}
+        while True:
+            # Queries are submitted as others finish, so only concurrency of them are held at a time
+            for scope_id, date in queries:
+                in_flight[executor.submit(_fetch, auth, field, scope_id, date, max_attempts)] = (scope_id, date)
+                if len(in_flight) >= concurrency:
+                    break
+            if not in_flight:
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                scope_id, date = in_flight.pop(future)
+                usage, error, _ = future.result()
+                yield UsageSample(scope_id, date, None if error else usage.count, error)
+
+
+def aggregate_api_key_usage(
+    auth,
+    start_date: DateLike,
+    end_date: DateLike,
+    org_ids: Optional[Iterable[str]] = None,
+    user_ids: Optional[Iterable[str]] = None,
+    api_key_ids: Optional[Iterable[str]] = None,
+    concurrency: int = 8,
+    max_attempts: int = 3,
+) -> UsageReport:
+    """Like iter_api_key_usage, but adds the samples up into a UsageReport of per-day counts."""
+    field, scope_ids = _scope(org_ids, user_ids, api_key_ids)
+    report = UsageReport(_dates(start_date, end_date), scope_ids)
+    # The ids may be a one-shot iterable, so the list _scope made is what's passed on
+    samples = iter_api_key_usage(
+        auth, start_date, end_date, concurrency=concurrency, max_attempts=max_attempts, **{field + "s": scope_ids}
+    )
+    for sample in samples:
+        report.add(sample)
+    return report
+
+
+def _fetch(auth, field, scope_id, date, max_attempts):
+    return _call_with_retries(
+        lambda kwargs: auth.fetch_api_key_usage(**kwargs), {"date": date, field: scope_id}, max_attempts, 1.0
+    )
+
+
+def _scope(org_ids, user_ids, api_key_ids):
+    given = [(field, ids) for field, ids in (("org_id", org_ids), ("user_id", user_ids), ("api_key_id", api_key_ids))
+             if ids is not None]
+    if len(given) != 1:
+        raise ValueError("Exactly one of org_ids, user_ids or api_key_ids is required")
+    field, ids = given[0]
+    return field, list(dict.fromkeys(ids))
+
+
+def _dates(start_date, end_date) -> List[str]:
+    start, end = _to_date(start_date), _to_date(end_date)
+    if end < start:
+        raise ValueError("end_date is before start_date")
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+def _to_date(value: Any) -> datetime.date:
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(value)
@@ -1,21 +1,86 @@
-from typing import List, Optional
-from propelauth_py.user import User
+from collections.abc import Mapping
+from typing import FrozenSet, Iterable, List, Optional, Union
+from propelauth_py.errors import UnauthorizedException
+from propelauth_py.types.login_method import to_login_method
+from propelauth_py.user import User, _to_org_member_info
 from propelauth_py.types.user import OrgIdToOrgMemberInfo
-from dataclasses import dataclass
+from propelauth_flask.permissions import (
+    RequiredPermissions,
+    RequiredRole,
+    compile_permissions,
+    compile_role,
+    has_permissions,
+    is_at_least_role,
+    org_permission_mask,
+    org_role_mask,
+)
+
+_UNSET = object()
+
 
-@dataclass
 class LoggedInUser:
-    user: User
+    __slots__ = (
+        "_user",
+        "_user_id",
+        "_org_id_to_org_member_info",
+        "_legacy_user_id",
+        "_org_name_to_org_member_info",
+        "_org_index",
+    )
+
+    def __init__(
+        self,
+        user: User,
+        # Backwards compatibility arguments, these are always read from user
+        user_id: Optional[str] = None,
+        org_id_to_org_member_info: Optional[OrgIdToOrgMemberInfo] = None,
+        legacy_user_id: Optional[str] = None,
+    ):
+        self.user = user
+        self._user_id = _UNSET
+        self._org_id_to_org_member_info = _UNSET
+        self._legacy_user_id = _UNSET
+
+    @property
+    def user(self) -> User:
+        return self._user
+
+    @user.setter
+    def user(self, user: User):
+        self._user = user
+        self._org_name_to_org_member_info = None
+        self._org_index = None
 
-    # Backwards compatibility fields
-    user_id: str
-    org_id_to_org_member_info: Optional[OrgIdToOrgMemberInfo]
-    legacy_user_id: Optional[str] = None
+    # Backwards compatibility fields, read from user unless they've been assigned
+    @property
+    def user_id(self) -> str:
+        if self._user_id is _UNSET:
+            return self.user.user_id
+        return self._user_id
 
-    def __post_init__(self):
-        self.user_id = self.user.user_id
-        self.org_id_to_org_member_info = self.user.org_id_to_org_member_info
-        self.legacy_user_id = self.user.legacy_user_id
+    @user_id.setter
+    def user_id(self, user_id: str):
+        self._user_id = user_id
+
+    @property
+    def org_id_to_org_member_info(self) -> Optional[OrgIdToOrgMemberInfo]:
+        if self._org_id_to_org_member_info is _UNSET:
+            return self.user.org_id_to_org_member_info
+        return self._org_id_to_org_member_info
+
+    @org_id_to_org_member_info.setter
+    def org_id_to_org_member_info(self, org_id_to_org_member_info: Optional[OrgIdToOrgMemberInfo]):
+        self._org_id_to_org_member_info = org_id_to_org_member_info
+
+    @property
+    def legacy_user_id(self) -> Optional[str]:
+        if self._legacy_user_id is _UNSET:
+            return self.user.legacy_user_id
+        return self._legacy_user_id
+
+    @legacy_user_id.setter
+    def legacy_user_id(self, legacy_user_id: Optional[str]):
+        self._legacy_user_id = legacy_user_id
 
     def exists(self) -> bool:
         return True
@@ -38,7 +103,12 @@ class LoggedInUser:
 
     def get_org_by_name(self, org_name: str):
         """Returns the org member info for the org_name, if the user is in the org."""
-        return self.user.get_org_by_name(org_name)
+        if self._org_name_to_org_member_info is None:
+            org_name_to_org_member_info = {}
+            for org_member_info in self.user.get_orgs():
+                org_name_to_org_member_info.setdefault(org_member_info.org_name, org_member_info)
+            self._org_name_to_org_member_info = org_name_to_org_member_info
+        return self._org_name_to_org_member_info.get(org_name)
 
     def get_user_property(self, property_name: str):
         """Returns the user property value, if it exists."""
@@ -52,28 +122,209 @@ class LoggedInUser:
         """Returns true if the user is the role in the org."""
         return self.user.is_role_in_org(org_id, role)
 
-    def is_at_least_role_in_org(self, org_id: str, role: str) -> bool:
+    def is_at_least_role_in_org(self, org_id: str, role: Union[str, RequiredRole]) -> bool:
         """Returns true if the user is at least the role in the org."""
-        return self.user.is_at_least_role_in_org(org_id, role)
+        org_member_info = self.user.get_org(org_id)
+        if not org_member_info:
+            return False
+        return is_at_least_role(org_member_info, compile_role(role))
 
-    def has_permission_in_org(self, org_id: str, permission: str) -> bool:
+    def has_permission_in_org(self, org_id: str, permission: Union[str, RequiredPermissions]) -> bool:
         """Returns true if the user has the permission in the org."""
-        return self.user.has_permission_in_org(org_id, permission)
+        return self.has_all_permissions_in_org(org_id, permission)
 
-    def has_all_permissions_in_org(self, org_id: str, permissions: List[str]) -> bool:
+    def has_all_permissions_in_org(self, org_id: str, permissions: Union[List[str], RequiredPermissions]) -> bool:
         """Returns true if the user has all the permissions in the org."""
-        return self.user.has_all_permissions_in_org(org_id, permissions)
+        org_member_info = self.user.get_org(org_id)
+        if not org_member_info:
+            return False
+        return has_permissions(org_member_info, compile_permissions(permissions))
+
+    def filter_orgs_with_permission(
+        self, org_ids: Iterable[str], permission: Union[str, RequiredPermissions]
+    ) -> List[str]:
+        """Returns the org_ids, in the same order, that the user has the permission in."""
+        return self.filter_orgs_with_all_permissions(org_ids, permission)
+
+    def filter_orgs_with_all_permissions(
+        self, org_ids: Iterable[str], permissions: Union[List[str], RequiredPermissions]
+    ) -> List[str]:
+        """Returns the org_ids, in the same order, that the user has all the permissions in."""
+        allowed_org_ids = self._get_org_index().org_ids_with_permissions(compile_permissions(permissions))
+        return [org_id for org_id in org_ids if org_id in allowed_org_ids]
+
+    def filter_orgs_with_min_role(self, org_ids: Iterable[str], role: Union[str, RequiredRole]) -> List[str]:
+        """Returns the org_ids, in the same order, that the user is at least the role in."""
+        allowed_org_ids = self._get_org_index().org_ids_with_role(compile_role(role))
+        return [org_id for org_id in org_ids if org_id in allowed_org_ids]
+
+    def orgs_with_min_role(self, role: Union[str, RequiredRole]):
+        """Returns the orgs the user is at least the role in."""
+        allowed_org_ids = self._get_org_index().org_ids_with_role(compile_role(role))
+        return [org for org in self.get_orgs() if org.org_id in allowed_org_ids]
+
+    def orgs_with_permission(self, permission: Union[str, RequiredPermissions]):
+        """Returns the orgs the user has the permission in."""
+        allowed_org_ids = self._get_org_index().org_ids_with_permissions(compile_permissions(permission))
+        return [org for org in self.get_orgs() if org.org_id in allowed_org_ids]
+
+    def _get_org_index(self) -> "_OrgIndex":
+        if self._org_index is None:
+            self._org_index = _OrgIndex(self.user.get_orgs())
+        return self._org_index
 
     def __eq__(self, other) -> bool:
         if isinstance(other, LoggedInUser):
-            return self.user == other.user
+            return (self.user, self.user_id, self.org_id_to_org_member_info, self.legacy_user_id) == (
+                other.user, other.user_id, other.org_id_to_org_member_info, other.legacy_user_id
+            )
         return False
 
+    def __repr__(self):
+        return "LoggedInUser(user={!r}, user_id={!r}, org_id_to_org_member_info={!r}, legacy_user_id={!r})".format(
+            self.user, self.user_id, self.org_id_to_org_member_info, self.legacy_user_id
+        )
+
+class _OrgIndex:
+    """Precomputed role and permission masks for every org a user is in, plus the sets of
+    org_ids that satisfy each requirement asked about so far."""
+
+    __slots__ = ("org_ids", "_org_id_to_masks", "_org_ids_by_permission_mask", "_org_ids_by_role_bit")
+
+    def __init__(self, orgs):
+        self._org_id_to_masks = {
+            org.org_id: (org_permission_mask(org), org_role_mask(org)) for org in orgs
+        }
+        self.org_ids = frozenset(self._org_id_to_masks)
+        self._org_ids_by_permission_mask = {}
+        self._org_ids_by_role_bit = {}
+
+    def org_ids_with_permissions(self, required: RequiredPermissions) -> FrozenSet[str]:
+        org_ids = self._org_ids_by_permission_mask.get(required.mask)
+        if org_ids is None:
+            org_ids = frozenset(
+                org_id
+                for org_id, (permission_mask, _) in self._org_id_to_masks.items()
+                if permission_mask & required.mask == required.mask
+            )
+            self._org_ids_by_permission_mask[required.mask] = org_ids
+        return org_ids
+
+    def org_ids_with_role(self, required: RequiredRole) -> FrozenSet[str]:
+        org_ids = self._org_ids_by_role_bit.get(required.bit)
+        if org_ids is None:
+            org_ids = frozenset(
+                org_id
+                for org_id, (_, role_mask) in self._org_id_to_masks.items()
+                if role_mask & required.bit
+            )
+            self._org_ids_by_role_bit[required.bit] = org_ids
+        return org_ids
+
+
 # If a user is not logged in, optional_user will still allow the request to continue
 # Ideally, current_user would just be none. However, since current_user is a proxy,
 #   the check `current_user is None` actually returns false.
 # You can do current_user._get_current_object() is None but that feels clunky.
 # Instead, we'll make it an explicit type add a function `exists()` to distinguish the cases.
 class LoggedOutUser:
+    __slots__ = ()
+
     def exists(self):
         return False
+
+
+class _LazyOrgMemberInfoMap(Mapping):
+    """A read-only org_id -> OrgMemberInfo map that only builds an OrgMemberInfo when it's looked up.
+
+    Tokens for users in many orgs carry a large map, but most requests only look at one org (or none).
+    """
+
+    def __init__(self, org_id_to_org_member_info_json):
+        self._json = org_id_to_org_member_info_json
+        self._decoded = {}
+
+    def __getitem__(self, org_id):
+        org_member_info = self._decoded.get(org_id)
+        if org_member_info is None:
+            org_member_info = _to_org_member_info(
+                {org_id: self._json[org_id]}
+            ).get(org_id)
+            if org_member_info is None:
+                raise KeyError(org_id)
+            self._decoded[org_id] = org_member_info
+        return org_member_info
+
+    def __contains__(self, org_id):
+        org_member_info_json = self._json.get(org_id)
+        return org_member_info_json is not None and org_member_info_json["user_role"] is not None
+
+    def __iter__(self):
+        for org_id, org_member_info_json in self._json.items():
+            if org_member_info_json["user_role"] is not None:
+                yield org_id
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+_REQUIRED_ORG_MEMBER_INFO_KEYS = (
+    "org_id",
+    "org_name",
+    "org_metadata",
+    "url_safe_org_name",
+    "inherited_user_roles_plus_current_role",
+    "user_permissions",
+)
+
+
+def _check_org_id_to_org_member_info_json(org_id_to_org_member_info_json):
+    """Checks the shape _LazyOrgMemberInfoMap relies on up front, so a malformed claim is rejected as an
+    invalid token instead of failing later, inside the view, when an org is looked up."""
+    if not isinstance(org_id_to_org_member_info_json, dict):
+        raise UnauthorizedException.invalid_payload_in_access_token()
+    for org_member_info_json in org_id_to_org_member_info_json.values():
+        if not isinstance(org_member_info_json, dict) or "user_role" not in org_member_info_json:
+            raise UnauthorizedException.invalid_payload_in_access_token()
+        if org_member_info_json["user_role"] is not None and not all(
+            key in org_member_info_json for key in _REQUIRED_ORG_MEMBER_INFO_KEYS
+        ):
+            raise UnauthorizedException.invalid_payload_in_access_token()
+
+
+def _to_lazy_user(decoded_token) -> User:
+    """Same as propelauth_py's _to_user, but org member info is decoded on demand"""
+    user_id = decoded_token.get("user_id")
+    if user_id is None:
+        raise UnauthorizedException.invalid_payload_in_access_token()
+
+    org_member_info = decoded_token.get("org_member_info")
+    if org_member_info:
+        _check_org_id_to_org_member_info_json({None: org_member_info})
+        active_org_id = org_member_info.get("org_id")
+        org_id_to_org_member_info = _LazyOrgMemberInfoMap({active_org_id: org_member_info})
+    else:
+        active_org_id = None
+        org_id_to_org_member_info_json = decoded_token.get("org_id_to_org_member_info")
+        if org_id_to_org_member_info_json is None:
+            org_id_to_org_member_info = None
+        else:
+            _check_org_id_to_org_member_info_json(org_id_to_org_member_info_json)
+            org_id_to_org_member_info = _LazyOrgMemberInfoMap(org_id_to_org_member_info_json)
+
+    return User(
+        user_id,
+        org_id_to_org_member_info,
+        decoded_token.get("email"),
+        first_name=decoded_token.get("first_name"),
+        last_name=decoded_token.get("last_name"),
+        username=decoded_token.get("username"),
+        legacy_user_id=decoded_token.get("legacy_user_id"),
+        impersonator_user_id=decoded_token.get("impersonator_user_id"),
+        properties=decoded_token.get("properties"),
+        active_org_id=active_org_id,
+        login_method=to_login_method(decoded_token.get("login_method", {})),
+    )
@@ -0,0 +1,194 @@
+"""Receives PropelAuth webhooks and turns them into invalidations of local caches.
+
+PropelAuth delivers webhooks through Svix, so every request is signed with the signing secret
+(whsec_...) shown in the dashboard. Events are handed to listeners, which can be any object with some of
+these methods (missing ones are skipped):
+
+    invalidate_user(user_id)        the user, or one of their memberships, changed
+    remove_user(user_id)            the user was deleted
+    invalidate_org(org_id)          the org changed
+    remove_org(org_id)              the org was deleted
+    revoke_user_sessions(user_id, revoked_at)
+                                    the user was logged out everywhere, disabled or deleted, at
+                                    revoked_at (epoch seconds)
+    invalidate_api_key(api_key_id)  the API key changed or was deleted
+
+LocalReplica is a listener, so passing it keeps the replica up to date between re-scans, and so is
+RevocationList (e.g. auth.revocation_list).
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from flask import Blueprint, request
+from propelauth_py.logging_config import get_logger
+
+_SECRET_PREFIX = "whsec_"
+_SIGNATURE_VERSION = "v1"
+_DELETED_EVENTS = {"user.deleted": "remove_user", "org.deleted": "remove_org"}
+_SESSION_ENDING_EVENTS = {"user.deleted", "user.disabled", "user.logged_out"}
+_EVENT_TIME_FIELDS = ("timestamp", "occurred_at", "created_at")
+
+
+class WebhookVerificationError(Exception):
+    def __init__(self, message):
+        self.message = message
+
+
+def verify_webhook(
+    signing_secret: str,
+    headers: Mapping[str, str],
+    body: bytes,
+    tolerance_seconds: int = 300,
+) -> Dict[str, Any]:
+    """Checks the signature and timestamp of a webhook and returns its decoded event."""
+    message_id = headers.get("svix-id")
+    timestamp = headers.get("svix-timestamp")
+    signatures = headers.get("svix-signature")
+    if not message_id or not timestamp or not signatures:
+        raise WebhookVerificationError("Missing webhook signature headers")
+
+    try:
+        sent_at = int(timestamp)
+    except ValueError:
+        raise WebhookVerificationError("Invalid webhook timestamp")
+    if abs(time.time() - sent_at) > tolerance_seconds:
+        raise WebhookVerificationError("Webhook timestamp is too old or too new")
+
+    expected = sign_webhook(signing_secret, message_id, sent_at, body).split(",", 1)[1]
+    for signature in signatures.split(" "):
+        version, _, value = signature.partition(",")
+        if version == _SIGNATURE_VERSION and hmac.compare_digest(value, expected):
+            break
+    else:
+        raise WebhookVerificationError("No matching webhook signature")
+
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise WebhookVerificationError("Webhook body isn't JSON")
+    if not isinstance(event, dict):
+        raise WebhookVerificationError("Webhook body isn't a JSON object")
+    return event
+
+
+def sign_webhook(signing_secret: str, message_id: str, timestamp: int, body: bytes) -> str:
+    """Returns the svix-signature header value for a webhook, e.g. to test your endpoint."""
+    if signing_secret.startswith(_SECRET_PREFIX):
+        signing_secret = signing_secret[len(_SECRET_PREFIX):]
+    key = base64.b64decode(signing_secret)
+    signed_content = b"%s.%d.%s" % (message_id.encode("utf-8"), timestamp, body)
+    digest = hmac.new(key, signed_content, hashlib.sha256).digest()
+    return "{},{}".format(_SIGNATURE_VERSION, base64.b64encode(digest).decode("ascii"))
+
+
+def dispatch_webhook_event(
+    event: Dict[str, Any], listeners: Iterable[Any], occurred_at: Optional[float] = None
+) -> None:
+    """Calls the listener methods an event affects. Every listener is called even if one fails.
+
+    Sessions are revoked as of the event's own timestamp if it has one, else occurred_at (default: now).
+    """
+    occurred_at = _event_time(event) or occurred_at or time.time()
+    calls = _invalidations_for_event(event, occurred_at)
+    error = None
+    for listener in listeners:
+        for method_name, args in calls:
+            method = getattr(listener, method_name, None)
+            if method is None:
+                continue
+            try:
+                method(*args)
+            except Exception as e:
+                get_logger().exception("Webhook listener %r failed on %s", listener, method_name)
+                error = error or e
+    if error is not None:
+        raise error
+
+
+def create_webhook_blueprint(
+    signing_secret: str,
+    listeners: Iterable[Any] = (),
+    url_rule: str = "/propelauth/webhooks",
+    name: str = "propelauth_webhooks",
+    tolerance_seconds: int = 300,
+) -> Blueprint:
+    """Returns a blueprint with a POST endpoint for PropelAuth webhooks.
+
+    Badly signed requests get a 400. If a listener fails the endpoint returns a 500, so the webhook is
+    retried later. A retry is signed with a later svix-timestamp, so the first one seen for each svix-id is
+    what an event without a timestamp of its own is dated by, and a retry doesn't revoke newer sessions.
+    """
+    listeners = list(listeners)
+    first_deliveries = _FirstDeliveries()
+    blueprint = Blueprint(name, __name__)
+
+    @blueprint.route(url_rule, methods=["POST"])
+    def receive_webhook():
+        try:
+            event = verify_webhook(
+                signing_secret, request.headers, request.get_data(), tolerance_seconds
+            )
+        except WebhookVerificationError as e:
+            return e.message, 400
+
+        try:
+            occurred_at = first_deliveries.sent_at(
+                request.headers["svix-id"], int(request.headers["svix-timestamp"])
+            )
+            dispatch_webhook_event(event, listeners, occurred_at)
+        except Exception:
+            return "", 500
+        return "", 204
+
+    return blueprint
+
+
+class _FirstDeliveries:
+    """The svix-timestamp each of the last max_size webhooks was first delivered with."""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._sent_at: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sent_at(self, message_id: str, timestamp: int) -> int:
+        with self._lock:
+            first = self._sent_at.setdefault(message_id, timestamp)
+            self._sent_at.move_to_end(message_id)
+            if len(self._sent_at) > self.max_size:
+                self._sent_at.popitem(last=False)
+        return first
+
+
+def _event_time(event) -> Optional[float]:
+    for field in _EVENT_TIME_FIELDS:
+        value = event.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+            # Some senders use milliseconds
+            return value / 1000 if value > 1e11 else float(value)
+    return None
+
+
+def _invalidations_for_event(event, occurred_at):
+    event_type = event.get("event_type") or event.get("type") or ""
+    calls = []
+    if event_type in _SESSION_ENDING_EVENTS and event.get("user_id"):
+        calls.append(("revoke_user_sessions", (event["user_id"], occurred_at)))
+
+    if event_type in _DELETED_EVENTS:
+        id_field = "user_id" if event_type.startswith("user.") else "org_id"
+        if event.get(id_field):
+            calls.append((_DELETED_EVENTS[event_type], (event[id_field],)))
+    elif event_type.startswith("user.") and event.get("user_id"):
+        calls.append(("invalidate_user", (event["user_id"],)))
+    elif event_type.startswith("org.") and event.get("org_id"):
+        calls.append(("invalidate_org", (event["org_id"],)))
+    if event.get("api_key_id"):
+        calls.append(("invalidate_api_key", (event["api_key_id"],)))
+    return calls
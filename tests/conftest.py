@@ -78,7 +78,7 @@ def optional_user_route(app, auth):
     return route_name
 
 
-def mock_api_and_init_auth(auth_url, status_code, json):
+def mock_api_and_init_auth(auth_url, status_code, json, init=init_auth, **init_kwargs):
     with requests_mock.Mocker() as m:
         api_key = "api_key"
         m.get(BASE_INTERNAL_API_URL + "/api/v1/token_verification_metadata",
@@ -88,4 +88,4 @@ def mock_api_and_init_auth(auth_url, status_code, json):
               },
               json=json,
               status_code=status_code)
-        return init_auth(auth_url, api_key)
+        return init(auth_url, api_key, **init_kwargs)
@@ -0,0 +1,129 @@
+import dataclasses
+from uuid import uuid4
+
+from propelauth_py.types.user import (
+    Org,
+    OrgQueryResponse,
+    Organization,
+    UserMetadata,
+    UsersPagedResponse,
+)
+from propelauth_py.user import _to_org_member_info
+
+from tests.auth_helpers import random_org
+
+
+class FakeBackend:
+    """An in-memory stand in for the paginated FlaskAuth reads, which counts the calls made to it."""
+
+    def __init__(self):
+        self.users = {}
+        self.orgs = {}
+        self.calls = []
+        self._clock = 0
+
+    def add_org(self, name=None):
+        org_id = str(uuid4())
+        self.orgs[org_id] = Organization(
+            org_id=org_id,
+            name=name or str(uuid4()),
+            url_safe_org_slug=str(uuid4()),
+            can_setup_saml=False,
+            is_saml_configured=False,
+            is_saml_in_test_mode=False,
+            max_users=None,
+            metadata={},
+            domain=None,
+            extra_domains=[],
+            domain_autojoin=False,
+            domain_restrict=False,
+            custom_role_mapping_name=None,
+            legacy_org_id=None,
+        )
+        return org_id
+
+    def add_user(self, org_id_to_role=None, email=None):
+        self._clock += 1
+        user_id = str(uuid4())
+        org_id_to_org_info = {}
+        for org_id, role in (org_id_to_role or {}).items():
+            org = random_org(role)
+            org["org_id"] = org_id
+            org["org_name"] = self.orgs[org_id].name
+            org_id_to_org_info[org_id] = org
+        self.users[user_id] = UserMetadata(
+            user_id=user_id,
+            email=email or "{}@example.com".format(user_id),
+            email_confirmed=True,
+            has_password=True,
+            username=None,
+            first_name=None,
+            last_name=None,
+            picture_url=None,
+            locked=False,
+            enabled=True,
+            mfa_enabled=False,
+            can_create_orgs=True,
+            created_at=self._clock,
+            last_active_at=self._clock,
+            org_id_to_org_info=_to_org_member_info(org_id_to_org_info),
+            legacy_user_id=None,
+            impersonator_user_id=None,
+            metadata=None,
+            properties={},
+        )
+        return user_id
+
+    def fetch_user_metadata_by_user_id(self, user_id, include_orgs=False):
+        self.calls.append(("fetch_user_metadata_by_user_id", user_id))
+        user = self.users.get(user_id)
+        return None if user is None else _with_orgs(user, include_orgs)
+
+    def fetch_users_by_query(self, page_size=10, page_number=0, order_by=None, email_or_username=None,
+                             include_orgs=False, legacy_user_id=None):
+        self.calls.append(("fetch_users_by_query", page_number))
+        users = sorted(self.users.values(), key=lambda user: user.created_at)
+        page = users[page_number * page_size:(page_number + 1) * page_size]
+        return UsersPagedResponse(
+            users=[_with_orgs(user, include_orgs) for user in page],
+            total_users=len(users),
+            current_page=page_number,
+            page_size=page_size,
+            has_more_results=(page_number + 1) * page_size < len(users),
+        )
+
+    def fetch_users_in_org(self, org_id, page_size=10, page_number=0, include_orgs=False, role=None):
+        self.calls.append(("fetch_users_in_org", org_id))
+        raise AssertionError("fetch_users_in_org should be served locally")
+
+    def fetch_org(self, org_id):
+        self.calls.append(("fetch_org", org_id))
+        return self.orgs.get(org_id)
+
+    def fetch_org_by_query(self, page_size=10, page_number=0, order_by=None, name=None, legacy_org_id=None,
+                           domain=None):
+        self.calls.append(("fetch_org_by_query", page_number))
+        orgs = list(self.orgs.values())
+        page = orgs[page_number * page_size:(page_number + 1) * page_size]
+        return OrgQueryResponse(
+            orgs=[
+                Org(
+                    org_id=org.org_id,
+                    name=org.name,
+                    max_users=org.max_users,
+                    is_saml_configured=org.is_saml_configured,
+                    legacy_org_id=org.legacy_org_id,
+                    metadata=org.metadata,
+                    custom_role_mapping_name=org.custom_role_mapping_name,
+                )
+                for org in page
+            ],
+            total_orgs=len(orgs),
+            current_page=page_number,
+            page_size=page_size,
+            has_more_results=(page_number + 1) * page_size < len(orgs),
+        )
+
+
+def _with_orgs(user, include_orgs):
+    return user if include_orgs else dataclasses.replace(user, org_id_to_org_info=None)
@@ -0,0 +1,95 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests_mock
+from propelauth_py.api import BACKEND_API_BASE_URL
+from propelauth_py.api.access_token import CreateAccessTokenResponse
+
+from propelauth_flask import AccessTokenCache
+from tests.auth_helpers import random_user_id
+
+
+class FakeMinter:
+    def __init__(self, release=None):
+        self.release = release
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, user_id, duration_in_minutes, active_org_id):
+        if self.release is not None:
+            self.release.wait(5)
+        with self._lock:
+            self.calls.append((user_id, duration_in_minutes, active_org_id))
+            return CreateAccessTokenResponse(access_token="token-{}".format(len(self.calls)))
+
+
+def test_tokens_are_reused_per_user_org_and_duration():
+    minter = FakeMinter()
+    cache = AccessTokenCache(minter)
+    user_id = random_user_id()
+
+    assert cache.get(user_id, 60).access_token == "token-1"
+    assert cache.get(user_id, 60).access_token == "token-1"
+    assert cache.get(user_id, 60, "org").access_token == "token-2"
+    assert cache.get(random_user_id(), 60).access_token == "token-3"
+    # A shorter lived token is never answered with a longer lived one
+    assert cache.get(user_id, 5).access_token == "token-4"
+    assert len(minter.calls) == 4
+
+
+def test_concurrent_callers_share_one_mint():
+    release = threading.Event()
+    minter = FakeMinter(release)
+    cache = AccessTokenCache(minter)
+    user_id = random_user_id()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(cache.get, user_id, 60) for _ in range(8)]
+        time.sleep(0.05)
+        release.set()
+        tokens = {future.result().access_token for future in futures}
+
+    assert tokens == {"token-1"}
+    assert len(minter.calls) == 1
+
+
+def test_tokens_are_refreshed_ahead_of_expiry_in_the_background():
+    minter = FakeMinter()
+    executor = ThreadPoolExecutor(max_workers=1)
+    cache = AccessTokenCache(minter, executor=executor)
+    user_id = random_user_id()
+
+    cache.get(user_id, 60)
+    entry = cache._entries[(user_id, None, 60)]
+    entry.refresh_at = time.time() - 1
+
+    # The old token is still handed out while the new one is minted
+    assert cache.get(user_id, 60).access_token == "token-1"
+    executor.shutdown(wait=True)
+    assert cache.get(user_id, 60).access_token == "token-2"
+
+    cache._entries[(user_id, None, 60)].expires_at = time.time() + 1
+    assert cache.get(user_id, 60).access_token == "token-3"
+
+
+def test_revoked_users_get_new_tokens():
+    minter = FakeMinter()
+    cache = AccessTokenCache(minter)
+    user_id = random_user_id()
+
+    cache.get(user_id, 60)
+    cache.revoke_user_sessions(user_id)
+    assert cache.get(user_id, 60).access_token == "token-2"
+
+
+def test_flask_auth_reuses_tokens_only_when_asked(auth):
+    user_id = random_user_id()
+    with requests_mock.Mocker() as m:
+        m.post(BACKEND_API_BASE_URL + "/api/backend/v1/access_token", json={"access_token": "minted"})
+        for _ in range(3):
+            assert auth.create_access_token(user_id, 10, reuse_cached=True).access_token == "minted"
+        assert m.call_count == 1
+
+        auth.create_access_token(user_id, 10)
+        assert m.call_count == 2
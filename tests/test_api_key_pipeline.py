@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+
+import pytest
+from propelauth_py.errors import EndUserApiKeyNotFoundException
+from propelauth_py.types.end_user_api_keys import ApiKeyFull, ApiKeyNew, ImportedApiKeyNew
+
+from propelauth_flask import apply_api_key_specs
+from propelauth_flask._pipeline import JsonlWriter
+from propelauth_flask.api_key_pipeline import apply_api_key_spec
+
+
+class FakeApiKeyBackend:
+    def __init__(self):
+        self.keys = {"old-1": ApiKeyFull("old-1", 0, None, {"team": "a"}, None, "org-1")}
+        self.calls = []
+        self.fail_deletes = 0
+        self._lock = threading.Lock()
+
+    def _new_key_id(self):
+        return "key-{}".format(len(self.keys) + 1)
+
+    def import_api_key(self, api_key_token, org_id, user_id, expires_at_seconds, metadata):
+        with self._lock:
+            self.calls.append(("import", api_key_token))
+            key_id = self._new_key_id()
+            self.keys[key_id] = ApiKeyFull(key_id, 0, expires_at_seconds, metadata, user_id, org_id)
+            return ImportedApiKeyNew(key_id)
+
+    def create_api_key(self, org_id, user_id, expires_at_seconds, metadata):
+        with self._lock:
+            self.calls.append(("create", org_id, user_id, metadata))
+            key_id = self._new_key_id()
+            self.keys[key_id] = ApiKeyFull(key_id, 0, expires_at_seconds, metadata, user_id, org_id)
+            return ApiKeyNew(key_id, "token-for-" + key_id)
+
+    def fetch_api_key(self, api_key_id):
+        return self.keys[api_key_id]
+
+    def update_api_key(self, api_key_id, expires_at_seconds=None, metadata=None, set_to_never_expire=None):
+        with self._lock:
+            self.calls.append(("update", api_key_id, expires_at_seconds, set_to_never_expire))
+        return True
+
+    def delete_api_key(self, api_key_id):
+        with self._lock:
+            self.calls.append(("delete", api_key_id))
+            if api_key_id not in self.keys:
+                raise EndUserApiKeyNotFoundException()
+            if self.fail_deletes:
+                self.fail_deletes -= 1
+                raise RuntimeError("Unknown error when deleting end user api key")
+            del self.keys[api_key_id]
+        return True
+
+
+def test_applies_specs_and_streams_out_a_mapping(tmp_path):
+    specs = tmp_path / "specs.csv"
+    specs.write_text(
+        "action,api_key_token,api_key_id,org_id,set_to_never_expire,metadata\n"
+        "import,legacy-token,,org-2,,\n"
+        "import,legacy-token,,org-2,,\n"
+        "rotate,,old-1,,,\n"
+        "update,,key-2,,true,\n"
+        "create,,,org-3,,\"{\"\"team\"\": \"\"b\"\"}\"\n"
+    )
+    mapping = str(tmp_path / "mapping.jsonl")
+    backend = FakeApiKeyBackend()
+
+    result = apply_api_key_specs(backend, str(specs), mapping_path=mapping, concurrency=1)
+
+    assert (result.succeeded, result.failed, result.duplicates) == (4, 0, 1)
+    assert ("create", "org-1", None, {"team": "a"}) in backend.calls
+    assert ("delete", "old-1") in backend.calls
+    assert ("update", "key-2", None, True) in backend.calls
+    assert os.stat(mapping).st_mode & 0o777 == 0o600
+    with open(mapping) as f:
+        lines = {line["action"]: line for line in map(json.loads, f)}
+    assert lines["rotate_started"]["new_api_key_id"] == lines["rotate"]["new_api_key_id"]
+    assert lines["import"] == {"record_number": 1, "action": "import", "old_api_key_token": "legacy-token", "new_api_key_id": "key-2"}
+    assert lines["rotate"]["old_api_key_id"] == "old-1"
+    assert lines["rotate"]["new_api_key_token"] == "token-for-" + lines["rotate"]["new_api_key_id"]
+    assert lines["create"]["new_api_key_id"] in backend.keys
+    assert "update" not in lines
+
+
+def test_specs_missing_their_key_are_each_reported(tmp_path):
+    specs = tmp_path / "specs.jsonl"
+    specs.write_text('{"action": "delete"}\n{"action": "delete"}\n{"action": "rotate"}\n')
+
+    result = apply_api_key_specs(FakeApiKeyBackend(), str(specs), max_attempts=1)
+
+    assert (result.failed, result.duplicates) == (3, 0)
+
+
+def test_retried_rotations_reuse_the_new_key():
+    backend = FakeApiKeyBackend()
+    backend.fail_deletes = 1
+    rotated_keys = {}
+    spec = {"action": "rotate", "api_key_id": "old-1", "old_key_grace_seconds": None}
+
+    with pytest.raises(RuntimeError):
+        apply_api_key_spec(backend, spec, rotated_keys)
+    new_key = apply_api_key_spec(backend, spec, rotated_keys)
+
+    assert [call[0] for call in backend.calls] == ["create", "delete", "delete"]
+    assert set(backend.keys) == {new_key.api_key_id}
+    assert rotated_keys == {}
+
+
+def test_rotations_can_leave_the_old_key_working_for_a_while():
+    backend = FakeApiKeyBackend()
+    apply_api_key_spec(backend, {"action": "rotate", "api_key_id": "old-1", "org_id": "org-9", "old_key_grace_seconds": 3600})
+
+    assert backend.calls[0] == ("create", "org-9", None, None)
+    assert backend.calls[1][:2] == ("update", "old-1")
+    assert "old-1" in backend.keys
+
+
+def test_only_creates_with_the_same_idempotency_key_are_deduplicated(tmp_path):
+    specs = tmp_path / "specs.jsonl"
+    specs.write_text(
+        '{"action": "create", "org_id": "org-1"}\n'
+        '{"action": "create", "org_id": "org-1"}\n'
+        '{"action": "create", "org_id": "org-2", "idempotency_key": "team-b"}\n'
+        '{"action": "create", "org_id": "org-2", "idempotency_key": "team-b"}\n'
+    )
+    backend = FakeApiKeyBackend()
+
+    result = apply_api_key_specs(backend, str(specs), concurrency=1)
+
+    assert (result.succeeded, result.duplicates) == (3, 1)
+    assert [call[1] for call in backend.calls] == ["org-1", "org-1", "org-2"]
+
+
+def test_interrupted_rotations_resume_with_the_new_key(tmp_path):
+    specs = tmp_path / "specs.jsonl"
+    specs.write_text('{"action": "rotate", "api_key_id": "old-1"}\n')
+    mapping = str(tmp_path / "mapping.jsonl")
+    backend = FakeApiKeyBackend()
+    backend.fail_deletes = 1
+
+    # The process stops after the first attempt, so only what reached the mapping file is left
+    rotation_journal = JsonlWriter(mapping)
+    with pytest.raises(RuntimeError):
+        apply_api_key_spec(backend, {"action": "rotate", "api_key_id": "old-1"}, {}, rotation_journal)
+    rotation_journal.close()
+    with open(mapping) as f:
+        (started,) = map(json.loads, f)
+    assert started["action"] == "rotate_started"
+    assert started["new_api_key_id"] in backend.keys
+
+    result = apply_api_key_specs(backend, str(specs), mapping_path=mapping, concurrency=1)
+
+    assert result.succeeded == 1
+    assert [call[0] for call in backend.calls] == ["create", "delete", "delete"]
+    assert set(backend.keys) == {started["new_api_key_id"]}
+    with open(mapping) as f:
+        finished = [line for line in map(json.loads, f) if line["action"] == "rotate"]
+    assert finished[0]["new_api_key_token"] == started["new_api_key_token"]
+
+
+def test_resumed_rotations_whose_old_key_is_already_gone_succeed():
+    backend = FakeApiKeyBackend()
+    new_key = backend.create_api_key("org-1", None, None, None)
+    del backend.keys["old-1"]
+    rotated_keys = {"old-1": new_key}
+
+    assert apply_api_key_spec(backend, {"action": "rotate", "api_key_id": "old-1"}, rotated_keys) is new_key
+    assert rotated_keys == {}
+    with pytest.raises(EndUserApiKeyNotFoundException):
+        apply_api_key_spec(backend, {"action": "rotate", "api_key_id": "old-1", "org_id": "org-1"})
@@ -0,0 +1,147 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from propelauth_flask import init_auth_async, current_user, current_org, LocalTokenCache
+from tests.auth_helpers import create_access_token, orgs_to_org_id_map, random_org, random_user_id
+from tests.conftest import BASE_AUTH_URL, mock_api_and_init_auth
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1, thread_name_prefix="verification")
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.fixture(scope='function')
+def executor():
+    executor = RecordingExecutor()
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture(scope='function')
+def async_auth(rsa_keys, executor):
+    return mock_api_and_init_auth(BASE_AUTH_URL, 200, {
+        "verifier_key_pem": rsa_keys.public_pem
+    }, init=init_auth_async, token_verification_executor=executor)
+
+
+def test_async_view_verifies_in_executor(app, async_auth, client, rsa_keys, executor):
+    @app.route("/async_require_user")
+    @async_auth.require_user
+    async def route():
+        return current_user.user_id
+
+    user_id = random_user_id()
+    access_token = create_access_token({"user_id": user_id}, rsa_keys.private_pem)
+    response = client.get("/async_require_user", headers={"Authorization": "Bearer " + access_token})
+    assert response.status_code == 200
+    assert response.data.decode("utf-8") == user_id
+    assert executor.submitted == 1
+
+
+def test_async_view_without_header_is_rejected_inline(app, async_auth, client, executor):
+    @app.route("/async_require_user")
+    @async_auth.require_user
+    async def route():
+        return current_user.user_id
+
+    response = client.get("/async_require_user")
+    assert response.status_code == 401
+    assert executor.submitted == 0
+
+
+def test_async_org_view_verifies_in_executor(app, async_auth, client, rsa_keys, executor):
+    user_id = random_user_id()
+    org = random_org("Admin", ["read"])
+
+    @app.route("/async_org/<org_id>")
+    @async_auth.require_org_member_with_permission("read")
+    async def route(org_id):
+        assert current_org.org_id == org_id
+        return current_user.user_id
+
+    access_token = create_access_token({
+        "user_id": user_id,
+        "org_id_to_org_member_info": orgs_to_org_id_map([org]),
+    }, rsa_keys.private_pem)
+    response = client.get("/async_org/" + org["org_id"], headers={"Authorization": "Bearer " + access_token})
+    assert response.status_code == 200
+    assert executor.submitted == 1
+
+    response = client.get("/async_org/" + random_org("Admin")["org_id"], headers={"Authorization": "Bearer " + access_token})
+    assert response.status_code == 403
+
+
+def test_sync_view_verifies_inline(app, async_auth, client, rsa_keys, executor):
+    @app.route("/sync_require_user")
+    @async_auth.require_user
+    def route():
+        return "ok"
+
+    access_token = create_access_token({"user_id": random_user_id()}, rsa_keys.private_pem)
+    response = client.get("/sync_require_user", headers={"Authorization": "Bearer " + access_token})
+    assert response.status_code == 200
+    assert executor.submitted == 0
+
+
+def test_async_view_with_sync_auth(app, auth, client, rsa_keys):
+    @app.route("/async_with_sync_auth")
+    @auth.require_user
+    async def route():
+        return current_user.user_id
+
+    user_id = random_user_id()
+    access_token = create_access_token({"user_id": user_id}, rsa_keys.private_pem)
+    response = client.get("/async_with_sync_auth", headers={"Authorization": "Bearer " + access_token})
+    assert response.status_code == 200
+    assert response.data.decode("utf-8") == user_id
+
+
+def test_async_view_skips_executor_on_cache_hit(app, client, rsa_keys, executor):
+    async_auth = mock_api_and_init_auth(BASE_AUTH_URL, 200, {
+        "verifier_key_pem": rsa_keys.public_pem
+    }, init=init_auth_async, token_verification_executor=executor, token_cache=LocalTokenCache())
+
+    @app.route("/async_require_user")
+    @async_auth.require_user
+    async def route():
+        return current_user.user_id
+
+    access_token = create_access_token({"user_id": random_user_id()}, rsa_keys.private_pem)
+    for _ in range(3):
+        response = client.get("/async_require_user", headers={"Authorization": "Bearer " + access_token})
+        assert response.status_code == 200
+    assert executor.submitted == 1
+
+
+def test_async_step_up_awaits_grant_verification(app, async_auth, client, rsa_keys, executor):
+    verified = []
+
+    async def verify_step_up_grant(action_type, user_id, grant):
+        verified.append((action_type, user_id, grant))
+        return grant == "good"
+
+    async_auth.verify_step_up_grant = verify_step_up_grant
+
+    @app.route("/async_step_up")
+    @async_auth.require_step_up("export")
+    async def route():
+        return current_user.user_id
+
+    user_id = random_user_id()
+    access_token = create_access_token({"user_id": user_id}, rsa_keys.private_pem)
+    for grant, status_code in [("good", 200), ("bad", 403)]:
+        response = client.get("/async_step_up", headers={
+            "Authorization": "Bearer " + access_token,
+            "X-Step-Up-Grant": grant,
+        })
+        assert response.status_code == status_code
+
+    assert verified == [("export", user_id, "good"), ("export", user_id, "bad")]
+    assert executor.submitted == 2
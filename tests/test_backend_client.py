@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+import pytest
+import requests_mock
+from propelauth_py.api import BACKEND_API_BASE_URL
+
+from propelauth_flask.backend_client import _BackendClient, _SingleFlight
+from tests.conftest import BASE_AUTH_URL, mock_api_and_init_auth
+
+
+class SlowAuth:
+    token_verification_metadata = "metadata"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def fetch_org(self, org_id):
+        with self._lock:
+            self.calls.append(("fetch_org", org_id))
+        time.sleep(0.1)
+        if self.fail:
+            raise RuntimeError("backend unavailable")
+        return {"org_id": org_id}
+
+    def update_org_metadata(self, org_id, name=None):
+        with self._lock:
+            self.calls.append(("update_org_metadata", org_id))
+        time.sleep(0.1)
+        return True
+
+
+class SlowAsyncAuth:
+    def __init__(self):
+        self.calls = []
+
+    async def fetch_users_in_org(self, org_id, page_size=10, page_number=0):
+        self.calls.append((org_id, page_size, page_number))
+        await asyncio.sleep(0.1)
+        return {"org_id": org_id, "page_number": page_number}
+
+
+def call_concurrently(fn, arg_lists):
+    with ThreadPoolExecutor(max_workers=len(arg_lists)) as pool:
+        return [future.result() for future in [pool.submit(fn, *args) for args in arg_lists]]
+
+
+def test_identical_concurrent_reads_share_one_call():
+    auth = SlowAuth()
+    client = _BackendClient(auth, [_SingleFlight()])
+
+    results = call_concurrently(client.fetch_org, [("org",)] * 8 + [("other_org",)] * 4)
+
+    assert sorted(auth.calls) == [("fetch_org", "org"), ("fetch_org", "other_org")]
+    # Each caller gets a result of its own to change
+    assert results[0] == results[7] and results[0] is not results[7]
+    assert client.token_verification_metadata == "metadata"
+
+    # Nothing is remembered once the call is done
+    client.fetch_org("org")
+    assert len(auth.calls) == 3
+
+
+def test_writes_are_not_deduplicated():
+    auth = SlowAuth()
+    client = _BackendClient(auth, [_SingleFlight()])
+
+    call_concurrently(client.update_org_metadata, [("org",)] * 4)
+    assert len(auth.calls) == 4
+
+
+def test_errors_are_shared():
+    auth = SlowAuth(fail=True)
+    client = _BackendClient(auth, [_SingleFlight()])
+
+    with pytest.raises(RuntimeError):
+        call_concurrently(client.fetch_org, [("org",)] * 4)
+    assert len(auth.calls) == 1
+
+
+def test_identical_async_reads_share_one_call():
+    auth = SlowAsyncAuth()
+    client = _BackendClient(auth, [_SingleFlight()])
+
+    async def main():
+        return await asyncio.gather(
+            *[client.fetch_users_in_org("org", page_number=0) for _ in range(5)],
+            client.fetch_users_in_org("org", page_number=1),
+        )
+
+    results = asyncio.run(main())
+
+    assert len(auth.calls) == 2
+    assert results[0] == results[4] and results[0] is not results[4]
+    assert results[5]["page_number"] == 1
+
+
+def test_cancelling_the_leader_doesnt_cancel_the_callers_that_joined_it():
+    auth = SlowAsyncAuth()
+    client = _BackendClient(auth, [_SingleFlight()])
+
+    async def main():
+        leader = asyncio.ensure_future(client.fetch_users_in_org("org"))
+        await asyncio.sleep(0.01)
+        followers = asyncio.gather(*[client.fetch_users_in_org("org") for _ in range(3)])
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await followers
+
+    results = asyncio.run(main())
+
+    assert [result["org_id"] for result in results] == ["org"] * 3
+    # One of the followers made the request again
+    assert len(auth.calls) == 2
+
+
+def test_flask_auth_deduplicates_reads_if_asked_to(rsa_keys):
+    auth = mock_api_and_init_auth(
+        BASE_AUTH_URL, 200, {"verifier_key_pem": rsa_keys.public_pem}, deduplicate_reads=True
+    )
+    org_id = str(uuid4())
+
+    def slow_response(request, context):
+        time.sleep(0.1)
+        return {"org_id": org_id, "name": "org"}
+
+    with requests_mock.Mocker() as m:
+        m.get(BACKEND_API_BASE_URL + "/api/backend/v1/org/" + org_id, json=slow_response)
+        orgs = call_concurrently(auth.fetch_org, [(org_id,)] * 6)
+
+    assert m.call_count == 1
+    assert {org.name for org in orgs} == {"org"}
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from propelauth_flask import BackgroundLoop, DeadlineExceeded, FlaskAuthAsync, deadline, remaining_seconds
+
+
+async def sleep_and_return(value, seconds=0.1):
+    await asyncio.sleep(seconds)
+    return value, asyncio.get_running_loop()
+
+
+def test_gather_runs_calls_concurrently_on_one_long_lived_loop(app, client, auth):
+    @app.route("/gather")
+    def route():
+        started_at = time.monotonic()
+        results = auth.gather(*[sleep_and_return(i) for i in range(5)])
+        assert [value for value, _ in results] == list(range(5))
+        assert len({loop for _, loop in results}) == 1
+        assert time.monotonic() - started_at < 0.3
+        return str(id(results[0][1]))
+
+    first, second = client.get("/gather").data, client.get("/gather").data
+    assert first == second
+    assert auth.background_loop.loop.is_running()
+
+
+def test_gather_raises_the_first_error_unless_asked_not_to():
+    background_loop = BackgroundLoop()
+
+    async def fail():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        background_loop.gather(sleep_and_return(1), fail())
+
+    results = background_loop.gather(sleep_and_return(1), fail(), return_exceptions=True)
+    assert isinstance(results[1], ValueError)
+    background_loop.close()
+
+
+def test_calls_run_under_the_callers_deadline():
+    background_loop = BackgroundLoop()
+
+    async def remaining():
+        return remaining_seconds()
+
+    with deadline(1):
+        assert 0 < background_loop.run(remaining()) <= 1
+        with pytest.raises(DeadlineExceeded):
+            with deadline(0.05):
+                background_loop.run(sleep_and_return(1, seconds=1))
+    background_loop.close()
+
+
+def test_async_auth_is_built_once_with_the_same_settings(auth):
+    async_auth = auth.async_auth
+
+    assert isinstance(async_auth, FlaskAuthAsync)
+    assert async_auth is auth.async_auth
+    assert async_auth.revocation_list is auth.revocation_list
+    assert async_auth.auth.token_verification_metadata is auth.auth.token_verification_metadata
+
+
+def test_async_auth_is_rebuilt_in_a_forked_child(auth, monkeypatch):
+    async_auth = auth.async_auth
+    monkeypatch.setattr("os.getpid", lambda: -1)
+
+    assert auth.async_auth is not async_auth
+    assert auth.async_auth.auth.token_verification_metadata is auth.auth.token_verification_metadata
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import os
+from uuid import uuid4
+
+import pytest
+import requests_mock
+from propelauth_py.api import BACKEND_API_BASE_URL
+
+from propelauth_flask import BlockingCallError
+
+ORG_URL = BACKEND_API_BASE_URL + "/api/backend/v1/org/"
+
+
+def test_warns_once_about_blocking_calls_from_async_views(app, auth, client, caplog):
+    auth.detect_blocking_calls()
+    org_id = str(uuid4())
+
+    @app.route("/org")
+    async def async_view():
+        return auth.fetch_org(org_id).name
+
+    @app.route("/sync_org")
+    def sync_view():
+        return auth.fetch_org(org_id).name
+
+    with requests_mock.Mocker() as m, caplog.at_level(logging.WARNING, logger="propelauth"):
+        m.get(ORG_URL + org_id, json={"org_id": org_id, "name": "org"})
+        for path in ("/org", "/org", "/sync_org"):
+            assert client.get(path).data == b"org"
+
+    [warning] = caplog.records
+    message = warning.getMessage()
+    assert message.startswith("FlaskAuth.fetch_org was called at {}:".format(__file__))
+    assert "await auth.nonblocking.fetch_org(...)" in message
+    assert "in async_view" in message
+
+
+def test_can_raise_instead(auth):
+    auth.detect_blocking_calls(raise_error=True)
+
+    async def view():
+        auth.fetch_org(str(uuid4()))
+
+    with pytest.raises(BlockingCallError):
+        asyncio.run(view())
+
+
+def test_nonblocking_methods_run_on_the_background_loop(auth):
+    class FakeAsyncAuth:
+        debug_mode = False
+
+        async def fetch_org(self, org_id):
+            await asyncio.sleep(0.05)
+            return org_id, asyncio.get_running_loop()
+
+    auth._async_auth = FakeAsyncAuth()
+    auth._async_auth_pid = os.getpid()
+
+    async def view():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        org_id, loop = await auth.nonblocking.fetch_org("org")
+        ticker.cancel()
+        return org_id, loop, ticks
+
+    org_id, loop, ticks = asyncio.run(view())
+    assert org_id == "org"
+    assert loop is auth.background_loop.loop
+    # The caller's loop kept running while the call waited
+    assert ticks > 2
+    with pytest.raises(AttributeError):
+        auth.nonblocking.debug_mode
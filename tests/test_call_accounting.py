@@ -0,0 +1,56 @@
+import logging
+from uuid import uuid4
+
+import requests_mock
+from flask import g
+from propelauth_py.api import BACKEND_API_BASE_URL
+
+USER_URL = BACKEND_API_BASE_URL + "/api/backend/v1/user/"
+
+
+def mock_users(m, user_ids):
+    for user_id in user_ids:
+        m.get(USER_URL + user_id, json={"user_id": user_id, "email": user_id + "@example.com"})
+
+
+def test_warns_once_about_a_request_that_calls_the_backend_in_a_loop(app, auth, client, caplog):
+    auth.enable_call_accounting(app, max_calls=3)
+    user_ids = [str(uuid4()) for _ in range(5)]
+
+    @app.route("/users")
+    def list_users():
+        emails = [auth.fetch_user_metadata_by_user_id(user_id).email for user_id in user_ids]
+        assert g.propelauth_backend_calls.count == 5
+        return ",".join(emails)
+
+    with requests_mock.Mocker() as m, caplog.at_level(logging.WARNING, logger="propelauth"):
+        mock_users(m, user_ids)
+        response = client.get("/users")
+
+    assert response.status_code == 200
+    assert response.headers["X-PropelAuth-Backend-Calls"].startswith("count=5, duration_ms=")
+    [warning] = caplog.records
+    message = warning.getMessage()
+    assert "GET /users made 4 PropelAuth backend calls" in message
+    assert "fetch_user_metadata_by_user_id x4" in message
+    # The stack points at the view, not at the library
+    assert "in list_users" in message and "propelauth_flask" not in message
+
+
+def test_counts_each_request_separately(app, auth, client, caplog):
+    auth.enable_call_accounting(app, max_calls=3)
+    user_id = str(uuid4())
+
+    @app.route("/user")
+    def get_user():
+        return auth.fetch_user_metadata_by_user_id(user_id).email
+
+    with requests_mock.Mocker() as m, caplog.at_level(logging.WARNING, logger="propelauth"):
+        mock_users(m, [user_id])
+        for _ in range(5):
+            response = client.get("/user")
+            assert response.headers["X-PropelAuth-Backend-Calls"].startswith("count=1,")
+        # Calls outside of a request aren't counted
+        auth.fetch_user_metadata_by_user_id(user_id)
+
+    assert caplog.records == []
@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+import pytest
+
+from propelauth_flask import CircuitBreaker, CircuitBreakerSettings, CircuitOpenError
+from propelauth_flask.backend_client import _BackendClient
+from propelauth_flask.circuit_breaker import _FAILED, _SUCCEEDED, CLOSED, HALF_OPEN, OPEN, _Circuit
+
+
+class FlakyAuth:
+    def __init__(self):
+        self.error = None
+        self.delay = 0
+        self.calls = 0
+
+    def fetch_org(self, org_id):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {"org_id": org_id, "call": self.calls}
+
+    def update_org_metadata(self, org_id, name=None):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return True
+
+    def validate_api_key(self, api_key_token):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return {"api_key_token": api_key_token}
+
+
+class FlakyAsyncAuth(FlakyAuth):
+    async def fetch_org(self, org_id):
+        return super().fetch_org(org_id)
+
+
+SETTINGS = CircuitBreakerSettings(window_size=4, minimum_calls=4, failure_rate_threshold=0.5, open_seconds=0.2)
+
+
+def make_client(**kwargs):
+    auth = FlakyAuth()
+    breaker = CircuitBreaker(default_settings=SETTINGS, **kwargs)
+    return auth, breaker, _BackendClient(auth, [breaker])
+
+
+def fail_calls(client, auth, count, error=None, call=None):
+    auth.error = error or RuntimeError("Unknown error when fetching org")
+    for _ in range(count):
+        with pytest.raises(type(auth.error)):
+            (call or client.fetch_org)("org")
+    auth.error = None
+
+
+def test_circuit_opens_fails_fast_and_recovers_after_a_probe():
+    auth, breaker, client = make_client()
+    client.fetch_org("org")
+    client.fetch_org("org")
+    fail_calls(client, auth, 2)
+    assert breaker.state("fetch_org") == OPEN
+
+    calls = auth.calls
+    with pytest.raises(CircuitOpenError):
+        client.fetch_org("org")
+    assert auth.calls == calls
+    # Other endpoints have their own circuits
+    assert client.update_org_metadata("org")
+
+    time.sleep(0.25)
+    assert breaker.state("fetch_org") == HALF_OPEN
+    client.fetch_org("org")
+    assert breaker.state("fetch_org") == CLOSED
+
+
+def test_failed_probe_reopens_the_circuit():
+    auth, breaker, client = make_client()
+    fail_calls(client, auth, 4)
+    time.sleep(0.25)
+
+    fail_calls(client, auth, 1)
+    assert breaker.state("fetch_org") == OPEN
+
+
+def test_only_backend_successes_close_the_circuit():
+    auth, breaker, client = make_client()
+    fail_calls(client, auth, 4)
+    time.sleep(0.25)
+
+    # Probes that the caller gave up on or got wrong say nothing about the backend, and another one takes their place
+    fail_calls(client, auth, 1, error=ValueError("Bad request"))
+    fail_calls(client, auth, 1, error=asyncio.CancelledError())
+    assert breaker.state("fetch_org") == HALF_OPEN
+    client.fetch_org("org")
+    assert breaker.state("fetch_org") == CLOSED
+
+
+def test_calls_from_before_the_circuit_opened_arent_probes():
+    circuit = _Circuit(SETTINGS)
+    _, earlier_call = circuit.try_acquire(0)
+    for _ in range(4):
+        circuit.record(_FAILED, None, 0)
+    allowed, probe = circuit.try_acquire(1)
+    assert allowed and probe is not None
+
+    circuit.record(_SUCCEEDED, earlier_call, 1)
+    assert (circuit.state, circuit.probes_in_flight) == (HALF_OPEN, 1)
+    assert circuit.try_acquire(1) == (False, None)
+    circuit.record(_SUCCEEDED, probe, 1)
+    assert circuit.state == CLOSED
+
+
+def test_caller_errors_dont_count_but_slow_calls_do():
+    auth, breaker, client = make_client(
+        endpoint_settings={"fetch_org": CircuitBreakerSettings(window_size=2, minimum_calls=2, slow_call_seconds=0.01)}
+    )
+    fail_calls(client, auth, 4, error=ValueError("Bad request"))
+    assert breaker.state("fetch_org") == CLOSED
+
+    auth.delay = 0.02
+    client.fetch_org("org")
+    assert breaker.state("fetch_org") == OPEN
+
+
+def test_open_circuit_serves_stale_reads():
+    auth, breaker, client = make_client(serve_stale=True)
+    last_good = client.fetch_org("org")
+    fail_calls(client, auth, 3)
+
+    stale = client.fetch_org("org")
+    assert stale == last_good and stale is not last_good
+    with pytest.raises(CircuitOpenError):
+        client.fetch_org("other_org")
+
+
+def test_stale_reads_expire_and_api_key_validation_is_never_stale():
+    auth, breaker, client = make_client(serve_stale=True, max_stale_seconds=0.05)
+    client.fetch_org("org")
+    client.validate_api_key("token")
+    fail_calls(client, auth, 3)
+    fail_calls(client, auth, 3, call=client.validate_api_key)
+
+    assert client.fetch_org("org")
+    with pytest.raises(CircuitOpenError):
+        client.validate_api_key("token")
+    time.sleep(0.06)
+    with pytest.raises(CircuitOpenError):
+        client.fetch_org("org")
+
+
+def test_async_calls():
+    auth = FlakyAsyncAuth()
+    breaker = CircuitBreaker(default_settings=SETTINGS, serve_stale=True)
+    client = _BackendClient(auth, [breaker])
+
+    async def main():
+        good = await client.fetch_org("org")
+        auth.error = RuntimeError("Unknown error when fetching org")
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await client.fetch_org("org")
+        return good, await client.fetch_org("org")
+
+    good, stale = asyncio.run(main())
+    assert breaker.state("fetch_org") == OPEN
+    assert stale == good
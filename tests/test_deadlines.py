@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+import httpx
+import pytest
+import requests_mock
+from propelauth_py.api import BACKEND_API_BASE_URL
+
+from propelauth_flask import DeadlineExceeded, deadline, init_auth_async, remaining_seconds
+from propelauth_flask.deadlines import _Deadlines
+from tests.conftest import BASE_AUTH_URL, mock_api_and_init_auth
+
+ORG_URL = BACKEND_API_BASE_URL + "/api/backend/v1/org/"
+
+
+def init_async_auth(rsa_keys, handler):
+    httpx_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return mock_api_and_init_auth(
+        BASE_AUTH_URL, 200, {"verifier_key_pem": rsa_keys.public_pem},
+        init=init_auth_async, httpx_client=httpx_client,
+    )
+
+
+def test_sync_calls_give_up_at_the_deadline(auth):
+    org_id = str(uuid4())
+
+    def slow_response(request, context):
+        time.sleep(0.3)
+        return {"org_id": org_id, "name": "org"}
+
+    with requests_mock.Mocker() as m:
+        m.get(ORG_URL + org_id, json=slow_response)
+        started_at = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            with deadline(0.05):
+                auth.fetch_org(org_id)
+        assert time.monotonic() - started_at < 0.25
+
+        # Without a deadline, calls stay on the calling thread and wait as long as they take
+        assert auth.fetch_org(org_id).name == "org"
+
+
+def test_sync_calls_fail_fast_while_abandoned_calls_hold_every_worker():
+    release = threading.Event()
+    deadlines = _Deadlines(max_workers=1)
+    call = SimpleNamespace(method_name="fetch_org")
+
+    with deadline(0.05):
+        with pytest.raises(DeadlineExceeded):
+            deadlines.intercept(call, release.wait)
+        started_at = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            deadlines.intercept(call, lambda: "never called")
+        assert time.monotonic() - started_at < 0.01
+
+    release.set()
+    for _ in range(100):
+        if deadlines._slots.acquire(blocking=False):
+            deadlines._slots.release()
+            break
+        time.sleep(0.01)
+    with deadline(1):
+        assert deadlines.intercept(call, lambda: "done") == "done"
+
+
+def test_async_calls_pass_the_deadline_to_httpx(rsa_keys):
+    timeouts = []
+
+    async def handler(request):
+        timeouts.append(request.extensions["timeout"]["read"])
+        if len(timeouts) > 1:
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={"org_id": "org", "name": "org"})
+
+    auth = init_async_auth(rsa_keys, handler)
+
+    async def main():
+        with deadline(0.5):
+            await auth.fetch_org(str(uuid4()))
+        with deadline(0.05):
+            await auth.fetch_org(str(uuid4()))
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+    assert 0.4 < timeouts[0] <= 0.5
+    assert timeouts[1] <= 0.05
+
+
+def test_nested_deadlines_only_shorten(app, client):
+    @app.route("/deadline")
+    @deadline(1)
+    def route():
+        with deadline(5):
+            return str(remaining_seconds())
+
+    assert remaining_seconds() is None
+    assert float(client.get("/deadline").data) <= 1
+
+
+def test_one_deadline_can_be_entered_by_several_threads_at_once():
+    shared = deadline(1)
+    entered = threading.Barrier(2)
+    seen = []
+
+    def run(seconds):
+        with shared:
+            entered.wait()
+            with deadline(seconds):
+                time.sleep(seconds / 10)
+            seen.append(remaining_seconds() is not None)
+            entered.wait()
+        seen.append(remaining_seconds())
+
+    threads = [threading.Thread(target=run, args=(seconds,)) for seconds in (0.1, 0.2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen == [True, True, None, None]
@@ -0,0 +1,156 @@
+import re
+import threading
+import time
+
+import requests_mock
+
+from propelauth_flask import DispatchQueue
+from tests.auth_helpers import random_user_id
+
+
+class RecordingBackend:
+    def __init__(self, failures=0, error=RuntimeError("Unknown error when updating user metadata")):
+        self.failures = failures
+        self.error = error
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _record(self, method, **kwargs):
+        with self._lock:
+            self.calls.append((method, kwargs))
+            if self.failures > 0:
+                self.failures -= 1
+                raise self.error
+        return True
+
+    def resend_email_confirmation(self, user_id):
+        return self._record("resend_email_confirmation", user_id=user_id)
+
+    def logout_all_user_sessions(self, user_id):
+        return self._record("logout_all_user_sessions", user_id=user_id)
+
+    def update_user_metadata(self, user_id, **kwargs):
+        return self._record("update_user_metadata", user_id=user_id, **kwargs)
+
+
+def test_compatible_calls_are_merged_and_made_in_order():
+    backend = RecordingBackend()
+    queue = DispatchQueue(backend)
+    user_id = random_user_id()
+
+    for _ in range(3):
+        queue.resend_email_confirmation(user_id)
+    queue.update_user_metadata(user_id, first_name="Ada")
+    queue.update_user_metadata(user_id, last_name="Lovelace", metadata={"a": 1})
+    # Can't tell whether the backend merges metadata, so this one stays separate
+    queue.update_user_metadata(user_id, metadata={"b": 2})
+    assert len(queue) == 3
+
+    queue.start()
+    assert queue.flush(timeout=5)
+    queue.close()
+
+    assert backend.calls == [
+        ("resend_email_confirmation", {"user_id": user_id}),
+        ("update_user_metadata", {"user_id": user_id, "first_name": "Ada", "last_name": "Lovelace", "metadata": {"a": 1}}),
+        ("update_user_metadata", {"user_id": user_id, "metadata": {"b": 2}}),
+    ]
+
+
+def test_queued_calls_survive_a_restart(tmp_path):
+    path = str(tmp_path / "mutations.db")
+    user_ids = [random_user_id() for _ in range(10)]
+    queue = DispatchQueue(RecordingBackend(), path)
+    for user_id in user_ids:
+        queue.logout_all_user_sessions(user_id)
+    queue.close()
+
+    backend = RecordingBackend()
+    queue = DispatchQueue(backend, path, concurrency=3).start()
+    assert queue.flush(timeout=5)
+    queue.close()
+
+    assert sorted(kwargs["user_id"] for _, kwargs in backend.calls) == sorted(user_ids)
+
+
+def test_queues_sharing_a_file_make_each_call_once_and_in_order(tmp_path):
+    path = str(tmp_path / "mutations.db")
+
+    class SlowBackend(RecordingBackend):
+        def _record(self, method, **kwargs):
+            time.sleep(0.01)
+            return super()._record(method, **kwargs)
+
+    backend = SlowBackend()
+    first = DispatchQueue(backend, path, concurrency=4).start()
+    user_ids = [random_user_id() for _ in range(10)]
+    for user_id in user_ids:
+        first.logout_all_user_sessions(user_id)
+        first.update_user_metadata(user_id, metadata={"step": 1})
+        first.update_user_metadata(user_id, metadata={"step": 2})
+
+    # Opening another queue on the file (like another worker starting) doesn't release calls being made
+    second = DispatchQueue(backend, path, concurrency=4).start()
+    assert first.flush(timeout=10) and second.flush(timeout=10)
+    first.close()
+    second.close()
+
+    assert len(backend.calls) == 30
+    for user_id in user_ids:
+        assert [(method, kwargs.get("metadata")) for method, kwargs in backend.calls if kwargs["user_id"] == user_id] == [
+            ("logout_all_user_sessions", None),
+            ("update_user_metadata", {"step": 1}),
+            ("update_user_metadata", {"step": 2}),
+        ]
+
+
+def test_backend_errors_are_retried_but_bad_arguments_are_not():
+    backend = RecordingBackend(failures=2)
+    queue = DispatchQueue(backend, base_delay=0.01).start()
+    queue.resend_email_confirmation(random_user_id())
+    assert queue.flush(timeout=5)
+    assert len(backend.calls) == 3
+    assert queue.failed() == []
+
+    backend.failures, backend.error = 1, ValueError("integration_api_key is incorrect")
+    queue.resend_email_confirmation(random_user_id())
+    assert queue.flush(timeout=5)
+
+    [failed] = queue.failed()
+    assert (failed["method"], failed["attempts"]) == ("resend_email_confirmation", 1)
+    assert "integration_api_key is incorrect" in failed["error"]
+    queue.close()
+
+
+def test_flask_auth_dispatches_in_the_background(auth):
+    user_id = random_user_id()
+    queue = auth.start_dispatch_queue(":memory:")
+
+    with requests_mock.Mocker() as m:
+        m.post(re.compile(".*/logout_all_sessions$"), status_code=200, json={})
+        queue.logout_all_user_sessions(user_id)
+        assert queue.flush(timeout=5)
+
+    queue.close()
+    assert m.call_count == 1
+    assert auth.revocation_list.is_revoked(user_id, 0)
+
+
+def test_claims_skip_calls_that_arent_due_and_those_queued_behind_them():
+    queue = DispatchQueue(RecordingBackend(), concurrency=2)
+    retrying_user_id, waiting_user_id, other_user_id = random_user_id(), random_user_id(), random_user_id()
+    retrying = queue.resend_email_confirmation(retrying_user_id)
+    queue.logout_all_user_sessions(retrying_user_id)
+    waiting = queue.resend_email_confirmation(waiting_user_id)
+    other = queue.resend_email_confirmation(other_user_id)
+    queue._connection.execute(
+        "UPDATE mutations SET next_attempt_at = ? WHERE id IN (?, ?)", (time.time() + 60, retrying, waiting)
+    )
+
+    with queue._lock:
+        cursor = queue._connection.cursor()
+        jobs, next_attempt_at = queue._claim(cursor)
+
+    assert [job[0] for job in jobs] == [other]
+    assert next_attempt_at > time.time() + 50
+    queue.close()
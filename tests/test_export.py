@@ -0,0 +1,74 @@
+import csv
+import gzip
+import json
+
+from propelauth_flask import export_tenant
+from tests.fake_backend import FakeBackend
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_exports_users_orgs_and_memberships_a_page_at_a_time(tmp_path):
+    backend = FakeBackend()
+    org_ids = [backend.add_org() for _ in range(3)]
+    user_ids = [backend.add_user({org_ids[i % 3]: "Admin", org_ids[(i + 1) % 3]: "Member"}) for i in range(25)]
+
+    result = export_tenant(backend, str(tmp_path), page_size=10)
+
+    assert (result.users, result.orgs, result.memberships) == (25, 3, 50)
+    users = read_jsonl(tmp_path / "users.jsonl")
+    assert [user["user_id"] for user in users] == user_ids
+    assert "org_id_to_org_info" not in users[0]
+    assert {org["org_id"] for org in read_jsonl(tmp_path / "orgs.jsonl")} == set(org_ids)
+    memberships = read_jsonl(tmp_path / "memberships.jsonl")
+    assert {(row["org_id"], row["user_id"], row["role"]) for row in memberships} >= {
+        (org_ids[0], user_ids[0], "Admin"),
+        (org_ids[1], user_ids[0], "Member"),
+    }
+    assert [call[1] for call in backend.calls if call[0] == "fetch_users_by_query"] == [0, 1, 2]
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert manifest["users"] == 25
+    assert sorted(manifest["membership_org_ids"]) == sorted(org_ids)
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_exports_gzipped_csv(tmp_path):
+    backend = FakeBackend()
+    org_id = backend.add_org()
+    user_id = backend.add_user({org_id: "Owner"})
+
+    export_tenant(backend, str(tmp_path), format="csv", compress=True)
+
+    with gzip.open(tmp_path / "memberships.csv.gz", "rt", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert rows == [
+        {"org_id": org_id, "user_id": user_id, "email": backend.users[user_id].email, "role": "Owner",
+         "additional_roles": "[]"}
+    ]
+    with gzip.open(tmp_path / "users.csv.gz", "rt", newline="") as f:
+        assert json.loads(next(csv.DictReader(f))["properties"]) == {}
+
+
+def test_incremental_export_writes_the_memberships_of_changed_orgs_separately(tmp_path):
+    backend = FakeBackend()
+    changed_org_id, unchanged_org_id, removed_org_id = backend.add_org(), backend.add_org(), backend.add_org()
+    backend.add_user({changed_org_id: "Admin", unchanged_org_id: "Member"})
+    state_path = str(tmp_path / "state.json")
+    export_tenant(backend, str(tmp_path), state_path=state_path)
+
+    backend.add_user({changed_org_id: "Member"})
+    del backend.orgs[removed_org_id]
+    result = export_tenant(backend, str(tmp_path), state_path=state_path)
+
+    assert (result.users, result.memberships, result.changed_memberships, result.unchanged_orgs) == (2, 3, 2, 1)
+    assert result.removed_org_ids == [removed_org_id]
+    # The unchanged org's memberships are still in the full file
+    assert {row["org_id"] for row in read_jsonl(tmp_path / "memberships.jsonl")} == {changed_org_id, unchanged_org_id}
+    assert [row["org_id"] for row in read_jsonl(tmp_path / "membership_changes.jsonl")] == [changed_org_id] * 2
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert manifest["membership_org_ids"] == [changed_org_id]
+    assert not list(tmp_path.glob("*.tmp"))
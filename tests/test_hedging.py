@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+from propelauth_flask import ReadHedging
+from propelauth_flask.backend_client import _BackendClient
+
+
+class SlowOnceAuth:
+    """Answers quickly, except for the first request once slow is set."""
+
+    def __init__(self):
+        self.slow = False
+        self.calls = 0
+        self.threads = []
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        with self._lock:
+            self.calls += 1
+            if self.slow:
+                self.slow = False
+                return 0.5
+        return 0.01
+
+    def fetch_org(self, org_id):
+        delay = self._delay()
+        self.threads.append(threading.current_thread())
+        time.sleep(delay)
+        if delay == 0.5:
+            raise RuntimeError("Unknown error when fetching org")
+        return {"org_id": org_id}
+
+    def update_org_metadata(self, org_id, name=None):
+        time.sleep(self._delay())
+        return True
+
+
+class SlowOnceAsyncAuth(SlowOnceAuth):
+    async def fetch_org(self, org_id):
+        await asyncio.sleep(self._delay())
+        return {"org_id": org_id}
+
+
+def make_client(auth):
+    hedging = ReadHedging(min_samples=5, min_delay=0.02)
+    return hedging, _BackendClient(auth, [hedging])
+
+
+def test_slow_reads_are_hedged():
+    auth = SlowOnceAuth()
+    hedging, client = make_client(auth)
+    for _ in range(5):
+        client.fetch_org("org")
+    assert hedging.hedged == 0
+
+    # The first request stays on the calling thread, and a hedge sent while it was slow stands in when it fails
+    auth.slow = True
+    assert client.fetch_org("org") == {"org_id": "org"}
+    assert (hedging.calls, hedging.hedged, hedging.hedge_wins) == (6, 1, 1)
+    assert auth.threads[5] is threading.current_thread() and auth.threads[6] is not threading.current_thread()
+
+    # Fast calls never send one
+    client.fetch_org("org")
+    assert (hedging.hedged, auth.calls) == (1, 8)
+
+
+def test_async_slow_reads_are_hedged():
+    auth = SlowOnceAsyncAuth()
+    hedging, client = make_client(auth)
+
+    async def main():
+        for _ in range(5):
+            await client.fetch_org("org")
+        auth.slow = True
+        started_at = time.monotonic()
+        await client.fetch_org("org")
+        return time.monotonic() - started_at
+
+    assert asyncio.run(main()) < 0.3
+    assert (hedging.hedged, hedging.hedge_wins, auth.calls) == (1, 1, 7)
+
+
+def test_writes_are_never_hedged():
+    auth = SlowOnceAuth()
+    hedging, client = make_client(auth)
+    for _ in range(5):
+        client.update_org_metadata("org")
+    auth.slow = True
+    client.update_org_metadata("org")
+
+    assert auth.calls == 6
+    assert hedging.calls == 0
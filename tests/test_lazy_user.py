@@ -0,0 +1,72 @@
+import pytest
+from propelauth_py.errors import UnauthorizedException
+from propelauth_py.user import _to_user
+
+from propelauth_flask.user import _to_lazy_user
+from tests.auth_helpers import orgs_to_org_id_map, random_org, random_user_id
+
+
+def claims_with_orgs(orgs):
+    return {
+        "user_id": random_user_id(),
+        "email": "easteregg@propelauth.com",
+        "org_id_to_org_member_info": orgs_to_org_id_map(orgs),
+    }
+
+
+def test_lazy_user_matches_eager_user():
+    claims = claims_with_orgs([random_org("Owner"), random_org("Member", ["read"])])
+    assert _to_lazy_user(claims) == _to_user(claims)
+
+
+def test_lazy_user_only_decodes_orgs_that_are_used():
+    orgs = [random_org("Member") for _ in range(100)]
+    user = _to_lazy_user(claims_with_orgs(orgs))
+
+    assert user.get_org(orgs[3]["org_id"]).org_name == orgs[3]["org_name"]
+    assert user.is_role_in_org(orgs[7]["org_id"], "Member")
+    assert len(user.org_id_to_org_member_info._decoded) == 2
+
+
+def test_lazy_user_skips_orgs_without_a_role():
+    org = random_org("Member")
+    roleless_org = random_org("Member")
+    roleless_org["user_role"] = None
+    user = _to_lazy_user(claims_with_orgs([org, roleless_org]))
+
+    assert user.get_org(roleless_org["org_id"]) is None
+    assert roleless_org["org_id"] not in user.org_id_to_org_member_info
+    assert [o.org_id for o in user.get_orgs()] == [org["org_id"]]
+    assert len(user.org_id_to_org_member_info) == 1
+
+
+def test_lazy_user_with_active_org():
+    org = random_org("Admin")
+    user = _to_lazy_user({"user_id": random_user_id(), "org_member_info": org})
+
+    assert user.get_active_org_id() == org["org_id"]
+    assert user.get_active_org().user_assigned_role == "Admin"
+
+
+def test_lazy_user_without_orgs():
+    user = _to_lazy_user({"user_id": random_user_id()})
+    assert user.org_id_to_org_member_info is None
+    assert user.get_orgs() == []
+
+
+def _org_without(key):
+    org = random_org("Member")
+    del org[key]
+    return org
+
+
+@pytest.mark.parametrize("claims", [
+    {"org_id_to_org_member_info": ["not", "a", "map"]},
+    {"org_id_to_org_member_info": {"org": "not a map"}},
+    {"org_id_to_org_member_info": orgs_to_org_id_map([_org_without("user_role")])},
+    {"org_id_to_org_member_info": orgs_to_org_id_map([_org_without("user_permissions")])},
+    {"org_member_info": _org_without("org_name")},
+])
+def test_lazy_user_rejects_malformed_org_claims(claims):
+    with pytest.raises(UnauthorizedException):
+        _to_lazy_user({"user_id": random_user_id(), **claims})
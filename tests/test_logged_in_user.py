@@ -0,0 +1,75 @@
+import pytest
+
+from propelauth_flask.user import LoggedInUser, _to_lazy_user
+from tests.auth_helpers import orgs_to_org_id_map, random_org, random_user_id
+
+
+def logged_in_user_with_orgs(orgs, **claims):
+    user = _to_lazy_user({
+        "user_id": random_user_id(),
+        "org_id_to_org_member_info": orgs_to_org_id_map(orgs),
+        **claims,
+    })
+    return LoggedInUser(user=user)
+
+
+def test_backwards_compatible_fields():
+    org = random_org("Owner")
+    logged_in_user = logged_in_user_with_orgs([org], legacy_user_id="legacy")
+    user = logged_in_user.user
+
+    assert logged_in_user.user_id == user.user_id
+    assert logged_in_user.org_id_to_org_member_info is user.org_id_to_org_member_info
+    assert logged_in_user.legacy_user_id == "legacy"
+    assert LoggedInUser(
+        user=user,
+        user_id=user.user_id,
+        org_id_to_org_member_info=user.org_id_to_org_member_info,
+        legacy_user_id=user.legacy_user_id,
+    ) == logged_in_user
+
+
+def test_logged_in_user_has_no_instance_dict():
+    logged_in_user = logged_in_user_with_orgs([])
+    assert not hasattr(logged_in_user, "__dict__")
+    with pytest.raises(AttributeError):
+        logged_in_user.something_else = 1
+
+
+def test_backwards_compatible_fields_can_be_assigned():
+    org = random_org("Owner")
+    logged_in_user = logged_in_user_with_orgs([org])
+
+    logged_in_user.user_id = "overridden"
+    logged_in_user.legacy_user_id = "legacy"
+    logged_in_user.org_id_to_org_member_info = {}
+    assert logged_in_user.user_id == "overridden"
+    assert logged_in_user.legacy_user_id == "legacy"
+    assert logged_in_user.org_id_to_org_member_info == {}
+    assert logged_in_user.user.user_id != "overridden"
+
+    assert logged_in_user.get_org_by_name(org["org_name"]).org_id == org["org_id"]
+    other_org = random_org("Member")
+    logged_in_user.user = _to_lazy_user({
+        "user_id": random_user_id(),
+        "org_id_to_org_member_info": orgs_to_org_id_map([other_org]),
+    })
+    assert logged_in_user.get_org_by_name(org["org_name"]) is None
+    assert logged_in_user.filter_orgs_with_min_role([org["org_id"], other_org["org_id"]], "Member") == [
+        other_org["org_id"]
+    ]
+
+
+def test_get_org_by_name():
+    orgs = [random_org("Member") for _ in range(10)]
+    logged_in_user = logged_in_user_with_orgs(orgs)
+
+    assert logged_in_user.get_org_by_name(orgs[4]["org_name"]).org_id == orgs[4]["org_id"]
+    assert logged_in_user.get_org_by_name(orgs[9]["org_name"]).org_id == orgs[9]["org_id"]
+    assert logged_in_user.get_org_by_name("unknown") is None
+
+
+def test_get_org_by_name_without_orgs():
+    logged_in_user = LoggedInUser(user=_to_lazy_user({"user_id": random_user_id()}))
+    assert logged_in_user.get_org_by_name("unknown") is None
+    assert logged_in_user.get_orgs() == []
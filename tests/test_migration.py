@@ -0,0 +1,200 @@
+import json
+import re
+import threading
+
+import pytest
+import requests_mock
+from propelauth_py.api import BACKEND_API_BASE_URL
+from propelauth_py.errors import BadRequestException
+from propelauth_py.types.user import CreatedUser
+
+from propelauth_flask import migrate_users
+from propelauth_flask._pipeline import read_records, run_pipeline
+from propelauth_flask.cli import main
+
+
+class FakeMigrationBackend:
+    def __init__(self):
+        self.migrated = []
+        self.passwords = []
+        self._lock = threading.Lock()
+
+    def migrate_user_from_external_source(self, email, email_confirmed, **kwargs):
+        if "@" not in email:
+            raise BadRequestException({"email": ["Invalid email"]})
+        with self._lock:
+            self.migrated.append(dict(email=email, email_confirmed=email_confirmed, **kwargs))
+            return CreatedUser(user_id="user-{}".format(len(self.migrated)))
+
+    def migrate_user_password(self, user_id, password_hash):
+        with self._lock:
+            self.passwords.append((user_id, password_hash))
+        return True
+
+
+def write_jsonl(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    return str(path)
+
+
+def test_migrates_users_from_jsonl_and_csv(tmp_path):
+    backend = FakeMigrationBackend()
+    jsonl = write_jsonl(tmp_path / "users.jsonl", [
+        {"email": "a@example.com", "email_confirmed": True, "properties": {"plan": "pro"}},
+        {"user_id": "user-1", "password_hash": "$2b$12$hash"},
+    ])
+    csv = tmp_path / "users.csv"
+    csv.write_text(
+        "email,email_confirmed,enabled,first_name,properties\n"
+        'b@example.com,true,false,Bea,"{""plan"": ""free""}"\n'
+        "c@example.com,0,,,\n"
+    )
+
+    assert migrate_users(backend, jsonl).succeeded == 2
+    assert migrate_users(backend, str(csv)).succeeded == 2
+
+    by_email = {user["email"]: user for user in backend.migrated}
+    assert by_email["a@example.com"]["properties"] == {"plan": "pro"}
+    assert by_email["b@example.com"] == {
+        "email": "b@example.com", "email_confirmed": True, "enabled": False, "first_name": "Bea",
+        "properties": {"plan": "free"},
+    }
+    assert by_email["c@example.com"] == {"email": "c@example.com", "email_confirmed": False}
+    assert backend.passwords == [("user-1", "$2b$12$hash")]
+
+
+def test_interrupted_runs_resume_where_they_left_off(tmp_path):
+    path = write_jsonl(tmp_path / "users.jsonl", [
+        {"email": "user{}@example.com".format(i), "email_confirmed": True} for i in range(50)
+    ])
+    checkpoint = str(tmp_path / "checkpoint.json")
+    backend = FakeMigrationBackend()
+
+    def interrupted_after(count):
+        for record_number, record in read_records(path):
+            if record_number > count:
+                raise KeyboardInterrupt()
+            yield record_number, record
+
+    with pytest.raises(KeyboardInterrupt):
+        run_pipeline(
+            interrupted_after(20),
+            lambda record: backend.migrate_user_from_external_source(**record),
+            concurrency=4,
+            checkpoint_path=checkpoint,
+        )
+    assert len(backend.migrated) == 20
+
+    result = migrate_users(backend, path, concurrency=4, checkpoint_path=checkpoint)
+    assert (result.succeeded, result.skipped) == (30, 20)
+    assert sorted(user["email"] for user in backend.migrated) == sorted(
+        "user{}@example.com".format(i) for i in range(50)
+    )
+
+
+def test_failed_records_are_reported(tmp_path):
+    path = write_jsonl(tmp_path / "users.jsonl", [
+        {"email": "a@example.com", "email_confirmed": True},
+        {"email": "not an email", "email_confirmed": True},
+        {"email": "b@example.com"},
+    ])
+    errors = str(tmp_path / "errors.jsonl")
+
+    result = migrate_users(FakeMigrationBackend(), path, error_report_path=errors)
+
+    assert (result.succeeded, result.failed) == (1, 2)
+    with open(errors) as f:
+        report = sorted((json.loads(line) for line in f), key=lambda line: line["record_number"])
+    assert [(line["record_number"], line["error_type"]) for line in report] == [
+        (2, "BadRequestException"), (3, "ValueError")
+    ]
+    assert report[0]["error"] == {"email": ["Invalid email"]}
+
+
+def test_malformed_lines_are_reported_and_not_retried(tmp_path):
+    path = tmp_path / "users.jsonl"
+    path.write_text('{"email": "a@example.com", "email_confirmed": true}\n{"email": \n["not", "an", "object"]\n')
+    errors = str(tmp_path / "errors.jsonl")
+    checkpoint = str(tmp_path / "checkpoint.json")
+    backend = FakeMigrationBackend()
+
+    def run():
+        return run_pipeline(
+            read_records(str(path)),
+            lambda record: backend.migrate_user_from_external_source(**record),
+            checkpoint_path=checkpoint,
+            error_report_path=errors,
+            dedupe_key=lambda record: record["email"],
+        )
+
+    result = run()
+    assert (result.succeeded, result.failed) == (1, 2)
+    with open(errors) as f:
+        report = sorted((json.loads(line) for line in f), key=lambda line: line["record_number"])
+    assert [(line["record_number"], line["record"], line["error_type"]) for line in report] == [
+        (2, '{"email": ', "JSONDecodeError"), (3, ["not", "an", "object"], "TypeError")
+    ]
+
+    result = run()
+    assert (result.processed, result.skipped) == (0, 3)
+    assert len(backend.migrated) == 1
+
+
+def test_output_errors_are_reported_and_progress_errors_raised(tmp_path):
+    errors = str(tmp_path / "errors.jsonl")
+
+    def to_output(record_number, record, value):
+        if record_number == 2:
+            raise KeyError("missing")
+        return {"record_number": record_number}
+
+    records = [(i, {"email": "user{}@example.com".format(i)}) for i in range(1, 4)]
+    result = run_pipeline(
+        iter(records), lambda record: None, error_report_path=errors,
+        output_path=str(tmp_path / "output.jsonl"), to_output=to_output,
+    )
+    assert (result.succeeded, result.failed) == (2, 1)
+    with open(errors) as f:
+        assert [json.loads(line)["record_number"] for line in f] == [2]
+
+    def on_progress(result):
+        raise RuntimeError("progress bar broke")
+
+    with pytest.raises(RuntimeError, match="progress bar broke"):
+        run_pipeline(iter(records), lambda record: None, concurrency=1, on_progress=on_progress)
+
+
+def test_backend_errors_are_retried():
+    attempts = []
+
+    def flaky(record):
+        attempts.append(record)
+        if len(attempts) < 3:
+            raise RuntimeError("Unknown error when migrating user")
+
+    result = run_pipeline(iter([(1, {"email": "a@example.com"})]), flaky, base_delay=0.01)
+    assert (result.succeeded, len(attempts)) == (1, 3)
+
+
+def test_command_line(tmp_path, rsa_keys, capsys):
+    path = write_jsonl(tmp_path / "users.jsonl", [
+        {"email": "user{}@example.com".format(i), "email_confirmed": True} for i in range(3)
+    ])
+
+    with requests_mock.Mocker() as m:
+        m.get(BACKEND_API_BASE_URL + "/api/v1/token_verification_metadata", json={
+            "verifier_key_pem": rsa_keys.public_pem
+        })
+        m.post(re.compile(".*/migrate_user/$"), json={"user_id": "user"})
+        exit_code = main([
+            "--auth-url", "https://test.propelauth.com", "--api-key", "api_key",
+            "migrate-users", path, "--checkpoint", str(tmp_path / "checkpoint.json"),
+        ])
+
+    assert exit_code == 0
+    assert capsys.readouterr().out.strip() == "3 succeeded, 0 failed, 0 skipped (already done)"
+    assert sorted(request.json()["email"] for request in m.request_history[1:]) == [
+        "user{}@example.com".format(i) for i in range(3)
+    ]
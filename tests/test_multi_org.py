@@ -0,0 +1,90 @@
+from propelauth_flask import current_orgs
+from propelauth_flask.user import LoggedInUser, _to_lazy_user
+from tests.auth_helpers import create_access_token, orgs_to_org_id_map, random_org, random_user_id
+
+
+def org_ids_from_query(req):
+    return req.args.getlist("org_id")
+
+
+def create_multi_org_route(app, auth, **kwargs):
+    @app.route("/orgs")
+    @auth.require_org_member_in_orgs(org_ids_from_query, **kwargs)
+    def route():
+        return ",".join(org.org_id for org in current_orgs)
+
+
+def access_token_for(orgs, rsa_keys):
+    return create_access_token({
+        "user_id": random_user_id(),
+        "org_id_to_org_member_info": orgs_to_org_id_map(orgs),
+    }, rsa_keys.private_pem)
+
+
+def test_filter_orgs_with_permission():
+    readable = [random_org("Member", ["read"]) for _ in range(5)]
+    writable = [random_org("Admin", ["read", "write"]) for _ in range(5)]
+    user = LoggedInUser(user=_to_lazy_user({
+        "user_id": random_user_id(),
+        "org_id_to_org_member_info": orgs_to_org_id_map(readable + writable),
+    }))
+    requested = [org["org_id"] for org in writable + readable] + [random_org("Member")["org_id"]]
+
+    assert user.filter_orgs_with_permission(requested, "read") == requested[:10]
+    assert user.filter_orgs_with_permission(requested, "write") == requested[:5]
+    assert user.filter_orgs_with_all_permissions(requested, ["read", "write"]) == requested[:5]
+    assert user.filter_orgs_with_permission(requested, "delete") == []
+    assert [org.org_id for org in user.orgs_with_permission("write")] == [org["org_id"] for org in writable]
+
+
+def test_orgs_with_min_role():
+    member_org = random_org("Member")
+    admin_org = random_org("Admin")
+    admin_org["inherited_user_roles_plus_current_role"] = ["Admin", "Member"]
+    user = LoggedInUser(user=_to_lazy_user({
+        "user_id": random_user_id(),
+        "org_id_to_org_member_info": orgs_to_org_id_map([member_org, admin_org]),
+    }))
+
+    assert [org.org_id for org in user.orgs_with_min_role("Member")] == [member_org["org_id"], admin_org["org_id"]]
+    assert [org.org_id for org in user.orgs_with_min_role("Admin")] == [admin_org["org_id"]]
+    assert user.filter_orgs_with_min_role([admin_org["org_id"], member_org["org_id"]], "Admin") == [admin_org["org_id"]]
+
+
+def test_require_org_member_in_orgs(app, auth, client, rsa_keys):
+    orgs = [random_org("Member", ["read"]) for _ in range(3)]
+    create_multi_org_route(app, auth, permissions=["read"])
+    headers = {"Authorization": "Bearer " + access_token_for(orgs, rsa_keys)}
+
+    org_ids = [org["org_id"] for org in orgs]
+    response = client.get("/orgs", query_string={"org_id": org_ids}, headers=headers)
+    assert response.status_code == 200
+    assert response.data.decode("utf-8") == ",".join(org_ids)
+
+
+def test_require_org_member_in_orgs_rejects_any_missing_org(app, auth, client, rsa_keys):
+    orgs = [random_org("Member", ["read"]) for _ in range(3)]
+    create_multi_org_route(app, auth)
+    headers = {"Authorization": "Bearer " + access_token_for(orgs, rsa_keys)}
+
+    org_ids = [org["org_id"] for org in orgs] + [random_org("Member")["org_id"]]
+    response = client.get("/orgs", query_string={"org_id": org_ids}, headers=headers)
+    assert response.status_code == 403
+
+    response = client.get("/orgs", headers=headers)
+    assert response.status_code == 403
+
+
+def test_require_org_member_in_orgs_checks_permissions(app, auth, client, rsa_keys):
+    orgs = [random_org("Member", ["read"]), random_org("Member", [])]
+    create_multi_org_route(app, auth, permissions=["read"])
+    headers = {"Authorization": "Bearer " + access_token_for(orgs, rsa_keys)}
+
+    response = client.get("/orgs", query_string={"org_id": [org["org_id"] for org in orgs]}, headers=headers)
+    assert response.status_code == 403
+
+
+def test_require_org_member_in_orgs_without_auth(app, auth, client):
+    create_multi_org_route(app, auth)
+    response = client.get("/orgs", query_string={"org_id": [random_org("Member")["org_id"]]})
+    assert response.status_code == 401
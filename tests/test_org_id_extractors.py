@@ -0,0 +1,172 @@
+import io
+import json
+from uuid import uuid4
+
+import pytest
+from flask import request
+
+from propelauth_flask import (
+    current_org,
+    org_id_from_header,
+    org_id_from_json_field,
+    org_id_from_query,
+    org_id_from_view_args,
+)
+from propelauth_flask.org_id_extractors import _JsonFieldScanner
+from tests.auth_helpers import create_access_token, orgs_to_org_id_map, random_org, random_user_id
+
+
+def auth_headers(org, rsa_keys):
+    access_token = create_access_token({
+        "user_id": random_user_id(),
+        "org_id_to_org_member_info": orgs_to_org_id_map([org]),
+    }, rsa_keys.private_pem)
+    return {"Authorization": "Bearer " + access_token}
+
+
+def scan(body, field="org_id", chunk_size=3, strict=False):
+    return _JsonFieldScanner(io.BytesIO(body.encode("utf-8")), 64 * 1024, chunk_size).find(field, strict)
+
+
+def test_org_id_from_view_args(app, auth, client, rsa_keys):
+    org = random_org("Member")
+
+    @app.route("/org/<id>")
+    @auth.require_org_member(org_id_from_view_args("id"))
+    def route(id):
+        return current_org.org_id
+
+    response = client.get("/org/" + org["org_id"], headers=auth_headers(org, rsa_keys))
+    assert response.data.decode("utf-8") == org["org_id"]
+
+
+def test_org_id_from_header(app, auth, client, rsa_keys):
+    org = random_org("Member")
+
+    @app.route("/org")
+    @auth.require_org_member(org_id_from_header())
+    def route():
+        return current_org.org_id
+
+    headers = auth_headers(org, rsa_keys)
+    headers["X-Org-Id"] = org["org_id"]
+    response = client.get("/org", headers=headers)
+    assert response.data.decode("utf-8") == org["org_id"]
+
+
+def test_org_id_from_query(app, auth, client, rsa_keys):
+    org = random_org("Member")
+
+    @app.route("/org")
+    @auth.require_org_member(org_id_from_query())
+    def route():
+        return current_org.org_id
+
+    response = client.get("/org", query_string={"org_id": org["org_id"]}, headers=auth_headers(org, rsa_keys))
+    assert response.data.decode("utf-8") == org["org_id"]
+
+
+def test_org_id_from_json_field_leaves_body_readable(app, auth, client, rsa_keys):
+    org = random_org("Member")
+
+    @app.route("/org", methods=["POST"])
+    @auth.require_org_member(org_id_from_json_field(chunk_size=8))
+    def route():
+        return request.get_json()
+
+    body = {"org_id": org["org_id"], "items": list(range(1000))}
+    response = client.post("/org", json=body, headers=auth_headers(org, rsa_keys))
+    assert response.status_code == 200
+    assert response.get_json() == body
+
+
+def test_malformed_org_id_is_rejected_before_verification(app, auth, client):
+    @app.route("/org/<org_id>")
+    @auth.require_org_member(org_id_from_view_args())
+    def route(org_id):
+        return "ok"
+
+    # No access token at all, so a 403 means the org id was rejected first
+    assert client.get("/org/not-an-org-id").status_code == 403
+    assert client.get("/org/" + str(uuid4())).status_code == 401
+
+
+def test_extracted_org_id_is_memoized(app):
+    calls = []
+    extractor = org_id_from_header()
+    org_id = str(uuid4())
+
+    with app.test_request_context(headers={"X-Org-Id": org_id}):
+        original_get = request.headers.get
+
+        class CountingHeaders:
+            def get(self, name):
+                calls.append(name)
+                return original_get(name)
+
+        request.headers = CountingHeaders()
+        assert extractor(request) == org_id
+        assert extractor(request) == org_id
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("body,expected,strict_expected", [
+    ('{"org_id": "abc"}', "abc", "abc"),
+    ('  { "name" : "x", "org_id":"abc", "more": [1, 2]}', "abc", "abc"),
+    ('{"nested": {"org_id": "wrong"}, "list": ["org_id", {"a": "}"}], "org_id": "abc"}', "abc", "abc"),
+    ('{"escaped \\" key": "va\\\\lue\\"", "n": -1.5e3, "t": true, "org_id": "a\\u0062c"}', "abc", "abc"),
+    ('{"org_id": 5}', None, None),
+    ('{"other": "abc"}', None, None),
+    ('["org_id", "abc"]', None, None),
+    ('{"org_id": "unterminated', None, None),
+    ('{"org_id": "abc", "more": 1', "abc", None),
+    ('{"org_id": "abc", "org_id": "def"}', "abc", None),
+    ('{"org_id": "abc", "org\\u005fid": "def"}', "abc", None),
+    ('{"org_id": "\\x"}', None, None),
+    ('{"\\x": 1, "org_id": "abc"}', None, None),
+    ('', None, None),
+])
+def test_json_field_scanner(body, expected, strict_expected):
+    assert scan(body) == expected
+    assert scan(body, chunk_size=4096) == expected
+    assert scan(body, strict=True) == strict_expected
+
+
+def test_json_field_scanner_stops_once_the_field_is_read():
+    body = json.dumps({"org_id": "abc", "padding": "x" * 100000}).encode("utf-8")
+    stream = io.BytesIO(body)
+    scanner = _JsonFieldScanner(stream, 64 * 1024, 16)
+    assert scanner.find("org_id") == "abc"
+    assert stream.tell() == 16
+
+    scanner = _JsonFieldScanner(io.BytesIO(body), 64 * 1024, 4096)
+    assert scanner.find("org_id", strict=True) is None
+    assert scanner.hit_max_bytes
+
+
+def test_org_id_from_json_field_parses_bodies_too_large_to_scan(app, auth, client, rsa_keys):
+    org = random_org("Member")
+
+    @app.route("/org", methods=["POST"])
+    @auth.require_org_member(org_id_from_json_field(max_bytes=1024, strict=True))
+    def route():
+        return request.get_json()["org_id"]
+
+    body = {"padding": "x" * 100000, "org_id": org["org_id"]}
+    response = client.post("/org", json=body, headers=auth_headers(org, rsa_keys))
+    assert response.status_code == 200
+    assert response.text == org["org_id"]
+
+
+def test_strict_org_id_from_json_field_rejects_duplicate_fields(app, auth, client, rsa_keys):
+    org = random_org("Member")
+
+    @app.route("/org", methods=["POST"])
+    @auth.require_org_member(org_id_from_json_field(strict=True))
+    def route():
+        return request.get_json()["org_id"]
+
+    body = '{{"org_id": "{}", "org_id": "{}"}}'.format(org["org_id"], str(uuid4()))
+    headers = dict(auth_headers(org, rsa_keys), **{"Content-Type": "application/json"})
+    assert client.post("/org", data=body, headers=headers).status_code == 403
+    assert client.post("/org", data='{"org_id": "\\x"}', headers=headers).status_code == 403
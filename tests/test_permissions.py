@@ -0,0 +1,57 @@
+from propelauth_flask import compile_permissions, compile_role
+from propelauth_flask.user import LoggedInUser, _to_lazy_user
+from tests.auth_helpers import orgs_to_org_id_map, random_org, random_user_id
+
+
+def logged_in_user_with_orgs(orgs):
+    return LoggedInUser(user=_to_lazy_user({
+        "user_id": random_user_id(),
+        "org_id_to_org_member_info": orgs_to_org_id_map(orgs),
+    }))
+
+
+def test_permission_checks_match_user():
+    org = random_org("Admin", ["read", "write"])
+    logged_in_user = logged_in_user_with_orgs([org])
+    user = logged_in_user.user
+    org_id = org["org_id"]
+
+    for permissions in [[], ["read"], ["read", "write"], ["write", "read"], ["delete"], ["read", "delete"]]:
+        assert logged_in_user.has_all_permissions_in_org(org_id, permissions) == \
+            user.has_all_permissions_in_org(org_id, permissions)
+        assert logged_in_user.has_all_permissions_in_org(org_id, compile_permissions(permissions)) == \
+            user.has_all_permissions_in_org(org_id, permissions)
+
+    assert logged_in_user.has_permission_in_org(org_id, "write")
+    assert not logged_in_user.has_permission_in_org(org_id, "delete")
+    assert not logged_in_user.has_permission_in_org(random_org("Admin")["org_id"], "read")
+
+
+def test_role_checks_in_single_role_hierarchy():
+    org = random_org("Admin")
+    org["inherited_user_roles_plus_current_role"] = ["Admin", "Member"]
+    logged_in_user = logged_in_user_with_orgs([org])
+
+    assert logged_in_user.is_at_least_role_in_org(org["org_id"], "Admin")
+    assert logged_in_user.is_at_least_role_in_org(org["org_id"], compile_role("Member"))
+    assert not logged_in_user.is_at_least_role_in_org(org["org_id"], "Owner")
+
+
+def test_role_checks_with_multiple_roles():
+    org = random_org("Billing")
+    org["org_role_structure"] = "multi_role"
+    org["additional_roles"] = ["Support"]
+    org["inherited_user_roles_plus_current_role"] = ["Billing", "Member"]
+    logged_in_user = logged_in_user_with_orgs([org])
+    user = logged_in_user.user
+
+    for role in ["Billing", "Support", "Member", "Owner"]:
+        assert logged_in_user.is_at_least_role_in_org(org["org_id"], role) == \
+            user.is_at_least_role_in_org(org["org_id"], role)
+
+
+def test_compiled_permissions_are_reused():
+    required = compile_permissions(["read", "write"])
+    assert compile_permissions(required) is required
+    assert compile_permissions("read").mask & required.mask == compile_permissions("read").mask
+    assert compile_permissions(None) is None
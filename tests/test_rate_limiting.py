@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+from uuid import uuid4
+
+import httpx
+import pytest
+import requests_mock
+from propelauth_py.api import BACKEND_API_BASE_URL
+from propelauth_py.errors import RateLimitedException
+
+from propelauth_flask import AdaptiveConcurrencyLimiter, RetryPolicy, init_auth_async
+from propelauth_flask.rate_limiting import _parse_retry_after
+from tests.conftest import BASE_AUTH_URL, mock_api_and_init_auth
+
+ORG_URL = BACKEND_API_BASE_URL + "/api/backend/v1/org/"
+
+
+class ThrottlingBackend:
+    """Answers with a 429 whenever more than capacity requests are in flight."""
+
+    def __init__(self, capacity, retry_after=None):
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.accepted = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def admit(self):
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                self.throttled += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def done(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.accepted += 1
+
+    async def httpx_handler(self, request):
+        if not self.admit():
+            headers = {} if self.retry_after is None else {"Retry-After": str(self.retry_after)}
+            return httpx.Response(429, headers=headers, json={})
+        await asyncio.sleep(0.02)
+        self.done()
+        return httpx.Response(200, json={"org_id": request.url.path.rsplit("/", 1)[-1], "name": "org"})
+
+
+def init_async_auth(rsa_keys, backend, limiter):
+    httpx_client = httpx.AsyncClient(transport=httpx.MockTransport(backend.httpx_handler))
+    return mock_api_and_init_auth(
+        BASE_AUTH_URL, 200, {"verifier_key_pem": rsa_keys.public_pem},
+        init=init_auth_async, httpx_client=httpx_client, concurrency_limiter=limiter, deduplicate_reads=False,
+    )
+
+
+def test_concurrency_settles_at_what_the_backend_accepts(rsa_keys):
+    backend = ThrottlingBackend(capacity=4)
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=16, retry_policy=RetryPolicy(max_attempts=10, base_delay=0.01))
+    auth = init_async_auth(rsa_keys, backend, limiter)
+
+    async def main():
+        return await asyncio.gather(*[auth.fetch_org(str(uuid4())) for _ in range(100)])
+
+    orgs = asyncio.run(main())
+
+    assert all(org.name == "org" for org in orgs)
+    assert backend.accepted == 100
+    assert limiter.limit <= 8
+    assert limiter.in_flight == 0
+    # Once the limit is cut, few calls are sent only to be turned away
+    assert backend.throttled < 40
+
+
+def test_async_calls_wait_as_long_as_retry_after_says(rsa_keys):
+    backend = ThrottlingBackend(capacity=1, retry_after=0.1)
+    auth = init_async_auth(rsa_keys, backend, AdaptiveConcurrencyLimiter(initial_limit=2))
+
+    async def main():
+        started_at = time.monotonic()
+        orgs = await asyncio.gather(auth.fetch_org(str(uuid4())), auth.fetch_org(str(uuid4())))
+        return orgs, time.monotonic() - started_at
+
+    orgs, elapsed = asyncio.run(main())
+
+    assert [org.name for org in orgs] == ["org", "org"]
+    assert backend.throttled == 1
+    assert elapsed >= 0.1
+
+
+def test_gives_up_after_max_attempts(auth):
+    auth.auth.add_interceptor(AdaptiveConcurrencyLimiter(retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01)))
+    org_id = str(uuid4())
+
+    with requests_mock.Mocker() as m:
+        m.get(ORG_URL + org_id, status_code=429, text="slow down")
+        with pytest.raises(RateLimitedException):
+            auth.fetch_org(org_id)
+
+    assert m.call_count == 3
+
+
+def test_parse_retry_after():
+    assert _parse_retry_after("3") == 3.0
+    assert _parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert _parse_retry_after("soon") is None
+    assert _parse_retry_after(None) is None
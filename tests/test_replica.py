@@ -0,0 +1,122 @@
+import dataclasses
+
+from propelauth_flask import LocalReplica
+from tests.fake_backend import FakeBackend
+
+
+def loaded_replica(backend, **kwargs):
+    replica = LocalReplica(backend, page_size=2, **kwargs)
+    replica.bulk_load()
+    backend.calls.clear()
+    return replica
+
+
+def test_reads_are_served_locally_after_bulk_load():
+    backend = FakeBackend()
+    org_id = backend.add_org()
+    user_ids = [backend.add_user({org_id: "Admin" if i == 0 else "Member"}) for i in range(5)]
+    replica = loaded_replica(backend)
+
+    assert replica.fetch_user_metadata_by_user_id(user_ids[0]) == dataclasses.replace(
+        backend.users[user_ids[0]], org_id_to_org_info=None
+    )
+    with_orgs = replica.fetch_user_metadata_by_user_id(user_ids[0], include_orgs=True)
+    assert with_orgs.org_id_to_org_info == backend.users[user_ids[0]].org_id_to_org_info
+
+    page = replica.fetch_users_in_org(org_id, page_size=2, page_number=1)
+    assert [user.user_id for user in page.users] == user_ids[2:4]
+    assert page.total_users == 5 and page.has_more_results
+
+    members = replica.fetch_users_in_org(org_id, role="Member", page_size=10)
+    assert [user.user_id for user in members.users] == user_ids[1:]
+    assert not members.has_more_results
+    assert backend.calls == []
+
+
+def test_reads_go_to_the_backend_until_loaded():
+    backend = FakeBackend()
+    user_id = backend.add_user()
+    replica = LocalReplica(backend)
+
+    assert replica.fetch_user_metadata_by_user_id(user_id).user_id == user_id
+    assert backend.calls == [("fetch_user_metadata_by_user_id", user_id)]
+
+
+def test_orgs_are_fetched_in_full_once():
+    backend = FakeBackend()
+    org_id = backend.add_org()
+    replica = loaded_replica(backend)
+
+    assert replica.fetch_org(org_id) == backend.orgs[org_id]
+    assert replica.fetch_org(org_id) == backend.orgs[org_id]
+    assert backend.calls == [("fetch_org", org_id)]
+
+    backend.orgs[org_id] = dataclasses.replace(backend.orgs[org_id], name="Renamed")
+    replica.refresh()
+    assert replica.fetch_org(org_id).name == "Renamed"
+    assert replica.fetch_org(org_id).url_safe_org_slug == backend.orgs[org_id].url_safe_org_slug
+
+
+def test_refresh_drops_deleted_users_and_orgs():
+    backend = FakeBackend()
+    org_id = backend.add_org()
+    user_id = backend.add_user({org_id: "Admin"})
+    replica = loaded_replica(backend)
+
+    del backend.users[user_id]
+    del backend.orgs[org_id]
+    replica.refresh()
+    backend.calls.clear()
+
+    assert replica.fetch_users_in_org(org_id).total_users == 0
+    assert replica.fetch_user_metadata_by_user_id(user_id) is None
+    assert backend.calls == [("fetch_user_metadata_by_user_id", user_id)]
+
+
+def test_upserts_and_removals():
+    backend = FakeBackend()
+    org_id = backend.add_org()
+    replica = loaded_replica(backend)
+
+    new_user_id = backend.add_user({org_id: "Owner"})
+    assert replica.fetch_users_in_org(org_id).total_users == 0
+    replica.upsert_user(new_user_id)
+    assert [user.user_id for user in replica.fetch_users_in_org(org_id).users] == [new_user_id]
+
+    replica.remove_org(org_id)
+    user = replica.fetch_user_metadata_by_user_id(new_user_id, include_orgs=True)
+    assert user.org_id_to_org_info == {}
+
+
+def test_persists_between_instances(tmp_path):
+    backend = FakeBackend()
+    user_id = backend.add_user()
+    path = str(tmp_path / "replica.db")
+    loaded_replica(backend, path=path).close()
+
+    replica = loaded_replica(backend, path=path)
+    assert replica.fetch_user_metadata_by_user_id(user_id).user_id == user_id
+
+
+def test_upserts_from_another_process_during_a_refresh_are_kept(tmp_path):
+    backend = FakeBackend()
+    path = str(tmp_path / "replica.db")
+    replica = loaded_replica(backend, path=path)
+    other_process_replica = LocalReplica(backend, path=path)
+    new_user_ids = []
+
+    fetch_org_by_query = backend.fetch_org_by_query
+
+    def sign_up_during_the_org_scan(**kwargs):
+        # The user scan is over, so only the other process's webhook upsert stores this user
+        if not new_user_ids:
+            new_user_ids.append(backend.add_user())
+            other_process_replica.upsert_user(new_user_ids[0])
+        return fetch_org_by_query(**kwargs)
+
+    backend.fetch_org_by_query = sign_up_during_the_org_scan
+    replica.refresh()
+    backend.calls.clear()
+
+    assert replica.fetch_user_metadata_by_user_id(new_user_ids[0]).user_id == new_user_ids[0]
+    assert backend.calls == []
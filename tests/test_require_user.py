@@ -41,3 +41,12 @@ def test_require_user_with_bad_issuer(require_user_route, client, rsa_keys):
     access_token = create_access_token({"user_id": user_id}, rsa_keys.private_pem, issuer=HTTP_BASE_AUTH_URL)
     response = client.get(require_user_route, headers={"Authorization": "Bearer " + access_token})
     assert response.status_code == 401
+
+
+def test_require_user_with_malformed_org_claims(require_user_route, client, rsa_keys):
+    access_token = create_access_token(
+        {"user_id": random_user_id(), "org_id_to_org_member_info": {"org": {"org_name": "no role"}}},
+        rsa_keys.private_pem,
+    )
+    response = client.get(require_user_route, headers={"Authorization": "Bearer " + access_token})
+    assert response.status_code == 401
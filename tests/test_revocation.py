@@ -0,0 +1,63 @@
+import re
+import time
+
+import requests_mock
+
+from propelauth_flask.revocation import RevocationList
+from tests.auth_helpers import create_access_token, random_user_id
+
+
+def test_tokens_issued_before_revocation_are_rejected():
+    revocation_list = RevocationList()
+    user_id = random_user_id()
+    now = time.time()
+    revocation_list.revoke_user(user_id, revoked_at=now)
+
+    assert revocation_list.is_revoked(user_id, now - 1)
+    assert revocation_list.is_revoked(user_id, None)
+    assert not revocation_list.is_revoked(user_id, now + 1)
+    assert not revocation_list.is_revoked(random_user_id(), now - 1)
+
+
+def test_old_revocations_are_pruned():
+    revocation_list = RevocationList(retention_seconds=60)
+    revocation_list.revoke_user(random_user_id(), revoked_at=time.time() - 120)
+    revocation_list._next_prune_at = 0
+    revocation_list.revoke_user(random_user_id())
+
+    assert len(revocation_list) == 1
+
+
+def test_decorators_reject_revoked_users(auth, client, rsa_keys, require_user_route):
+    user_id = random_user_id()
+    access_token = create_access_token({"user_id": user_id}, rsa_keys.private_pem)
+    headers = {"Authorization": "Bearer " + access_token}
+    assert client.get(require_user_route, headers=headers).status_code == 200
+
+    auth.revocation_list.revoke_user(user_id, revoked_at=time.time() + 1)
+    assert client.get(require_user_route, headers=headers).status_code == 401
+
+    auth.revocation_list.revoke_user(user_id, revoked_at=time.time() - 10)
+    other_token = create_access_token({"user_id": random_user_id()}, rsa_keys.private_pem)
+    assert client.get(require_user_route, headers={"Authorization": "Bearer " + other_token}).status_code == 200
+
+
+def test_logout_all_user_sessions_revokes_locally(auth, client, rsa_keys, require_user_route):
+    user_id = random_user_id()
+    access_token = create_access_token({"user_id": user_id}, rsa_keys.private_pem)
+
+    with requests_mock.Mocker() as m:
+        m.post(re.compile(".*/logout_all_sessions$"), status_code=200, json={})
+        assert auth.logout_all_user_sessions(user_id)
+
+    response = client.get(require_user_route, headers={"Authorization": "Bearer " + access_token})
+    assert response.status_code == 401
+
+
+def test_failed_mutations_dont_revoke(auth):
+    user_id = random_user_id()
+    with requests_mock.Mocker() as m:
+        m.post(re.compile(".*/logout_all_sessions$"), status_code=404)
+        assert not auth.logout_all_user_sessions(user_id)
+
+    assert not auth.revocation_list.is_revoked(user_id, time.time() - 60)
@@ -0,0 +1,93 @@
+import requests_mock
+from propelauth_py import StepUpMfaGrantType
+from propelauth_py.api import BACKEND_API_BASE_URL
+
+from propelauth_flask import current_user
+from tests.auth_helpers import create_access_token, random_user_id
+
+VERIFY_GRANT_URL = BACKEND_API_BASE_URL + "/api/backend/v1/mfa/step-up/verify-grant"
+VERIFY_TOTP_URL = BACKEND_API_BASE_URL + "/api/backend/v1/mfa/step-up/verify-totp"
+
+
+def create_step_up_route(app, auth):
+    @app.route("/delete_account")
+    @auth.require_step_up("delete_account")
+    def route():
+        return current_user.user_id
+
+
+def headers_for(user_id, rsa_keys, grant=None):
+    headers = {"Authorization": "Bearer " + create_access_token({"user_id": user_id}, rsa_keys.private_pem)}
+    if grant is not None:
+        headers["X-Step-Up-Grant"] = grant
+    return headers
+
+
+def test_grants_are_verified_with_propelauth(app, auth, client, rsa_keys):
+    create_step_up_route(app, auth)
+    user_id = random_user_id()
+
+    with requests_mock.Mocker() as m:
+        m.post(VERIFY_GRANT_URL, status_code=200, json={})
+        response = client.get("/delete_account", headers=headers_for(user_id, rsa_keys, "grant"))
+        assert response.status_code == 200
+        assert response.text == user_id
+        assert m.last_request.json() == {"action_type": "delete_account", "user_id": user_id, "grant": "grant"}
+
+        m.post(VERIFY_GRANT_URL, status_code=400, json={
+            "error_code": "invalid_request_fields", "field_errors": {"grant": "grant_not_found"},
+        })
+        assert client.get("/delete_account", headers=headers_for(user_id, rsa_keys, "grant")).status_code == 403
+
+
+def test_missing_grant_or_user(app, auth, client, rsa_keys):
+    create_step_up_route(app, auth)
+
+    with requests_mock.Mocker() as m:
+        assert client.get("/delete_account", headers=headers_for(random_user_id(), rsa_keys)).status_code == 403
+        assert client.get("/delete_account", headers={"X-Step-Up-Grant": "grant"}).status_code == 401
+        assert m.call_count == 0
+
+
+def test_time_based_grants_we_issued_are_remembered(app, auth, client, rsa_keys):
+    create_step_up_route(app, auth)
+    user_id = random_user_id()
+
+    with requests_mock.Mocker() as m:
+        m.post(VERIFY_TOTP_URL, status_code=200, json={"step_up_grant": "time_based"})
+        auth.verify_step_up_totp_challenge("delete_account", user_id, "123456", StepUpMfaGrantType.TIME_BASED, 60)
+        m.post(VERIFY_TOTP_URL, status_code=200, json={"step_up_grant": "one_time"})
+        auth.verify_step_up_totp_challenge("delete_account", user_id, "123456", StepUpMfaGrantType.ONE_TIME_USE, 60)
+        m.post(VERIFY_GRANT_URL, status_code=200, json={})
+        m.reset_mock()
+
+        for _ in range(3):
+            assert client.get("/delete_account", headers=headers_for(user_id, rsa_keys, "time_based")).status_code == 200
+        assert m.call_count == 0
+
+        # Remembered grants are only good for the same user and action
+        assert client.get("/delete_account", headers=headers_for(random_user_id(), rsa_keys, "time_based")).status_code == 200
+        assert client.get("/delete_account", headers=headers_for(user_id, rsa_keys, "one_time")).status_code == 200
+        assert m.call_count == 2
+
+
+def test_verified_grants_can_be_remembered(app, auth, client, rsa_keys):
+    @app.route("/export")
+    @auth.require_step_up("export", remember_verified_for_seconds=60)
+    def export_route():
+        return current_user.user_id
+
+    create_step_up_route(app, auth)
+    user_id = random_user_id()
+    with requests_mock.Mocker() as m:
+        m.post(VERIFY_GRANT_URL, status_code=200, json={})
+        for _ in range(3):
+            assert client.get("/export", headers=headers_for(user_id, rsa_keys, "grant")).status_code == 200
+        assert m.call_count == 1
+
+    # Without remember_verified_for_seconds, a grant may be a ONE_TIME_USE one that verifying used up
+    with requests_mock.Mocker() as m:
+        m.post(VERIFY_GRANT_URL, status_code=200, json={})
+        for _ in range(2):
+            assert client.get("/delete_account", headers=headers_for(user_id, rsa_keys, "grant")).status_code == 200
+        assert m.call_count == 2
@@ -0,0 +1,143 @@
+import time
+
+import pytest
+
+from propelauth_flask import LocalTokenCache, SharedTokenCache, TokenCache, current_user, current_org
+from propelauth_flask.token_validation import _TokenValidator
+from tests.auth_helpers import create_access_token, orgs_to_org_id_map, random_org, random_user_id
+from tests.conftest import BASE_AUTH_URL, mock_api_and_init_auth
+
+
+@pytest.fixture(scope='function')
+def verify_calls(monkeypatch):
+    calls = []
+    original_verify = _TokenValidator._verify
+
+    def counting_verify(self, access_token):
+        calls.append(access_token)
+        return original_verify(self, access_token)
+
+    monkeypatch.setattr(_TokenValidator, "_verify", counting_verify)
+    return calls
+
+
+def init_auth_with_cache(rsa_keys, token_cache):
+    return mock_api_and_init_auth(BASE_AUTH_URL, 200, {
+        "verifier_key_pem": rsa_keys.public_pem
+    }, token_cache=token_cache)
+
+
+def test_cached_token_is_verified_once(app, client, rsa_keys, verify_calls):
+    auth = init_auth_with_cache(rsa_keys, LocalTokenCache())
+
+    @app.route("/require_user")
+    @auth.require_user
+    def route():
+        return current_user.user_id
+
+    user_id = random_user_id()
+    access_token = create_access_token({"user_id": user_id}, rsa_keys.private_pem)
+    for _ in range(3):
+        response = client.get("/require_user", headers={"Authorization": "Bearer " + access_token})
+        assert response.status_code == 200
+        assert response.data.decode("utf-8") == user_id
+    assert len(verify_calls) == 1
+
+
+def test_cached_token_still_checks_org(app, client, rsa_keys, verify_calls):
+    auth = init_auth_with_cache(rsa_keys, LocalTokenCache())
+    org = random_org("Member")
+
+    @app.route("/org/<org_id>")
+    @auth.require_org_member_with_minimum_role("Member")
+    def route(org_id):
+        return current_org.org_id
+
+    access_token = create_access_token({
+        "user_id": random_user_id(),
+        "org_id_to_org_member_info": orgs_to_org_id_map([org]),
+    }, rsa_keys.private_pem)
+    headers = {"Authorization": "Bearer " + access_token}
+    assert client.get("/org/" + org["org_id"], headers=headers).status_code == 200
+    assert client.get("/org/" + random_org("Member")["org_id"], headers=headers).status_code == 403
+    assert len(verify_calls) == 1
+
+
+def test_invalid_tokens_are_not_cached(app, client, rsa_keys, verify_calls):
+    auth = init_auth_with_cache(rsa_keys, LocalTokenCache())
+
+    @app.route("/require_user")
+    @auth.require_user
+    def route():
+        return current_user.user_id
+
+    for _ in range(2):
+        response = client.get("/require_user", headers={"Authorization": "Bearer whatisthis"})
+        assert response.status_code == 401
+    assert len(verify_calls) == 2
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalTokenCache(max_size=2)
+    expires_at = time.time() + 60
+    cache.set(b"a", {"user_id": "a"}, expires_at)
+    cache.set(b"b", {"user_id": "b"}, expires_at)
+    cache.get(b"a")
+    cache.set(b"c", {"user_id": "c"}, expires_at)
+    assert cache.get(b"a") == {"user_id": "a"}
+    assert cache.get(b"b") is None
+    assert cache.get(b"c") == {"user_id": "c"}
+
+
+def test_shared_cache_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "tokens")
+    first = SharedTokenCache(path, capacity=16)
+    second = SharedTokenCache(path, capacity=16)
+    key = b"k" * 16
+
+    first.set(key, {"user_id": "abc"}, time.time() + 60)
+    assert second.get(key) == {"user_id": "abc"}
+    assert second.get(b"x" * 16) is None
+
+    first.set(key, {"user_id": "expired"}, time.time() - 1)
+    assert second.get(key) is None
+    first.close()
+    second.close()
+
+
+def test_shared_cache_is_size_bounded(tmp_path):
+    cache = SharedTokenCache(str(tmp_path / "tokens"), capacity=8, max_entry_size=64)
+    keys = [i.to_bytes(16, "little") for i in range(100)]
+    for key in keys:
+        cache.set(key, {"user_id": "u"}, time.time() + 60)
+    assert sum(cache.get(key) is not None for key in keys) <= 8
+    assert cache.get(keys[-1]) == {"user_id": "u"}
+
+    cache.set(keys[0], {"user_id": "x" * 100}, time.time() + 60)
+    assert cache.get(keys[0]) is None
+    cache.close()
+
+
+def test_shared_cache_across_apps_with_different_keys(rsa_keys, tmp_path):
+    path = str(tmp_path / "tokens")
+    first_auth = init_auth_with_cache(rsa_keys, SharedTokenCache(path))
+    other_keys_pem = "-----BEGIN PUBLIC KEY-----\nnot-the-same-key\n-----END PUBLIC KEY-----"
+    second_auth = mock_api_and_init_auth(BASE_AUTH_URL, 200, {
+        "verifier_key_pem": other_keys_pem
+    }, token_cache=SharedTokenCache(path))
+
+    access_token = create_access_token({"user_id": random_user_id()}, rsa_keys.private_pem)
+    header = "Bearer " + access_token
+    assert first_auth.validate_access_token_and_get_user(header).user_id is not None
+    assert second_auth.token_validator.validate_access_token_and_get_user(header, cached_only=True) is None
+
+
+def test_token_cache_implementations_must_define_get_and_set():
+    class GetOnlyTokenCache(TokenCache):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        TokenCache()
+    with pytest.raises(TypeError):
+        GetOnlyTokenCache()
@@ -0,0 +1,103 @@
+import contextlib
+import contextvars
+import threading
+from uuid import uuid4
+
+import requests_mock
+from propelauth_py.api import BACKEND_API_BASE_URL
+
+from propelauth_flask import LocalTokenCache, OpenTelemetryTracer, Span, Tracer, current_org
+from tests.auth_helpers import create_access_token, orgs_to_org_id_map, random_org, random_user_id
+from tests.conftest import BASE_AUTH_URL, mock_api_and_init_auth
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class RecordedSpan(Span):
+    def __init__(self, name, attributes, parent):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def start_span(self, name, attributes=None):
+        parent = _current_span.get()
+        span = RecordedSpan(name, attributes, parent.name if parent is not None else None)
+        with self._lock:
+            self.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+
+    def named(self, name):
+        return [span for span in self.spans if span.name == name]
+
+
+def test_decorators_trace_each_step_of_authentication(app, client, rsa_keys):
+    tracer = RecordingTracer()
+    auth = mock_api_and_init_auth(
+        BASE_AUTH_URL, 200, {"verifier_key_pem": rsa_keys.public_pem}, token_cache=LocalTokenCache(), tracer=tracer
+    )
+    org = random_org("Owner")
+
+    @app.route("/orgs/<org_id>")
+    @auth.require_org_member()
+    def route(org_id):
+        return current_org.org_id
+
+    access_token = create_access_token(
+        {"user_id": random_user_id(), "org_id_to_org_member_info": orgs_to_org_id_map([org])}, rsa_keys.private_pem
+    )
+    for _ in range(2):
+        response = client.get("/orgs/" + org["org_id"], headers={"Authorization": "Bearer " + access_token})
+        assert response.status_code == 200
+
+    assert [span.attributes for span in tracer.named("propelauth.authenticate")] == [{"propelauth.view": "route"}] * 2
+    for name in ("propelauth.parse_header", "propelauth.token_cache", "propelauth.resolve_org"):
+        assert [span.parent for span in tracer.named(name)] == ["propelauth.authenticate"] * 2
+    assert [span.attributes["propelauth.cache_hit"] for span in tracer.named("propelauth.token_cache")] == [
+        False, True
+    ]
+    # Only the cache miss verifies the token
+    assert len(tracer.named("propelauth.verify_token")) == 1
+    assert tracer.named("propelauth.resolve_org")[0].attributes == {"propelauth.org_id": org["org_id"]}
+
+
+def test_backend_calls_are_traced(rsa_keys):
+    tracer = RecordingTracer()
+    auth = mock_api_and_init_auth(BASE_AUTH_URL, 200, {"verifier_key_pem": rsa_keys.public_pem}, tracer=tracer)
+    org_id = str(uuid4())
+
+    with requests_mock.Mocker() as m:
+        m.get(BACKEND_API_BASE_URL + "/api/backend/v1/org/" + org_id, json={"org_id": org_id, "name": "org"})
+        auth.fetch_org(org_id)
+
+    call, request = tracer.spans
+    assert (call.name, call.parent) == ("propelauth.backend_call", None)
+    assert (request.name, request.parent) == ("propelauth.http_request", "propelauth.backend_call")
+    assert request.attributes == {"propelauth.method": "fetch_org", "propelauth.read": True}
+
+
+def test_open_telemetry_tracer_starts_current_spans():
+    started = []
+
+    class FakeOpenTelemetryTracer:
+        def start_as_current_span(self, name, attributes=None):
+            started.append((name, attributes))
+            return contextlib.nullcontext(Span())
+
+    with OpenTelemetryTracer(FakeOpenTelemetryTracer()).start_span("span", {"key": "value"}) as span:
+        span.set_attribute("other", 1)
+
+    assert started == [("span", {"key": "value"})]
@@ -0,0 +1,79 @@
+import datetime
+import threading
+import time
+
+import pytest
+from propelauth_py.errors import RateLimitedException
+from propelauth_py.types.end_user_api_keys import ApiKeyUsage
+
+from propelauth_flask import aggregate_api_key_usage, iter_api_key_usage
+
+
+class FakeUsageBackend:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def fetch_api_key_usage(self, date, org_id=None, user_id=None, api_key_id=None):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.01)
+            if (org_id, date) in self.failing:
+                raise ValueError("Invalid org_id")
+            return ApiKeyUsage(count=int(date[-2:]) * (10 if org_id == "org-b" else 1))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_aggregates_per_day_counts_concurrently():
+    backend = FakeUsageBackend()
+
+    report = aggregate_api_key_usage(
+        backend, "2024-02-27", datetime.date(2024, 3, 2), org_ids=iter(["org-a", "org-b"]), concurrency=4
+    )
+
+    assert report.dates == ["2024-02-27", "2024-02-28", "2024-02-29", "2024-03-01", "2024-03-02"]
+    assert list(report.counts["org-a"]) == [27, 28, 29, 1, 2]
+    assert report.total("org-b") == 870
+    assert list(report.totals_by_day()) == [297, 308, 319, 11, 22]
+    assert report.failed == []
+    assert 1 < backend.max_in_flight <= 4
+
+
+def test_failed_days_are_reported_without_stopping_the_rest():
+    backend = FakeUsageBackend(failing=[("org-a", "2024-01-02")])
+
+    samples = list(iter_api_key_usage(backend, "2024-01-01", "2024-01-03", org_ids=["org-a"]))
+
+    assert sorted((sample.date, sample.count) for sample in samples) == [
+        ("2024-01-01", 1), ("2024-01-02", None), ("2024-01-03", 3)
+    ]
+    failed = [sample for sample in samples if sample.error is not None]
+    assert [(sample.date, type(sample.error)) for sample in failed] == [("2024-01-02", ValueError)]
+
+
+def test_backend_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    attempts = []
+
+    class RateLimitedOnce:
+        def fetch_api_key_usage(self, date, api_key_id=None, **kwargs):
+            attempts.append(api_key_id)
+            if len(attempts) == 1:
+                raise RateLimitedException("slow down")
+            return ApiKeyUsage(count=5)
+
+    report = aggregate_api_key_usage(RateLimitedOnce(), "2024-01-01", "2024-01-01", api_key_ids=["key"])
+
+    assert list(report.counts["key"]) == [5]
+    assert attempts == ["key", "key"]
+
+
+def test_requires_exactly_one_kind_of_id():
+    with pytest.raises(ValueError):
+        aggregate_api_key_usage(FakeUsageBackend(), "2024-01-01", "2024-01-02", org_ids=["a"], user_ids=["b"])
@@ -0,0 +1,162 @@
+import base64
+import json
+import os
+import time
+from uuid import uuid4
+
+import pytest
+
+from propelauth_flask import LocalReplica, RevocationList, create_webhook_blueprint, sign_webhook
+from tests.fake_backend import FakeBackend
+
+SECRET = "whsec_" + base64.b64encode(os.urandom(24)).decode("ascii")
+
+
+class RecordingListener:
+    def __init__(self):
+        self.calls = []
+
+    def invalidate_user(self, user_id):
+        self.calls.append(("invalidate_user", user_id))
+
+    def remove_user(self, user_id):
+        self.calls.append(("remove_user", user_id))
+
+    def invalidate_org(self, org_id):
+        self.calls.append(("invalidate_org", org_id))
+
+    def invalidate_api_key(self, api_key_id):
+        self.calls.append(("invalidate_api_key", api_key_id))
+
+
+@pytest.fixture
+def listener():
+    return RecordingListener()
+
+
+@pytest.fixture
+def webhook_client(app, listener):
+    app.register_blueprint(create_webhook_blueprint(SECRET, [listener]))
+    return app.test_client()
+
+
+def post_webhook(client, event, secret=SECRET, timestamp=None):
+    body = json.dumps(event).encode("utf-8")
+    message_id = "msg_" + uuid4().hex
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    return client.post("/propelauth/webhooks", data=body, headers={
+        "svix-id": message_id,
+        "svix-timestamp": str(timestamp),
+        "svix-signature": "v1,bm90IHRoaXMgb25l " + sign_webhook(secret, message_id, timestamp, body),
+    })
+
+
+def test_user_and_org_events_are_dispatched(webhook_client, listener):
+    user_id, org_id = str(uuid4()), str(uuid4())
+
+    assert post_webhook(webhook_client, {"event_type": "user.updated", "user_id": user_id}).status_code == 204
+    assert post_webhook(webhook_client, {"event_type": "user.added_to_org", "user_id": user_id, "org_id": org_id}).status_code == 204
+    assert post_webhook(webhook_client, {"event_type": "user.deleted", "user_id": user_id}).status_code == 204
+    assert post_webhook(webhook_client, {"event_type": "org.updated", "org_id": org_id}).status_code == 204
+    assert post_webhook(webhook_client, {"event_type": "org.deleted", "org_id": org_id}).status_code == 204
+    assert post_webhook(webhook_client, {"event_type": "org.api_key_deleted", "org_id": org_id, "api_key_id": "key"}).status_code == 204
+
+    assert listener.calls == [
+        ("invalidate_user", user_id),
+        ("invalidate_user", user_id),
+        ("remove_user", user_id),
+        ("invalidate_org", org_id),
+        ("invalidate_org", org_id),
+        ("invalidate_api_key", "key"),
+    ]
+
+
+def test_badly_signed_webhooks_are_rejected(webhook_client, listener):
+    event = {"event_type": "user.deleted", "user_id": str(uuid4())}
+    other_secret = "whsec_" + base64.b64encode(os.urandom(24)).decode("ascii")
+
+    assert post_webhook(webhook_client, event, secret=other_secret).status_code == 400
+    assert post_webhook(webhook_client, event, timestamp=int(time.time()) - 3600).status_code == 400
+    assert webhook_client.post("/propelauth/webhooks", json=event).status_code == 400
+    # Correctly signed, but not an event
+    assert post_webhook(webhook_client, [event]).status_code == 400
+    assert post_webhook(webhook_client, "user.deleted").status_code == 400
+    assert listener.calls == []
+
+
+def test_failing_listener_returns_500_so_the_webhook_is_retried(app, listener):
+    class FailingListener:
+        def invalidate_user(self, user_id):
+            raise RuntimeError("backend unavailable")
+
+    app.register_blueprint(create_webhook_blueprint(SECRET, [FailingListener(), listener]))
+    response = post_webhook(app.test_client(), {"event_type": "user.updated", "user_id": "user"})
+
+    assert response.status_code == 500
+    assert listener.calls == [("invalidate_user", "user")]
+
+
+def test_webhooks_update_the_replica(app):
+    backend = FakeBackend()
+    org_id = backend.add_org()
+    replica = LocalReplica(backend)
+    replica.bulk_load()
+    app.register_blueprint(create_webhook_blueprint(SECRET, [replica]))
+    client = app.test_client()
+
+    user_id = backend.add_user({org_id: "Admin"})
+    post_webhook(client, {"event_type": "user.added_to_org", "user_id": user_id, "org_id": org_id})
+    assert [user.user_id for user in replica.fetch_users_in_org(org_id).users] == [user_id]
+
+    post_webhook(client, {"event_type": "user.deleted", "user_id": user_id})
+    assert replica.fetch_users_in_org(org_id).total_users == 0
+
+
+def test_session_ending_events_revoke_tokens(app):
+    revocation_list = RevocationList()
+    app.register_blueprint(create_webhook_blueprint(SECRET, [revocation_list]))
+    client = app.test_client()
+    user_id = str(uuid4())
+
+    post_webhook(client, {"event_type": "user.updated", "user_id": user_id})
+    assert not revocation_list.is_revoked(user_id, time.time() - 60)
+
+    post_webhook(client, {"event_type": "user.disabled", "user_id": user_id})
+    assert revocation_list.is_revoked(user_id, time.time() - 60)
+
+
+def test_sessions_are_revoked_as_of_the_event_not_its_delivery(app):
+    revocation_list = RevocationList()
+    app.register_blueprint(create_webhook_blueprint(SECRET, [revocation_list]))
+    client = app.test_client()
+    user_id = str(uuid4())
+    sent_at = int(time.time()) - 120
+
+    post_webhook(client, {"event_type": "user.logged_out", "user_id": user_id}, timestamp=sent_at)
+    # Logging in again after the event keeps working
+    assert not revocation_list.is_revoked(user_id, sent_at + 1)
+    assert revocation_list.is_revoked(user_id, sent_at)
+
+    other_user_id = str(uuid4())
+    event = {"event_type": "user.disabled", "user_id": other_user_id, "timestamp": sent_at - 60}
+    post_webhook(client, event)
+    assert not revocation_list.is_revoked(other_user_id, sent_at - 59)
+
+
+def test_redelivered_webhooks_dont_move_the_revocation_later(app):
+    revocation_list = RevocationList()
+    app.register_blueprint(create_webhook_blueprint(SECRET, [revocation_list]))
+    client = app.test_client()
+    user_id = str(uuid4())
+    body = json.dumps({"event_type": "user.logged_out", "user_id": user_id}).encode("utf-8")
+    sent_at = int(time.time()) - 120
+
+    for timestamp in (sent_at, sent_at + 60):
+        headers = {
+            "svix-id": "msg_redelivered",
+            "svix-timestamp": str(timestamp),
+            "svix-signature": sign_webhook(SECRET, "msg_redelivered", timestamp, body),
+        }
+        assert client.post("/propelauth/webhooks", data=body, headers=headers).status_code == 204
+
+    assert not revocation_list.is_revoked(user_id, sent_at + 1)